@@ -30,7 +30,7 @@ from kqcircuits.util.geometry_helper import region_with_merged_polygons
 from kqcircuits.util.parameters import Param, pdt, add_parameters_from, add_parameter
 from kqcircuits.test_structures.junction_test_pads.junction_test_pads import JunctionTestPads
 from kqcircuits.test_structures.stripes_test import StripesTest
-from kqcircuits.util.groundgrid import make_grid
+from kqcircuits.util.groundgrid import make_grid, insert_grid_arrays, GRID_HOLE_CELL_NAME
 from kqcircuits.elements.tsvs.tsv import Tsv
 from kqcircuits.elements.flip_chip_connectors.flip_chip_connector_dc import FlipChipConnectorDc
 from kqcircuits.elements.flip_chip_connectors.flip_chip_connector_rf import FlipChipConnectorRf
@@ -53,6 +53,9 @@ class Chip(Element):
     LIBRARY_PATH = "chips"
 
     with_grid = Param(pdt.TypeBoolean, "Make ground plane grid", False)
+    grid_as_arrays = Param(pdt.TypeBoolean, "Place ground plane grid holes as cell arrays", False,
+                           docstring="Place the grid holes as arrayed instances of a single hole cell instead of flat "
+                                     "shapes wherever possible")
     merge_base_metal_gap = Param(pdt.TypeBoolean, "Merge grid and other gaps into base_metal_gap layer", False)
     a_capped = Param(pdt.TypeDouble, "Capped center conductor width", 10, unit="μm",
                      docstring="Width of center conductor in the capped region (μm)")
@@ -203,10 +206,14 @@ class Chip(Element):
         grid_area = box * (1 / self.layout.dbu)
         protection = pya.Region(self.cell.begin_shapes_rec(self.get_layer("ground_grid_avoidance", face_id))).merged()
         grid_mag_factor = 1
-        region_ground_grid = make_grid(grid_area, protection,
-                                       grid_step=10 * (1 / self.layout.dbu) * grid_mag_factor,
-                                       grid_size=5 * (1 / self.layout.dbu) * grid_mag_factor)
-        self.cell.shapes(self.get_layer("ground_grid", face_id)).insert(region_ground_grid)
+        grid_step = 10 * (1 / self.layout.dbu) * grid_mag_factor
+        grid_size = 5 * (1 / self.layout.dbu) * grid_mag_factor
+        if self.grid_as_arrays:
+            insert_grid_arrays(self.cell, self.get_layer("ground_grid", face_id), grid_area, protection,
+                               grid_step=grid_step, grid_size=grid_size)
+        else:
+            region_ground_grid = make_grid(grid_area, protection, grid_step=grid_step, grid_size=grid_size)
+            self.cell.shapes(self.get_layer("ground_grid", face_id)).insert(region_ground_grid)
 
     def produce_frame(self, frame_parameters, trans=pya.DTrans()):
         """Produces a chip frame and markers for the given face.
@@ -231,9 +238,16 @@ class Chip(Element):
         gaps = pya.Region(self.cell.begin_shapes_rec(self.layout.layer(face["base_metal_gap_wo_grid"])))
         metal = pya.Region(self.cell.begin_shapes_rec(self.layout.layer(face["base_metal_addition"])))
         grid = self.cell.begin_shapes_rec(self.layout.layer(face["ground_grid"]))
+        grid.unselect_cells(f"{GRID_HOLE_CELL_NAME}*")
         res = self.cell.shapes(self.layout.layer(face["base_metal_gap"]))
         res.insert(region_with_merged_polygons(gaps - metal, tolerance / self.layout.dbu))
         res.insert(grid)
+        # keep arrayed grid holes hierarchical also in "base_metal_gap"
+        for child in self.cell.each_child_cell():
+            hole_cell = self.layout.cell(child)
+            if hole_cell.name.startswith(GRID_HOLE_CELL_NAME):
+                hole_cell.shapes(self.layout.layer(face["base_metal_gap"])).insert(
+                    hole_cell.shapes(self.layout.layer(face["ground_grid"])))
 
     def merge_layout_layers(self):
         """Creates "base_metal_gap" layers on all faces.
@@ -24,9 +24,11 @@ Defines values for things such as default layers, paths, and default sub-element
 import os
 import platform
 import subprocess
+from functools import lru_cache
+from importlib import metadata
 from pathlib import Path
 
-from kqcircuits.pya_resolver import pya
+from kqcircuits.pya_resolver import pya, is_standalone_session
 from kqcircuits.util.import_helper import module_from_file
 
 
@@ -40,7 +42,19 @@ def klayout_executable_command():
     else:
         return "klayout"
 
+@lru_cache(maxsize=None)
 def get_klayout_version():
+    """Returns the version string of KLayout, for example "KLayout 0.28.17".
+
+    The version is taken from the running KLayout application or from the metadata of the standalone ``klayout``
+    package. Only if neither is available, the KLayout executable is run to ask for the version.
+    """
+    if not is_standalone_session():
+        return pya.Application.instance().version()
+    try:
+        return f"KLayout {metadata.version('klayout')}"
+    except metadata.PackageNotFoundError:
+        pass
     output = subprocess.check_output([klayout_executable_command(), '-v'], stderr=subprocess.DEVNULL)
 
     return output.decode('ascii').replace('\n','')
@@ -71,6 +85,8 @@ TMP_PATH = Path(os.getenv('KQC_TMP_PATH', ROOT_PATH.joinpath("tmp")))
 
 RESOURCES_PATH = ROOT_PATH.joinpath("resources")
 TMP_PATH.mkdir(exist_ok=True)
+# Index of the PCells and manually designed cells in SRC_PATHS, see library_helper
+LIBRARY_INDEX_PATH = Path(os.getenv('KQC_LIBRARY_INDEX_PATH', str(TMP_PATH.joinpath("library_index.json"))))
 SCRIPTS_PATH = PY_PATH.joinpath("scripts")
 ANSYS_SCRIPT_PATHS = [SCRIPTS_PATH.joinpath("simulations").joinpath("ansys")]
 ELMER_SCRIPT_PATHS = [SCRIPTS_PATH.joinpath("simulations").joinpath("elmer")]
@@ -17,6 +17,7 @@
 
 
 import json
+import logging
 from inspect import isclass
 
 from autologging import logged
@@ -24,7 +25,10 @@ from autologging import logged
 from kqcircuits.defaults import default_layers, default_faces, default_parameter_values
 from kqcircuits.pya_resolver import pya, is_standalone_session
 from kqcircuits.util.geometry_helper import get_cell_path_length
-from kqcircuits.util.library_helper import load_libraries, to_library_name, to_module_name, element_by_class_name
+from kqcircuits.util.library_helper import load_pcell, load_manual_design, pcell_class_by_name, to_library_name, \
+    to_module_name, element_by_class_name
+from kqcircuits.util.pcell_variant_cache import pcell_variant_cache
+from kqcircuits.util.profiling import element_profile, stage_profile
 from kqcircuits.util.parameters import Param, pdt
 from kqcircuits.util.refpoints import Refpoints
 
@@ -108,7 +112,7 @@ class Element(pya.PCellDeclarationHelper):
 
     @staticmethod
     def create_cell_from_shape(layout, name):
-        load_libraries(path=Element.LIBRARY_PATH)
+        load_manual_design(name, Element.LIBRARY_PATH, Element.LIBRARY_NAME)
         return layout.create_cell(name, Element.LIBRARY_NAME)
 
     @classmethod
@@ -141,8 +145,6 @@ class Element(pya.PCellDeclarationHelper):
             tuple of the cell instance and a boolean indicating code generated cell
         """
 
-        library_layout = (load_libraries(path=cls.LIBRARY_PATH)[cls.LIBRARY_NAME]).layout()
-
         if subtype is None:  # derive type from the class name
             subtype = to_library_name(cls.__name__)
 
@@ -154,10 +156,10 @@ class Element(pya.PCellDeclarationHelper):
             del parameters[pname], parameters[f"_{pname}"]
             parameters = {**jp, **parameters}
 
-        if subtype in library_layout.pcell_names():   # code generated
-            pcell_class = type(library_layout.pcell_declaration(subtype))
+        pcell_class = pcell_class_by_name(subtype, cls.LIBRARY_PATH, cls.LIBRARY_NAME)
+        if pcell_class is not None:   # code generated
             return Element._create_cell(pcell_class, layout, library, **parameters), True
-        elif library_layout.cell(subtype):    # manually designed
+        elif load_manual_design(subtype, cls.LIBRARY_PATH, cls.LIBRARY_NAME):    # manually designed
             return layout.create_cell(subtype, cl.LIBRARY_NAME), False
         else:   # fallback is the default
             return cl.create_subtype(layout, library, cl.default_type, **parameters)
@@ -264,20 +266,23 @@ class Element(pya.PCellDeclarationHelper):
         Returns:
             A dictionary of all PCell parameter names and corresponding current values.
         """
-        keys = type(self).get_schema().keys()
-
         if cls is not None:  # filter keys by cls
             if Element.build == cls.build:  # Abstract class? Find subclass specified by *_type.
                 cls = cls._get_abstract()
                 mod_type = f"{to_module_name(cls.__name__)}_type"
                 subtype = parameters[mod_type] if mod_type in parameters else getattr(self, mod_type, "")
                 if subtype:
-                    library_layout = (load_libraries(path=cls.LIBRARY_PATH)[cls.LIBRARY_NAME]).layout()
-                    if subtype in library_layout.pcell_names():
-                        cls = type(library_layout.pcell_declaration(subtype))
-            keys = list(set(cls.get_schema().keys()) & set(keys))
+                    cls = pcell_class_by_name(subtype, cls.LIBRARY_PATH, cls.LIBRARY_NAME) or cls
+
+        cache = Param.get_cache()
+        cache_key = ("pcell_params_by_name", type(self), cls)
+        if cache_key not in cache:
+            keys = type(self).get_schema().keys()
+            if cls is not None:
+                keys = keys & cls.get_schema().keys()
+            cache[cache_key] = [k for k in keys if k != "refpoints"]
 
-        p = {k: self.__getattribute__(k) for k in keys if k != "refpoints"}
+        p = {k: self.__getattribute__(k) for k in cache[cache_key]}
         return {**p, **parameters}
 
     def add_port(self, name, pos, direction=None, face_id=0):
@@ -332,10 +337,16 @@ class Element(pya.PCellDeclarationHelper):
     def get_schema(cls, noparents=False, abstract_class=None):
         """Returns the combined parameters of the class "cls" and all its ancestor classes.
 
+        The schema is cached per class until parameters of any class are redefined, so it must not be modified.
+
         Args:
             noparents: If True then only return the parameters of "cls", not including ancestors.
             abstract_class: Return parameters up to this abstract class if specified.
         """
+        cache = Param.get_cache()
+        key = ("schema", cls, noparents, abstract_class)
+        if key in cache:
+            return cache[key]
         schema = {}
         for pc in cls.__mro__:
             if not hasattr(pc, 'LIBRARY_NAME'):
@@ -343,6 +354,7 @@ class Element(pya.PCellDeclarationHelper):
             schema = {**Param.get_all(pc), **schema}
             if noparents or abstract_class == pc:  # not interested in more parent classes
                 break
+        cache[key] = schema
         return schema
 
     def produce_impl(self):
@@ -351,17 +363,29 @@ class Element(pya.PCellDeclarationHelper):
         Adds all refpoints to user properties and draws their names to the annotation layer.
         """
         self.refpoints = {}
+        log_cache_statistics = self.__log.isEnabledFor(logging.DEBUG)
+        if log_cache_statistics:
+            cache_statistics = pcell_variant_cache.statistics()
 
         # Put general "infrastructure actions" here, before build()
         self.refpoints["base"] = pya.DPoint(0, 0)
 
-        self.build()
+        with stage_profile("build", self.cell):
+            self.build()
+
+        with stage_profile("post_build", self.cell):
+            self.post_build()
 
-        self.post_build()
+        with stage_profile("refpoints", self.cell):
+            for name, refpoint in self.refpoints.items():
+                text = pya.DText(name, refpoint.x, refpoint.y)
+                self.cell.shapes(self.get_layer("refpoints")).insert(text)
 
-        for name, refpoint in self.refpoints.items():
-            text = pya.DText(name, refpoint.x, refpoint.y)
-            self.cell.shapes(self.get_layer("refpoints")).insert(text)
+        if log_cache_statistics:
+            hits, misses, time_saved = (v - cache_statistics[k] for k, v in pcell_variant_cache.statistics().items())
+            if hits or misses:
+                self.__log.debug(f'PCell variant cache in {type(self).__name__}: {hits} hits, {misses} misses, '
+                                 f'{1000 * time_saved:.1f} ms saved')
 
     def build(self):
         """Child classes re-define this method to build the PCell."""
@@ -403,12 +427,16 @@ class Element(pya.PCellDeclarationHelper):
             library: LIBRARY_NAME of the calling PCell instance
             **parameters: PCell parameters for the element as keyword arguments
         """
-        cell_library_name = to_library_name(elem_cls.__name__)
-        if elem_cls.LIBRARY_NAME == library:  # Matthias' workaround: https://github.com/KLayout/klayout/issues/905
-            return layout.create_cell(cell_library_name, parameters)
-        else:
-            load_libraries(path=elem_cls.LIBRARY_PATH)
-            return layout.create_cell(cell_library_name, elem_cls.LIBRARY_NAME, parameters)
+        def create():
+            cell_library_name = to_library_name(elem_cls.__name__)
+            load_pcell(elem_cls)
+            if elem_cls.LIBRARY_NAME == library:  # Matthias' workaround: https://github.com/KLayout/klayout/issues/905
+                return layout.create_cell(cell_library_name, parameters)
+            else:
+                return layout.create_cell(cell_library_name, elem_cls.LIBRARY_NAME, parameters)
+
+        with element_profile(elem_cls.__name__):
+            return pcell_variant_cache.create_cell(layout, elem_cls, library, create, parameters)
 
     @classmethod
     def _get_abstract(cls):
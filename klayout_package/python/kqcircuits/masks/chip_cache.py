@@ -0,0 +1,135 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Content-addressed on-disk cache of exported mask chips.
+
+A chip is identified by a hash of the source of its class module and of all source files in the KQCircuits library
+paths ``SRC_PATHS``, the layer configuration, the resolved PCell parameters and the KQCircuits version. All library
+sources are hashed, since elements are also loaded by class name while the chip is built, so the modules a chip uses
+are not known before building it. On a cache hit the files
+written by ``export_chip`` are copied back to the chip directory, so the chip PCell does not need to be built at all.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import uuid
+from pathlib import Path
+
+from autologging import logged
+
+import kqcircuits
+from kqcircuits.defaults import SRC_PATHS, TMP_PATH, layer_config_path
+from kqcircuits.util.geometry_json_encoder import GeometryJsonEncoder
+
+DEFAULT_CHIP_CACHE_PATH = TMP_PATH / "chip_cache"
+
+
+class _KeyEncoder(GeometryJsonEncoder):
+    """GeometryJsonEncoder that falls back to ``repr`` so that any parameter value can be hashed."""
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return repr(o)
+
+
+def chip_artifact_names(variant_name):
+    """Returns the glob patterns of the files that ``export_chip`` writes for ``variant_name``."""
+    return [f"{variant_name}.oas", f"{variant_name}_with_pcells.oas", f"{variant_name}.json",
+            f"{variant_name}-netlist.json", f"{variant_name} *.gds", f"{variant_name}_drc_report.lyrdb"]
+
+
+@logged
+class ChipCache:
+    """Directory-backed store of exported chip files keyed by the hash of everything the chip depends on.
+
+    Attributes:
+        path: directory containing one sub-directory of chip files per key
+    """
+
+    def __init__(self, path=DEFAULT_CHIP_CACHE_PATH):
+        self.path = Path(path)
+        self._sources_digest = None
+
+    def key(self, chip_class, parameters, **extra):
+        """Returns the cache key of a chip.
+
+        Args:
+            chip_class: the chip PCell class
+            parameters: parameters given to the chip PCell, the defaults of the class are added to these
+            **extra: other settings that affect the exported files, for example ``export_drc``
+        """
+        resolved = {**chip_class().pcell_params_by_name(), **parameters}
+        digest = hashlib.sha256()
+        digest.update(kqcircuits.__version__.encode())
+        digest.update(Path(layer_config_path).read_bytes())
+        digest.update(self._library_sources_digest())
+        source_file = inspect.getsourcefile(sys.modules[chip_class.__module__])
+        if source_file:
+            digest.update(Path(source_file).read_bytes())
+        digest.update(f"{chip_class.__module__}.{chip_class.__qualname__}".encode())
+        digest.update(json.dumps(resolved, cls=_KeyEncoder, sort_keys=True).encode())
+        digest.update(json.dumps(extra, cls=_KeyEncoder, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def restore(self, key, variant_name, chip_dir):
+        """Copies the cached files of ``key`` into ``chip_dir``.
+
+        Returns:
+            True if the key was found in the cache, False otherwise
+        """
+        entry = self.path / key
+        if not (entry / f"{variant_name}.oas").exists():
+            return False
+        Path(chip_dir).mkdir(parents=True, exist_ok=True)
+        for pattern in chip_artifact_names(variant_name):
+            for file in entry.glob(pattern):
+                shutil.copy2(file, Path(chip_dir) / file.name)
+        self.__log.info("Restored %s from chip cache %s", variant_name, key)
+        return True
+
+    def store(self, key, variant_name, chip_dir):
+        """Copies the files exported for ``variant_name`` in ``chip_dir`` into the cache under ``key``."""
+        entry = self.path / key
+        if entry.exists():
+            return
+        # copy into a temporary directory first so that other processes never see a partially written entry
+        tmp_entry = self.path / f"{key}.{uuid.uuid4().hex}.tmp"
+        tmp_entry.mkdir(parents=True)
+        for pattern in chip_artifact_names(variant_name):
+            for file in Path(chip_dir).glob(pattern):
+                shutil.copy2(file, tmp_entry / file.name)
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:  # another process stored the same key meanwhile
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def _library_sources_digest(self):
+        """Returns the digest of all Python modules and manually designed cells in ``SRC_PATHS``."""
+        if self._sources_digest is None:
+            digest = hashlib.sha256()
+            for src in SRC_PATHS:
+                for file in sorted(f for f in Path(src).rglob("*") if f.suffix in (".py", ".oas")):
+                    digest.update(str(file.relative_to(src)).encode())
+                    digest.update(file.read_bytes())
+            self._sources_digest = digest.digest()
+        return self._sources_digest
@@ -0,0 +1,182 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Pool of long-lived KLayout worker processes for building mask chips in parallel.
+
+Each worker is a ``klayout -e -z -nc -rm <script>`` process that runs a job loop (see ``_CHIP_WORKER_TEMPLATE`` in
+``mask_set.py``). KLayout startup, ``kqcircuits`` imports and library registration are paid once per worker instead of
+once per chip. Jobs are ``ChipJob`` objects sent to the worker's stdin as length-prefixed ``GeometryPickler`` frames,
+so parameters of any picklable type, including pya geometry, arrive in the worker unchanged. The worker answers each
+job with a single line starting with ``JOB_RESULT_MARKER`` on stdout. The chip files themselves are written by
+``export_chip`` in the worker and loaded into the mask by the parent process.
+"""
+
+import json
+import os
+import queue
+import struct
+import subprocess
+from multiprocessing.pool import ThreadPool
+
+from autologging import logged
+
+from kqcircuits.defaults import STARTUPINFO, klayout_executable_command
+from kqcircuits.util.geometry_pickler import dumps, loads
+
+JOB_RESULT_MARKER = "#KQC_CHIP_JOB_RESULT#"
+_FRAME_HEADER = struct.Struct("<Q")
+
+
+class ChipJob:
+    """Specification of a single chip built by a worker process.
+
+    Attributes:
+        chip_class: the chip PCell class, must be importable in the worker
+        variant_name: name of the chip variant
+        parameters: dictionary of parameters given to ``chip_class.create``
+    """
+
+    def __init__(self, chip_class, variant_name, parameters):
+        self.chip_class = chip_class
+        self.variant_name = variant_name
+        self.parameters = parameters
+
+
+def write_job(stream, job):
+    """Writes ``job`` to the binary ``stream`` as a single frame."""
+    data = dumps(job)
+    stream.write(_FRAME_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def read_job(stream):
+    """Reads a job written by ``write_job`` from the binary ``stream``.
+
+    Returns:
+        the job, or None if the stream has been closed
+    """
+    header = stream.read(_FRAME_HEADER.size)
+    if len(header) < _FRAME_HEADER.size:
+        return None
+    return loads(stream.read(_FRAME_HEADER.unpack(header)[0]))
+
+
+class ChipSubprocessException(Exception):
+    """Raised when building a chip variant in a worker process fails."""
+
+    def __init__(self, err, chip_variant):
+        super().__init__()
+        self.err = err
+        self.chip_variant = chip_variant
+
+    def __str__(self):
+        return f'Building the {self.chip_variant} chip variant caused the following error:{os.linesep}{self.err}'
+
+
+@logged
+class ChipWorkerPool:
+    """Runs chip jobs in a fixed number of persistent KLayout worker processes.
+
+    Usage::
+
+        with ChipWorkerPool(script_name, workers=8) as pool:
+            pool.run(jobs)
+
+    Attributes:
+        script_name: path of the worker script executed by each KLayout process
+        workers: number of worker processes
+    """
+
+    def __init__(self, script_name, workers):
+        self.script_name = str(script_name)
+        self.workers = max(1, workers)
+        self._idle = queue.Queue()
+        self._processes = []
+
+    def __enter__(self):
+        for _ in range(self.workers):
+            self._idle.put(self._start_worker())
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def run(self, jobs):
+        """Runs the given jobs and waits until all of them have finished.
+
+        Args:
+            jobs: list of ChipJob objects
+
+        Raises:
+            ChipSubprocessException: if any of the jobs failed. Raised for the first failed job in the ``jobs`` order
+                after all jobs have finished.
+        """
+        tp = ThreadPool(self.workers)
+        results = [(job.variant_name, tp.apply_async(self._run_job, (job,))) for job in jobs]
+        tp.close()
+        errors = [(variant_name, result.get()) for variant_name, result in results]
+        tp.join()
+        for variant_name, error in errors:
+            if error is not None:
+                raise ChipSubprocessException(error, variant_name)
+
+    def close(self):
+        """Asks all workers to exit and waits for them."""
+        for proc in self._processes:
+            if proc.poll() is None:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+        for proc in self._processes:
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            proc.stdout.close()
+        self._processes = []
+
+    def _start_worker(self):
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            [klayout_executable_command(), "-e", "-z", "-nc", "-rm", self.script_name],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, startupinfo=STARTUPINFO)
+        self._processes.append(proc)
+        return proc
+
+    def _run_job(self, job):
+        """Sends ``job`` to an idle worker and returns None on success or the error text on failure."""
+        proc = self._idle.get()
+        output = []
+        try:
+            write_job(proc.stdin, job)
+            for raw_line in proc.stdout:
+                line = raw_line.decode("UTF-8", errors="replace")
+                if line.startswith(JOB_RESULT_MARKER):
+                    result = json.loads(line[len(JOB_RESULT_MARKER):])
+                    return result.get("error")
+                output.append(line)
+            proc.wait()
+        except OSError as e:
+            output.append(str(e))
+        finally:
+            if proc.poll() is None:
+                self._idle.put(proc)
+            else:
+                # the worker died while building the chip, replace it so that the remaining jobs can still run
+                self.__log.warning("Worker process exited with code %s, starting a new one.", proc.returncode)
+                self._idle.put(self._start_worker())
+        return "".join(output) or "Worker process exited without reporting a result."
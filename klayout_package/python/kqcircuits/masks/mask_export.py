@@ -17,9 +17,11 @@
 
 """Functions for exporting mask sets."""
 import json
+import multiprocessing
 import os
 import subprocess
 from importlib import import_module
+from time import perf_counter
 
 from autologging import logged
 
@@ -48,14 +50,41 @@ def export_mask_set(mask_set, path, view):
 
 @logged
 def export_designs(mask_set, export_dir):
-    """Exports .oas and .gds files of the mask_set."""
+    """Exports .oas and .gds files of the mask_set.
+
+    The files of all mask layouts are exported in parallel if ``mask_set.export_processes`` is larger than one, see
+    ``export_masks_of_face``.
+    """
     # export mask layouts
+    jobs = []
     for mask_layout in mask_set.mask_layouts:
-        export_masks_of_face(export_dir, mask_layout, mask_set)
+        jobs += _mask_export_jobs(export_dir, mask_layout, mask_set)
+    _run_export_jobs(jobs, mask_set.export_processes)
+
+
+def export_chip(chip_cell, chip_name, chip_dir, layout, export_drc, debug=False, report_netlist_time=False):
+    """Exports a chip used in a maskset.
+
+    If ``report_netlist_time`` is True, the time spent in netlist extraction is printed.
+    """
+
+    static_cell, chip_json = prepare_chip_export(chip_cell, chip_name, chip_dir, layout, debug, report_netlist_time)
+    export_static_chip(static_cell, chip_name, chip_dir, chip_json, export_drc, debug)
+
+    # delete the static cell which was only needed for export
+    if static_cell.cell_index() != chip_cell.cell_index():
+        layout.delete_cell_rec(static_cell.cell_index())
+
 
+def prepare_chip_export(chip_cell, chip_name, chip_dir, layout, debug=False, report_netlist_time=False):
+    """Exports the chip files that need the PCell hierarchy of the chip and converts the chip to a static cell.
 
-def export_chip(chip_cell, chip_name, chip_dir, layout, export_drc, debug=False):
-    """Exports a chip used in a maskset."""
+    The remaining files are exported from the static cell by ``export_static_chip``. If ``report_netlist_time`` is
+    True, the time spent in netlist extraction is printed.
+
+    Returns:
+        tuple of the static chip cell and a dictionary of the chip data that is only available in the PCell
+    """
 
     is_pcell = chip_cell.pcell_declaration() is not None
 
@@ -71,17 +100,44 @@ def export_chip(chip_cell, chip_name, chip_dir, layout, export_drc, debug=False)
     dummy_cell.delete()
     static_cell = layout.cell(layout.convert_cell_to_static(chip_cell.cell_index()))
 
+    # export netlist
+    if not debug:
+        start_time = perf_counter()
+        export_cell_netlist(static_cell, chip_dir/f"{chip_name}-netlist.json", chip_cell)
+        if report_netlist_time:
+            print(f"Netlist extraction of {chip_name}: {perf_counter() - start_time:.2f} s")
+
+    chip_json = {
+        "Chip class module": chip_class.__module__ if is_pcell else None,
+        "Chip class name": chip_class.__name__ if is_pcell else None,
+        "Chip parameters": chip_params if is_pcell else None,
+        # calculate flip-chip bump count
+        "Bump count": count_instances_in_cell(chip_cell, FlipChipConnectorDc),
+    }
+    return static_cell, chip_json
+
+
+def export_static_chip(static_cell, chip_name, chip_dir, chip_json, export_drc, debug=False):
+    """Exports the chip files that only need the static chip cell.
+
+    The static cell may be a static copy of the chip, for example the copy that is kept in the mask layout.
+
+    Args:
+        static_cell: the static chip cell returned by ``prepare_chip_export`` or a copy of it
+        chip_name: name of the chip variant
+        chip_dir: directory where the files are exported
+        chip_json: chip data returned by ``prepare_chip_export``
+        export_drc: Boolean determining if DRC report is exported
+        debug: if True, layer areas and densities are not computed
+    """
+    layout = static_cell.layout()
+
     # save the chip .oas file with all layers and only containing static cells
     save_opts = pya.SaveLayoutOptions()
     save_opts.format = "OASIS"
     save_opts.write_context_info = False  # to save all cells as static cells
     static_cell.write(str(chip_dir/f"{chip_name}.oas"), save_opts)
 
-    # export netlist
-    if not debug:
-        export_cell_netlist(static_cell, chip_dir/f"{chip_name}-netlist.json", chip_cell)
-    # calculate flip-chip bump count
-    bump_count = count_instances_in_cell(chip_cell, FlipChipConnectorDc)
     # find layer areas and densities
     layer_areas_and_densities = {}
     if not debug:
@@ -90,13 +146,7 @@ def export_chip(chip_cell, chip_name, chip_dir, layout, export_drc, debug=False)
                 layer_areas_and_densities[layer] = {"area": f"{area:.2f}", "density": f"{density * 100:.2f}"}
 
     # save auxiliary chip data into json-file
-    chip_json = {
-        "Chip class module": chip_class.__module__ if is_pcell else None,
-        "Chip class name": chip_class.__name__ if is_pcell else None,
-        "Chip parameters": chip_params if is_pcell else None,
-        "Bump count": bump_count,
-        "Layer areas and densities": layer_areas_and_densities
-    }
+    chip_json = {**chip_json, "Layer areas and densities": layer_areas_and_densities}
 
     with open(chip_dir/(chip_name + ".json"), "w") as f:
         json.dump(chip_json, f, cls=GeometryJsonEncoder, sort_keys=True, indent=4)
@@ -127,27 +177,20 @@ def export_chip(chip_cell, chip_name, chip_dir, layout, export_drc, debug=False)
     if export_drc:
         export_drc_report(chip_name, chip_dir)
 
-    # delete the static cell which was only needed for export
-    if static_cell.cell_index() != chip_cell.cell_index():
-        layout.delete_cell_rec(static_cell.cell_index())
-
 
 def export_masks_of_face(export_dir, mask_layout, mask_set):
     """ Exports masks for layers of a single face of a mask_set.
 
+    If ``mask_set.export_processes`` is larger than one and the platform supports forking processes, the full mask and
+    each layer are exported concurrently by forked processes which share the in-memory mask layout. Every process
+    writes exactly the same data as the serial export, so the files are identical in both modes.
+
     Args:
         export_dir: directory for the face specific subdirectories
         mask_layout: MaskLayout object for the cell and face reference
         mask_set: MaskSet object for the name and version attributes to be included in the filename
     """
-    subdir_name_for_face = _get_mask_layout_full_name(mask_set, mask_layout)
-    export_dir_for_face = _get_directory(export_dir / str(subdir_name_for_face))
-    # export .oas file with all layers
-    path = export_dir_for_face / f"{_get_mask_layout_full_name(mask_set, mask_layout)}.oas"
-    _export_cell(path, mask_layout.top_cell, "all")
-    # export .oas files for individual optical lithography layers
-    for layer_name in mask_layout.mask_export_layers:
-        export_mask(export_dir_for_face, layer_name, mask_layout, mask_set)
+    _run_export_jobs(_mask_export_jobs(export_dir, mask_layout, mask_set), mask_set.export_processes)
 
 
 def export_mask(export_dir, layer_name, mask_layout, mask_set):
@@ -171,11 +214,16 @@ def export_mask(export_dir, layer_name, mask_layout, mask_set):
     tmp_layer = layout.layer()
 
     if invert:
-        wafer = pya.Region(top_cell.begin_shapes_rec(layer)).merged()
+        tile_size = mask_set.mask_export_tile_size
         disc = pya.Region([circle_polygon(mask_layout.wafer_rad).to_itype(layout.dbu)])
+        if tile_size is None:
+            wafer = pya.Region(top_cell.begin_shapes_rec(layer)).merged()
         layout.copy_layer(layer, tmp_layer)
         layout.clear_layer(layer)
-        top_cell.shapes(layer).insert(wafer ^ disc)
+        if tile_size is None:
+            top_cell.shapes(layer).insert(wafer ^ disc)
+        else:
+            _insert_inverted_tiled(top_cell, tmp_layer, layer, disc, tile_size, mask_set.mask_export_threads)
 
     layers_to_export = {layer_info.name: layer}
     path = export_dir / (_get_mask_layout_full_name(mask_set, mask_layout) + f" {layer_info.name}.oas")
@@ -186,6 +234,36 @@ def export_mask(export_dir, layer_name, mask_layout, mask_set):
         layout.copy_layer(tmp_layer, layer)
     layout.delete_layer(tmp_layer)
 
+
+def _insert_inverted_tiled(cell, source_layer, target_layer, disc, tile_size, threads=None):
+    """Inserts ``disc`` XOR the shapes of ``source_layer`` into ``target_layer`` of ``cell`` tile by tile.
+
+    Unlike a flat ``Region`` of the whole wafer, the tiling processor only flattens the shapes of one tile at a time and
+    processes the tiles in ``threads`` parallel threads, so memory use stays bounded for masks with ground grid. Where
+    slanted edges cross tile borders the vertices are snapped to the database grid, so the result may differ from the
+    flat XOR by at most one database unit.
+
+    Args:
+        cell: top cell of the mask
+        source_layer: layer index of the mask layer to be inverted
+        target_layer: layer index where the inverted shapes are inserted
+        disc: Region of the wafer area
+        tile_size: tile width and height in µm
+        threads: number of threads, by default ``os.cpu_count()``
+    """
+    layout = cell.layout()
+    tp = pya.TilingProcessor()
+    tp.dbu = layout.dbu
+    tp.frame = disc.bbox().to_dtype(layout.dbu) + cell.dbbox_per_layer(source_layer)
+    tp.tile_size(tile_size, tile_size)
+    tp.threads = threads if threads is not None else os.cpu_count()
+    tp.input("mask_layer", layout, cell.cell_index(), source_layer)
+    tp.var("disc", disc)
+    tp.output("inverted", layout, cell.cell_index(), target_layer)
+    tp.queue("_output(inverted, (mask_layer & _tile) ^ (disc & _tile), false)")
+    tp.execute("Inverting mask layer")
+
+
 @logged
 def export_docs(mask_set, export_dir, filename="Mask_Documentation.md"):
     """Exports mask documentation containing mask layouts and parameters of all chips in the mask_set."""
@@ -386,6 +464,43 @@ def _export_cell(path, cell=None, layers_to_export=None):
         layout.write(str(path), svopt)
 
 
+def _mask_export_jobs(export_dir, mask_layout, mask_set):
+    """Returns a list of ``(function, args)`` tuples exporting the mask files of ``mask_layout``."""
+    subdir_name_for_face = _get_mask_layout_full_name(mask_set, mask_layout)
+    export_dir_for_face = _get_directory(export_dir / str(subdir_name_for_face))
+    # export .oas file with all layers
+    path = export_dir_for_face / f"{_get_mask_layout_full_name(mask_set, mask_layout)}.oas"
+    jobs = [(_export_cell, (path, mask_layout.top_cell, "all"))]
+    # export .oas files for individual optical lithography layers
+    for layer_name in mask_layout.mask_export_layers:
+        jobs.append((export_mask, (export_dir_for_face, layer_name, mask_layout, mask_set)))
+    return jobs
+
+
+# Export jobs of the ongoing parallel export. Forked worker processes inherit this list together with the layout.
+_forked_export_jobs = []
+
+
+def _run_forked_export_job(index):
+    function, args = _forked_export_jobs[index]
+    function(*args)
+
+
+def _run_export_jobs(jobs, processes):
+    """Runs the ``(function, args)`` export jobs, in parallel using forked processes if ``processes > 1``."""
+    global _forked_export_jobs  # pylint: disable=global-statement
+    if processes <= 1 or len(jobs) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for function, args in jobs:
+            function(*args)
+        return
+    _forked_export_jobs = jobs
+    try:
+        with multiprocessing.get_context("fork").Pool(min(processes, len(jobs))) as pool:
+            pool.map(_run_forked_export_job, range(len(jobs)), chunksize=1)
+    finally:
+        _forked_export_jobs = []
+
+
 def _get_directory(directory):
     if not os.path.exists(str(directory)):
         os.mkdir(str(directory))
@@ -131,25 +131,14 @@ class MaskLayout:
                 # create copies of the chips, so that modifying these only affects the ones in this MaskLayout
                 new_cell = self.layout.create_cell(name)
                 new_cell.copy_tree(cell)
-                # remove layers belonging to another face
+                # remove layers belonging to another face, clearing each layer once per cell of the copied tree
+                tree_cells = [new_cell] + [self.layout.cell(index) for index in new_cell.called_cells()]
                 for face_id, face_dictionary in default_faces.items():
                     if face_id != self.face_id:
                         for layer_info in face_dictionary.values():
-                            shapes_iter = new_cell.begin_shapes_rec(self.layout.layer(layer_info))
-
-                            # iterating shapes using shapes_iter.at_end() fails:
-                            # https://www.klayout.de/forum/discussion/comment/4275
-                            # solution is to use a separate buffer list to iterate
-                            shapes = []
-                            while not shapes_iter.at_end():
-                                try:
-                                    shapes.append(shapes_iter.shape())
-                                    shapes_iter.next()
-                                except ValueError:
-                                    print("error occurs at %s at %s" % (name, face_id))
-
-                            for shapes_to_remove in shapes:
-                                shapes_to_remove.delete()
+                            layer = self.layout.layer(layer_info)
+                            for tree_cell in tree_cells:
+                                tree_cell.shapes(layer).clear()
 
                 self.chips_map_legend[name] = new_cell
 
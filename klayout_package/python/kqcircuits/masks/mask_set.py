@@ -17,23 +17,27 @@
 
 import copy
 import os
+import re
 import sys
-import subprocess
 from time import perf_counter
 from string import Template
 from inspect import isclass
-from multiprocessing.pool import ThreadPool
 from pathlib import Path
 
 from autologging import logged
 from tqdm import tqdm
 
 from kqcircuits.pya_resolver import pya
-from kqcircuits.defaults import default_bar_format, TMP_PATH, STARTUPINFO, klayout_executable_command, default_face_id
-from kqcircuits.masks.mask_export import export_chip, export_mask_set
+from kqcircuits.defaults import default_bar_format, TMP_PATH, default_face_id
+from kqcircuits.masks.chip_cache import ChipCache
+from kqcircuits.masks.chip_worker import ChipJob, ChipWorkerPool
+from kqcircuits.masks.mask_export import export_mask_set, export_static_chip, prepare_chip_export
 from kqcircuits.masks.mask_layout import MaskLayout
 from kqcircuits.klayout_view import KLayoutView, MissingUILibraryException
 
+# characters that the OASIS writer replaces by "*" in cell names
+_OASIS_INVALID_NAME_CHARS = re.compile(r"[^\x21-\x7e]")
+
 
 @logged
 class MaskSet:
@@ -63,11 +67,18 @@ class MaskSet:
         mask_layouts: list of MaskLayout objects in this mask set
         mask_export_layers: list of names of the layers which are exported for each MaskLayout
         used_chips: similar to chips_map_legend, but only includes chips which are actually used in mask layouts
+        chip_cache: ChipCache used to skip building chips whose source and parameters have not changed, or None if
+            chip caching is disabled
+        export_processes: number of processes used to export the mask layer files in parallel
+        mask_export_tile_size: if not None, inverted mask layers are computed in square tiles of this size (µm) with
+            ``pya.TilingProcessor`` instead of one flat Region of the whole wafer
+        mask_export_threads: number of threads used for the tiled inverted mask layers, by default ``os.cpu_count()``
 
     """
 
     def __init__(self, layout=None, name="MaskSet", version=1, with_grid=False, export_drc=False,
-                 mask_export_layers=None, debug=False):
+                 mask_export_layers=None, debug=False, chip_cache=False, export_processes=1,
+                 mask_export_tile_size=None, mask_export_threads=None):
 
         self._time = {"INIT": perf_counter(), "ADD_CHIPS": 0,  "BUILD": 0, 'EXPORT': 0, 'END': 0}
         self.layout = layout
@@ -97,6 +108,13 @@ class MaskSet:
         self.mask_layouts = []
         self.mask_export_layers = mask_export_layers if mask_export_layers is not None else []
         self.used_chips = {}
+        if chip_cache:
+            self.chip_cache = ChipCache() if chip_cache is True else ChipCache(chip_cache)
+        else:
+            self.chip_cache = None
+        self.export_processes = export_processes
+        self.mask_export_tile_size = mask_export_tile_size
+        self.mask_export_threads = mask_export_threads
         self.template_imports = []
         self._thread_create_chip_parameters = {}
 
@@ -144,7 +162,7 @@ class MaskSet:
             chips: List of tuples that ``add_chip`` uses. Parameters are optional.
                 For example, ``(QualityFactor, "QDG", parameters)``.
             threads: Number of parallel threads to use for generation. By default uses ``os.cpu_count()`` threads.
-                Uses subprocesses and consequently a lot of memory.
+                Uses a pool of persistent KLayout worker processes and consequently a lot of memory.
 
         Warning:
             It is advised to lower the thread number if your system has a lot of CPU cores but not a lot of memory.
@@ -162,105 +180,52 @@ class MaskSet:
                                                           bar_format=default_bar_format):
                 self.add_chip(chip_class, variant_name, **(params[0] if params else {}))
         else:
-            print(f"Building chip variants in parallel using {threads} threads...")
-
-            template = self._get_template()
-
-            class ChipSubprocessException(Exception):
-                def __init__(self, err, chip_variant):
-                    super().__init__()
-                    self.err = err
-                    self.chip_variant = chip_variant
-                def __str__(self):
-                    return f'Building the {self.chip_variant} chip variant caused the following error:'\
-                    f'{os.linesep}{self.err}'
-
-            def _subprocess_worker(args):
-                with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                      startupinfo=STARTUPINFO) as proc:
-                    _, errs = proc.communicate()
-                    # Process has error return code, return error stream
-                    if proc.returncode > 0:
-                        return errs.decode('UTF-8')
-                return None
-
-            def _params_to_str(params):  # flatten a parameters dictionary to a string
-                ps = ""
-                for n, v in params.items():
-                    if isinstance(v, str):
-                        ps += f",{n}={repr(v)}"
-                    elif isinstance(v, pya.DBox):
-                        ps += f",{n}=pya.DBox({v.p1.x}, {v.p1.y}, {v.p2.x}, {v.p2.y})"
-                    elif isinstance(v, pya.DVector):
-                        ps += f",{n}=pya.DVector({v.x}, {v.y})"
-                    elif isinstance(v, pya.DPoint):
-                        ps += f",{n}=pya.DPoint({v.x}, {v.y})"
-                    else:
-                        ps += f",{n}={v}"
-                return ps
-
-            tp = ThreadPool(threads)
-            file_names = []
-            processes = {}
+            print(f"Building chip variants in parallel using {threads} worker processes...")
+
+            mask_path = TMP_PATH/f"{self.name}_v{self.version}"
+            jobs = []
+            variant_names = []
+            cache_keys = {}
             for chip_class, variant_name, *param_list in chips:
-                # create the script for generating this chip with the correct parameters and exporting the chip files
-                params = {
-                    'name_chip': variant_name,
-                    'name_mask': self.name,
-                    'with_grid': self.with_grid,
-                    'merge_base_metal_gap': True,
-                    }
-                if param_list:
-                    params.update(param_list[0])
-
-                element_import = f'from {chip_class.__module__} import {chip_class.__name__}'
-                create_element = f'cell = {chip_class.__name__}.create(layout {_params_to_str(params)})'
-                chip_path = TMP_PATH/f"{self.name}_v{self.version}"/"Chips"/f"{variant_name}"
+                # create the job for generating this chip with the correct parameters and exporting the chip files
+                params = self._variant_parameters(variant_name, **(param_list[0] if param_list else {}))
+
+                variant_names.append(variant_name)
+                chip_path = mask_path/"Chips"/variant_name
                 chip_path.mkdir(parents=True, exist_ok=True)
-                script_name = str(chip_path / f"{variant_name}.py")
-                file_names.append((variant_name, str(chip_path / f"{variant_name}.oas"), script_name))
-
-                substitution_parameters = {
-                    'name_mask': self.name,
-                    'version_mask': self.version,
-                    'variant_name': variant_name,
-                    'chip_class': chip_class.__name__,
-                    'element_import': element_import,
-                    'create_element': create_element,
-                    'export_drc': self.export_drc
-                }
-                substitution_parameters.update(self._thread_create_chip_parameters)
-                result = template.substitute(**substitution_parameters)
+                if self.chip_cache is not None:
+                    key = self._chip_cache_key(chip_class, params, in_worker=True)
+                    if self.chip_cache.restore(key, variant_name, chip_path):
+                        continue
+                    cache_keys[variant_name] = key
+                jobs.append(ChipJob(chip_class, variant_name, params))
+
+            # the worker script only depends on mask level parameters, so it is shared by all workers
+            script_name = mask_path/"chip_worker.py"
+            if jobs:
                 with open(script_name, "w") as f:
-                    f.write(result)
-
-                # launch klayout process that runs the created script
-                try:  # pylint: disable=consider-using-with
-                    processes[variant_name] = tp.apply_async(_subprocess_worker,
-                                   ([klayout_executable_command(), "-e", "-z", "-nc", "-rm", script_name],)
-                                   )
-                except subprocess.CalledProcessError as e:
-                    self.__log.error(e.output)
-
-            # wait for processes to end
-            tp.close()
-            for variant_name, process in processes.items():
-                process_error = process.get()
-                if process_error is not None:
-                    raise ChipSubprocessException(process_error, variant_name)
-            tp.join()
-
-            # import chip cells exported by the parallel processes into the mask
-            for variant_name, file_name, script_name in tqdm(file_names, desc='Building variants (parallel)',
-                                                             bar_format=default_bar_format):
-                self._load_chip_into_mask(file_name, variant_name)
-                # remove the script that was used to generate the chip
-                if os.path.exists(script_name):
-                    os.remove(script_name)
+                    f.write(self._get_worker_script())
+                try:
+                    with ChipWorkerPool(script_name, min(threads, len(jobs))) as pool:
+                        pool.run(jobs)
+                finally:
+                    # remove the script that was used to generate the chips
+                    if os.path.exists(script_name):
+                        os.remove(script_name)
+
+            for variant_name, key in cache_keys.items():
+                self.chip_cache.store(key, variant_name, mask_path/"Chips"/variant_name)
+
+            # import chip cells exported by the worker processes or restored from the cache into the mask
+            for variant_name in tqdm(variant_names, desc='Building variants (parallel)', bar_format=default_bar_format):
+                self._load_chip_into_mask(str(mask_path/"Chips"/variant_name/f"{variant_name}.oas"), variant_name)
 
     def add_chip(self, chip, variant_name, **kwargs):
         """Adds a chip with the given name and parameters to self.chips_map_legend and exports chip files.
 
+        If chip caching is enabled and the chip has been exported before with identical source code and parameters,
+        the cached chip files are used instead of building the chip.
+
         Args:
             chip: the chip type class (for PCell chip), or a chip cell (for manually designed chip)
             variant_name: name for specific variant, the same as in the mask layout
@@ -271,13 +236,16 @@ class MaskSet:
         chip_path.mkdir(parents=True, exist_ok=True)
 
         if isclass(chip):
+            key = None
+            if self.chip_cache is not None:
+                key = self._chip_cache_key(chip, self._variant_parameters(variant_name, **kwargs))
+                if self.chip_cache.restore(key, variant_name, chip_path):
+                    self._load_chip_into_mask(str(chip_path / f"{variant_name}.oas"), variant_name)
+                    return
             cell = self.variant_definition(chip, variant_name, **kwargs)[variant_name]
-            export_chip(cell, variant_name, chip_path, self.layout, self.export_drc, debug=self.debug)
-            self.layout.delete_cell_rec(cell.cell_index())
+            self._export_chip_into_mask(cell, variant_name, chip_path, delete_chip=True, cache_key=key)
         else:
-            export_chip(chip, variant_name, chip_path, self.layout, self.export_drc, debug=self.debug)
-
-        self._load_chip_into_mask(str(chip_path / f"{variant_name}.oas"), variant_name)
+            self._export_chip_into_mask(chip, variant_name, chip_path)
 
     def variant_definition(self, chip_class, variant_name, **kwargs):
         """Returns chip variant definition with default mask specific parameters.
@@ -291,8 +259,12 @@ class MaskSet:
             dictionary compatible with mask map structure
         """
         self.__log.info("Resolving %s", variant_name)
+        chip_parameters = self._variant_parameters(variant_name, **kwargs)
+        return {variant_name: chip_class.create(self.layout, **chip_parameters)}
 
-        chip_parameters = {
+    def _variant_parameters(self, variant_name, **kwargs):
+        """Returns the chip PCell parameters used by ``variant_definition``."""
+        return {
             "merge_base_metal_gap": True,
             "name_chip": variant_name,
             "display_name": variant_name,
@@ -302,7 +274,17 @@ class MaskSet:
             **kwargs
         }
 
-        return {variant_name: chip_class.create(self.layout, **chip_parameters)}
+    def _chip_cache_key(self, chip_class, params, in_worker=False):
+        """Returns the chip cache key for a chip built with the given parameters in this mask set.
+
+        ``template_imports`` and ``_thread_create_chip_parameters`` change only the chips built by the worker processes
+        of ``add_chips``, so they are part of the key if ``in_worker`` is True and they are set.
+        """
+        extra = {'export_drc': self.export_drc, 'debug': self.debug}
+        if in_worker and (self.template_imports or self._thread_create_chip_parameters):
+            extra['template_imports'] = self.template_imports
+            extra['template_parameters'] = self._thread_create_chip_parameters
+        return self.chip_cache.key(chip_class, params, **extra)
 
     def build(self, remove_guiding_shapes=True):
         """Builds the mask set.
@@ -431,6 +413,44 @@ class MaskSet:
 
         return chips_map
 
+    def _export_chip_into_mask(self, chip_cell, variant_name, chip_path, delete_chip=False, cache_key=None):
+        """Exports the chip files of chip_cell and adds a static copy of it into self.chips_map_legend[variant_name].
+
+        The mask gets a static copy of the chip, which is identical to the chip loaded from the exported .oas file, but
+        without parsing the file.
+
+        Args:
+            chip_cell: the chip cell
+            variant_name: name of the chip variant
+            chip_path: directory of the chip files
+            delete_chip: if True, chip_cell is deleted from self.layout
+            cache_key: if not None, the chip files are stored in self.chip_cache with this key once written
+        """
+        static_cell, chip_json = prepare_chip_export(chip_cell, variant_name, chip_path, self.layout, self.debug)
+        export_static_chip(static_cell, variant_name, chip_path, chip_json, self.export_drc, self.debug)
+        if cache_key is not None:
+            self.chip_cache.store(cache_key, variant_name, chip_path)
+
+        mask_cell = self.layout.create_cell(static_cell.name)
+        cell_mapping = pya.CellMapping()
+        cell_mapping.for_single_cell_full(self.layout, mask_cell.cell_index(), self.layout, static_cell.cell_index())
+        mask_cell.copy_tree_shapes(static_cell, cell_mapping)
+        names = {copy: self.layout.cell(original).name for original, copy in cell_mapping.table().items()}
+        if static_cell.cell_index() != chip_cell.cell_index():
+            self.layout.delete_cell_rec(static_cell.cell_index())
+        if delete_chip:
+            self.layout.delete_cell_rec(chip_cell.cell_index())
+
+        # name the cells like they are named when the exported .oas file is loaded into the mask
+        for index, name in names.items():
+            name = _OASIS_INVALID_NAME_CHARS.sub("*", name)
+            unique_name, i = name, 0
+            while self.layout.has_cell(unique_name):
+                i += 1
+                unique_name = f"{name}${i}"
+            self.layout.cell(index).name = unique_name
+        self.chips_map_legend[variant_name] = mask_cell
+
     def _load_chip_into_mask(self, file_name, variant_name):
         """Loads a chip from file_name to self.layout and adds it into self.chips_map_legend["variant_name"]"""
         load_opts = pya.LoadLayoutOptions()
@@ -446,44 +466,113 @@ class MaskSet:
             temp = temp.replace('#TEMPLATE_IMPORT#', i, 1)
         return Template(temp)
 
+    def _get_worker_script(self):
+        """Returns the script run by the worker processes of ``add_chips``.
+
+        The chip template of ``_get_template`` is substituted separately for each chip in the worker, so the per-chip
+        substitution keys ``variant_name``, ``chip_class``, ``element_import`` and ``create_element`` are available to
+        ``template_imports`` as well as the mask level ones.
+        """
+        substitution_parameters = {
+            'name_mask': self.name,
+            'version_mask': self.version,
+            'export_drc': self.export_drc
+        }
+        substitution_parameters.update(self._thread_create_chip_parameters)
+        return Template(_CHIP_WORKER_TEMPLATE).substitute(
+            chip_template=repr(self._get_template().template),
+            substitution_parameters=repr({k: str(v) for k, v in substitution_parameters.items()}))
+
 
 # Template for creating and exporting a chip during mask generation.
 #
 # This is used in _get_template() to create a template used in add_chips() to create chips in
 # parallel. The "#TEMPLATE_IMPORT#" strings in it will be replaced by "template_imports" elements
-# to update the template itself.
+# to update the template itself. The template is substituted and run by a worker process for every chip, with the
+# layout of the chip in ``layout`` and its parameters in ``parameters``.
 
 _CREATE_CHIP_TEMPLATE = """
 
 import logging
-import sys
-import traceback
 #TEMPLATE_IMPORT#
 from pathlib import Path
 from kqcircuits.defaults import TMP_PATH
 from kqcircuits.masks.mask_export import export_chip
 from kqcircuits.pya_resolver import pya
-from kqcircuits.util import macro_prepare
 from kqcircuits.util.log_router import route_log
 ${element_import}
 
-try:
-    logging.basicConfig(level=logging.DEBUG)  # this level is NOT actually used
-    chip_path = Path(TMP_PATH / "${name_mask}_v${version_mask}" / "Chips" / "${variant_name}")
-    route_log(filename=chip_path/"${variant_name}.log")
+chip_path = Path(TMP_PATH / "${name_mask}_v${version_mask}" / "Chips" / "${variant_name}")
+route_log(filename=chip_path/"${variant_name}.log")
 
-    layout, top_cell, _, _ = macro_prepare.prep_empty_layout()
+top_cell = layout.create_cell("Top Cell")
 
-    # cell definition and arbitrary code here
-    ${create_element}
+# cell definition and arbitrary code here
+${create_element}
 
-    top_cell.insert(pya.DCellInstArray(cell.cell_index(), pya.DTrans()))
+top_cell.insert(pya.DCellInstArray(cell.cell_index(), pya.DTrans()))
 
-    # export chip files
-    export_chip(cell, "${variant_name}", chip_path, layout, ${export_drc})
+# export chip files
+export_chip(cell, "${variant_name}", chip_path, layout, ${export_drc})
 
 #TEMPLATE_IMPORT#
 
+"""
+
+# Template for the worker script that creates and exports chips during mask generation.
+#
+# This is used in _get_worker_script() to create the script that every worker process of the ChipWorkerPool in
+# add_chips() runs. The worker reads ChipJob objects from stdin, builds and exports each chip by running the chip
+# template substituted for the job, and reports the results on stdout.
+
+_CHIP_WORKER_TEMPLATE = """
+
+import json
+import logging
+import os
+import sys
+import traceback
+from string import Template
+from kqcircuits.masks.chip_worker import JOB_RESULT_MARKER, read_job
+from kqcircuits.pya_resolver import pya
+
+chip_template = Template(${chip_template})
+substitution_parameters = ${substitution_parameters}
+
+
+def build_chip(job, layout):
+    chip_class = job.chip_class.__name__
+    script = chip_template.substitute({
+        'variant_name': job.variant_name,
+        'chip_class': chip_class,
+        'element_import': f'from {job.chip_class.__module__} import {chip_class}',
+        'create_element': f'cell = {chip_class}.create(layout, **parameters)',
+        **substitution_parameters
+    })
+    exec(compile(script, f"{job.variant_name}.py", "exec"), {'layout': layout, 'parameters': job.parameters})
+
+
+try:
+    logging.basicConfig(level=logging.DEBUG)  # this level is NOT actually used
+
+    jobs_stream = os.fdopen(0, "rb")
+    while True:
+        job = read_job(jobs_stream)
+        if job is None:
+            break
+        layout = pya.Layout()
+        try:
+            build_chip(job, layout)
+            result = {"error": None}
+        except Exception as err:
+            result = {"error": traceback.format_exc()}
+        finally:
+            for handler in logging.getLogger().handlers:
+                handler.close()
+            layout._destroy()
+        sys.stdout.flush()
+        os.write(1, f"{os.linesep}{JOB_RESULT_MARKER}{json.dumps(result)}{os.linesep}".encode("UTF-8"))
+
 except Exception as err:
     print(traceback.format_exc(), file=sys.stderr)
     pya.Application.instance().exit(1)
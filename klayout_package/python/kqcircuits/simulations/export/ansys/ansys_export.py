@@ -24,6 +24,7 @@ from pathlib import Path
 
 from kqcircuits.util.export_helper import write_commit_reference_file
 from kqcircuits.util.geometry_json_encoder import GeometryJsonEncoder
+from kqcircuits.simulations.export.export_manifest import ExportManifest, simulation_digest
 from kqcircuits.simulations.export.util import export_layers
 from kqcircuits.defaults import ANSYS_SCRIPT_PATHS
 from kqcircuits.simulations.simulation import Simulation
@@ -48,7 +49,7 @@ def export_ansys_json(simulation: Simulation, path: Path, ansys_tool='hfss',
                       sweep_enabled=True, sweep_start=0, sweep_end=10, sweep_count=101, sweep_type='interpolating',
                       max_delta_f=0.1, n_modes=2, gap_max_element_length=None, substrate_loss_tangent=0,
                       participation_sheet_distance=None, thicken_participation_sheet_distance=None,
-                      dielectric_surfaces=None, simulation_flags=None, ansys_project_template=None):
+                      dielectric_surfaces=None, simulation_flags=None, ansys_project_template=None, manifest=None):
     r"""
     Export Ansys simulation into json and gds files.
 
@@ -96,6 +97,8 @@ def export_ansys_json(simulation: Simulation, path: Path, ansys_tool='hfss',
                 },
         simulation_flags: Optional export processing, given as list of strings
         ansys_project_template: path to the simulation template
+        manifest: ExportManifest. If given, the files are not written if the manifest reports them unchanged, and the
+            hash of the simulation is recorded in the manifest otherwise.
 
     Returns:
          Path to exported json file.
@@ -139,18 +142,25 @@ def export_ansys_json(simulation: Simulation, path: Path, ansys_tool='hfss',
     if ansys_project_template is not None:
         json_data['ansys_project_template'] = ansys_project_template
 
-    # write .json file
     json_filename = str(path.joinpath(simulation.name + '.json'))
+    gds_filename = str(path.joinpath(simulation.name + '.gds'))
+    if manifest is not None:
+        digest = simulation_digest(simulation, json_data)
+        if manifest.is_unchanged(simulation.name, digest, [json_filename, gds_filename]):
+            return json_filename
+
+    # write .json file
     with open(json_filename, 'w') as fp:
         json.dump(json_data, fp, cls=GeometryJsonEncoder, indent=4)
 
     # write .gds file
-    gds_filename = str(path.joinpath(simulation.name + '.gds'))
     export_layers(gds_filename, simulation.layout, [simulation.cell],
                   output_format='GDS2',
                   layers=layers.values()
                   )
 
+    if manifest is not None:
+        manifest.set(simulation.name, digest)
     return json_filename
 
 
@@ -237,7 +247,7 @@ def export_ansys(simulations, path: Path, ansys_tool='hfss', import_script_folde
                  ansys_executable=r"%PROGRAMFILES%\AnsysEM\v222\Win64\ansysedt.exe",
                  import_script='import_and_simulate.py', post_process_script='export_batch_results.py',
                  intermediate_processing_command=None, use_rel_path=True, simulation_flags=None,
-                 ansys_project_template=None, skip_errors=False):
+                 ansys_project_template=None, skip_errors=False, incremental=False):
     r"""
     Export Ansys simulations by writing necessary scripts and json, gds, and bat files.
 
@@ -306,15 +316,20 @@ def export_ansys(simulations, path: Path, ansys_tool='hfss', import_script_folde
                **Use this carefully**, some of your simulations might not make sense physically and
                you might end up wasting time on bad simulations.
 
+        incremental: Leave the files of simulations that are unchanged since the previous export untouched and
+            include only new or changed simulations in the bat file. The hashes of the exported simulations are stored
+            in ``export_manifest.json`` in ``path``. Default is False.
+
     Returns:
         Path to exported bat file.
     """
     write_commit_reference_file(path)
     copy_ansys_scripts_to_directory(path, import_script_folder=import_script_folder)
+    manifest = ExportManifest(path) if incremental else None
     json_filenames = []
     for simulation in simulations:
         try:
-            json_filenames.append(export_ansys_json(simulation, path, ansys_tool=ansys_tool,
+            json_filename = export_ansys_json(simulation, path, ansys_tool=ansys_tool,
                                             frequency_units=frequency_units, frequency=frequency,
                                             max_delta_s=max_delta_s, percent_error=percent_error,
                                             percent_refinement=percent_refinement,
@@ -329,7 +344,10 @@ def export_ansys(simulations, path: Path, ansys_tool='hfss', import_script_folde
                                             thicken_participation_sheet_distance=thicken_participation_sheet_distance,
                                             dielectric_surfaces=dielectric_surfaces,
                                             simulation_flags=simulation_flags,
-                                            ansys_project_template=ansys_project_template))
+                                            ansys_project_template=ansys_project_template,
+                                            manifest=manifest)
+            if manifest is None or simulation.name in manifest.changed:
+                json_filenames.append(json_filename)
         except (IndexError, ValueError, Exception) as e:  # pylint: disable=broad-except
             if skip_errors:
                 logging.warning(
@@ -344,6 +362,8 @@ def export_ansys(simulations, path: Path, ansys_tool='hfss', import_script_folde
                     'geometry files.'
                 ) from e
 
+    if manifest is not None:
+        manifest.write()
     return export_ansys_bat(json_filenames, path, file_prefix=file_prefix, exit_after_run=exit_after_run,
                             ansys_executable=ansys_executable, import_script_folder=import_script_folder,
                             import_script=import_script, post_process_script=post_process_script,
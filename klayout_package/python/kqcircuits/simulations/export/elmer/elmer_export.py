@@ -24,6 +24,7 @@ import json
 from pathlib import Path
 from distutils.dir_util import copy_tree
 
+from kqcircuits.simulations.export.export_manifest import ExportManifest, simulation_digest
 from kqcircuits.simulations.export.util import export_layers
 from kqcircuits.util.export_helper import write_commit_reference_file
 from kqcircuits.defaults import ELMER_SCRIPT_PATHS
@@ -50,7 +51,8 @@ def export_elmer_json(simulation: Simulation,
                       p_element_order=1,
                       frequency=5,
                       mesh_size=None,
-                      workflow=None):
+                      workflow=None,
+                      manifest=None):
     """
     Export Elmer simulation into json and gds files.
 
@@ -63,6 +65,8 @@ def export_elmer_json(simulation: Simulation,
         frequency: Units are in GHz. To set up multifrequency analysis, use list of numbers.
         mesh_size(dict): Parameters to determine mesh element sizes
         workflow(dict): Parameters for simulation workflow
+        manifest(ExportManifest): If given, the files are not written if the manifest reports them unchanged, and the
+            hash of the simulation is recorded in the manifest otherwise.
 
     Returns:
          Path to exported json file.
@@ -83,16 +87,23 @@ def export_elmer_json(simulation: Simulation,
         'frequency': frequency,
     }
 
-    # write .json file
     json_filename = str(path.joinpath(simulation.name + '.json'))
+    gds_filename = str(path.joinpath(simulation.name + '.gds'))
+    if manifest is not None:
+        digest = simulation_digest(simulation, json_data)
+        if manifest.is_unchanged(simulation.name, digest, [json_filename, gds_filename]):
+            return json_filename
+
+    # write .json file
     with open(json_filename, 'w') as fp:
         json.dump(json_data, fp, cls=GeometryJsonEncoder, indent=4)
 
     # write .gds file
-    gds_filename = str(path.joinpath(simulation.name + '.gds'))
     export_layers(gds_filename, simulation.layout, [simulation.cell], output_format='GDS2',
                   layers=layers.values())
 
+    if manifest is not None:
+        manifest.set(simulation.name, digest)
     return json_filename
 
 
@@ -126,8 +137,12 @@ def export_elmer_script(json_filenames, path: Path, workflow=None, file_prefix='
     main_script_filename = str(path.joinpath(file_prefix + '.sh'))
     with open(main_script_filename, 'w') as main_file:
 
-        if parallelize_workload and not sbatch:
-            main_file.write('{} scripts/simple_workload_manager.py {}'.format(python_executable, workflow['n_workers']))
+        if parallelize_workload and not sbatch and json_filenames:
+            # the stage scheduler uses the cores of n_workers simultaneous simulations
+            elmer_n_processes = workflow.get('elmer_n_processes', 1)
+            n_cores = -1 if elmer_n_processes == -1 else workflow['n_workers'] * elmer_n_processes
+            main_file.write('{} scripts/stage_scheduler.py {} --script "{}"'.format(python_executable, n_cores,
+                                                                                   script_file))
 
         script_filenames = []
         for i, json_filename in enumerate(json_filenames):
@@ -240,8 +255,8 @@ def export_elmer_script(json_filenames, path: Path, workflow=None, file_prefix='
                 main_file.write('echo "--------------------------------------------"\n')
                 main_file.write('sbatch "{}"\n'.format(Path(script_filename).relative_to(path)))
             elif parallelize_workload:
-                main_file.write(' "./{}"'.format(
-                    Path(script_filename).relative_to(path))
+                main_file.write(' "{}"'.format(
+                    Path(json_filename).relative_to(path))
                 )
             else:
                 main_file.write('echo "Submitting the main script of simulation {}/{}"\n'
@@ -266,7 +281,8 @@ def export_elmer(simulations: [],
                  script_file='scripts/run.py',
                  mesh_size=None,
                  workflow=None,
-                 skip_errors=False):
+                 skip_errors=False,
+                 incremental=False):
     """
     Exports an elmer simulation model to the simulation path.
 
@@ -289,17 +305,24 @@ def export_elmer(simulations: [],
                **Use this carefully**, some of your simulations might not make sense physically and
                you might end up wasting time on bad simulations.
 
+        incremental(bool): Leave the files of simulations that are unchanged since the previous export untouched and
+            include only new or changed simulations in the script. The hashes of the exported simulations are stored
+            in ``export_manifest.json`` in the simulation path. (Default: False)
+
     Returns:
 
         Path to exported script file.
     """
     write_commit_reference_file(path)
     copy_elmer_scripts_to_directory(path)
+    manifest = ExportManifest(path) if incremental else None
     json_filenames = []
     for simulation in simulations:
         try:
-            json_filenames.append(export_elmer_json(simulation, path, tool, linear_system_method,
-                                                    p_element_order, frequency, mesh_size, workflow))
+            json_filename = export_elmer_json(simulation, path, tool, linear_system_method, p_element_order,
+                                              frequency, mesh_size, workflow, manifest)
+            if manifest is None or simulation.name in manifest.changed:
+                json_filenames.append(json_filename)
         except (IndexError, ValueError, Exception) as e:  # pylint: disable=broad-except
             if skip_errors:
                 logging.warning(
@@ -314,4 +337,6 @@ def export_elmer(simulations: [],
                     'geometry files.'
                 ) from e
 
+    if manifest is not None:
+        manifest.write()
     return export_elmer_script(json_filenames, path, workflow, file_prefix=file_prefix, script_file=script_file)
@@ -0,0 +1,103 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Hashes of exported simulations for incremental simulation export.
+
+A simulation is identified by a hash of the data exported for it, like the contents of its json file, and of the
+polygons on its simulation layers. The hashes are stored in ``export_manifest.json`` in the export directory, so that
+an incremental export can leave the files of unchanged simulations untouched and run only new or changed simulations.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from kqcircuits.util.geometry_json_encoder import GeometryJsonEncoder
+
+EXPORT_MANIFEST_FILENAME = "export_manifest.json"
+
+
+class _HashEncoder(GeometryJsonEncoder):
+    """GeometryJsonEncoder that falls back to ``repr`` so that any exported value can be hashed."""
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return repr(o)
+
+
+def simulation_digest(simulation, data):
+    """Returns the hash of ``simulation`` exported with ``data``.
+
+    Args:
+        simulation: the exported simulation
+        data: dictionary of everything else written into the exported files, for example the json file contents
+
+    Returns:
+        hexadecimal sha256 digest of ``data`` and the polygons on the simulation layers of ``simulation``
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(data, cls=_HashEncoder, sort_keys=True).encode())
+    layout = simulation.layout
+    for layer_name, layer_info in sorted(simulation.get_layers().items()):
+        digest.update(layer_name.encode())
+        shape_iter = simulation.cell.begin_shapes_rec(layout.layer(layer_info))
+        while not shape_iter.at_end():
+            polygon = shape_iter.shape().polygon
+            if polygon is not None:
+                digest.update(str(polygon.transformed(shape_iter.trans())).encode())
+            shape_iter.next()
+    return digest.hexdigest()
+
+
+class ExportManifest:
+    """Hashes of the simulations exported into a directory.
+
+    The manifest is read from ``export_manifest.json`` in ``path`` when created and written back by ``write``. Entries
+    of simulations that are not exported again are kept. The manifest is only used by incremental exports.
+
+    Attributes:
+        path: the export directory
+        changed: set of names of the simulations written in this export
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.changed = set()
+        manifest_file = self.path.joinpath(EXPORT_MANIFEST_FILENAME)
+        self._hashes = json.loads(manifest_file.read_text(encoding="utf-8")) if manifest_file.exists() else {}
+
+    def is_unchanged(self, name, digest, filenames):
+        """Returns True if the files of simulation ``name`` can be left as they are.
+
+        Args:
+            name: simulation name
+            digest: hash of the simulation, see ``simulation_digest``
+            filenames: files exported for the simulation, all of them must exist
+        """
+        return self._hashes.get(name) == digest and all(Path(f).exists() for f in filenames)
+
+    def set(self, name, digest):
+        """Records that the files of simulation ``name`` have been written with hash ``digest``."""
+        self._hashes[name] = digest
+        self.changed.add(name)
+
+    def write(self):
+        """Writes the manifest into the export directory."""
+        with open(self.path.joinpath(EXPORT_MANIFEST_FILENAME), 'w', encoding='utf-8') as fp:
+            json.dump(self._hashes, fp, indent=4, sort_keys=True)
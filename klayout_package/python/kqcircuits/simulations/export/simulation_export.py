@@ -16,10 +16,15 @@
 # for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
 
 import logging
+import multiprocessing
+import os
+import tempfile
 from itertools import product
 from pathlib import Path
 
+from kqcircuits.pya_resolver import pya
 from kqcircuits.simulations.export.util import export_layers
+from kqcircuits.util.geometry_pickler import dumps, loads
 
 
 def export_simulation_oas(simulations, path: Path, file_prefix='simulation'):
@@ -38,9 +43,12 @@ def export_simulation_oas(simulations, path: Path, file_prefix='simulation'):
     return oas_filename
 
 
-def sweep_simulation(layout, sim_class, sim_parameters, sweeps):
-    """Create simulation sweep by varying one parameter at time. Return list of simulations."""
-    simulations = []
+def sweep_simulation(layout, sim_class, sim_parameters, sweeps, processes=1):
+    """Create simulation sweep by varying one parameter at time. Return list of simulations.
+
+    If ``processes`` is larger than one, the simulations are built in parallel, see ``build_simulations``.
+    """
+    parameter_sets = []
     lengths = [len(l) for l in sweeps.values()]
     logging.info(f'Added simulations: {" + ".join([str(l) for l in lengths])} = {sum(lengths)}')
     for param in sweeps:
@@ -51,13 +59,16 @@ def sweep_simulation(layout, sim_class, sim_parameters, sweeps):
                             param,
                             str(value)
                           )}
-            simulations.append(sim_class(layout, **parameters))
-    return simulations
+            parameter_sets.append(parameters)
+    return build_simulations(layout, sim_class, parameter_sets, processes)
 
 
-def cross_sweep_simulation(layout, sim_class, sim_parameters, sweeps):
-    """Create simulation sweep by cross varying all parameters. Return list of simulations."""
-    simulations = []
+def cross_sweep_simulation(layout, sim_class, sim_parameters, sweeps, processes=1):
+    """Create simulation sweep by cross varying all parameters. Return list of simulations.
+
+    If ``processes`` is larger than one, the simulations are built in parallel, see ``build_simulations``.
+    """
+    parameter_sets = []
     keys = list(sweeps)
     sets = [list(prod) for prod in product(*sweeps.values())]
     logging.info(f'Added simulations: {" * ".join([str(len(l)) for l in sweeps.values()])} = {len(sets)}')
@@ -67,5 +78,83 @@ def cross_sweep_simulation(layout, sim_class, sim_parameters, sweeps):
             parameters[key] = values[i]
         parameters['name'] = sim_parameters['name'] + '_' \
             + '_'.join([str(value) for value in values])
-        simulations.append(sim_class(layout, **parameters))
+        parameter_sets.append(parameters)
+    return build_simulations(layout, sim_class, parameter_sets, processes)
+
+
+def build_simulations(layout, sim_class, parameter_sets, processes=1):
+    """Create one simulation of ``sim_class`` into ``layout`` for each dictionary in ``parameter_sets``.
+
+    If ``processes`` is larger than one and the platform supports forking processes, the simulations are built
+    concurrently by forked worker processes, each in its own copy of ``layout``. A worker writes the cell hierarchy of
+    its simulation into an OASIS file and returns the polygons of the simulation cell and the parameters, ports and
+    refpoints of the simulation pickled with ``GeometryPickler``. The polygons are not written to OASIS, because it can
+    not represent polygons with holes exactly. The parent then copies the cells into ``layout`` and restores the
+    simulation objects with ``Simulation.from_built_cell`` in the order of ``parameter_sets``, so the simulation cells
+    get the same names and geometry as when built serially. The cells are copied as static cells, so unlike in the
+    serial build, PCell variants are not shared between the simulations.
+
+    Args:
+        layout: the layout on which to create the simulations
+        sim_class: the simulation class
+        parameter_sets: list of parameter dictionaries given to ``sim_class``
+        processes: number of worker processes, by default the simulations are built serially
+
+    Returns:
+        list of simulations in the order of ``parameter_sets``
+    """
+    if processes <= 1 or len(parameter_sets) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return [sim_class(layout, **parameters) for parameters in parameter_sets]
+
+    global _forked_sweep  # pylint: disable=global-statement
+    with tempfile.TemporaryDirectory(prefix="kqc_sweep_") as tmp_dir:
+        _forked_sweep = (layout, sim_class, parameter_sets, tmp_dir)
+        try:
+            with multiprocessing.get_context("fork").Pool(min(processes, len(parameter_sets))) as pool:
+                results = pool.map(_build_forked_simulation, range(len(parameter_sets)), chunksize=1)
+        finally:
+            _forked_sweep = None
+
+        simulations = []
+        for index, (cell_name, data) in enumerate(results):
+            polygons, parameters, ports, refpoints = loads(data)
+            simulation_layout = pya.Layout()
+            simulation_layout.read(os.path.join(tmp_dir, f"{index}.oas"))
+            cell = layout.create_cell(parameters["name"])
+            cell.copy_tree(simulation_layout.cell(cell_name))
+            for layer_info, layer_polygons in polygons:
+                shapes = cell.shapes(layout.layer(layer_info))
+                for polygon in layer_polygons:
+                    shapes.insert(polygon)
+            simulations.append(sim_class.from_built_cell(cell, ports, refpoints, **parameters))
     return simulations
+
+
+# Arguments of the ongoing parallel build_simulations call. Forked worker processes inherit these with the layout.
+_forked_sweep = None
+
+
+def _build_forked_simulation(index):
+    """Builds simulation ``index`` of ``_forked_sweep`` and writes its cells into an OASIS file in the temporary folder.
+
+    Returns:
+        tuple of the name of the simulation cell and pickled tuple of the polygons moved out of the simulation cell, as
+        list of (LayerInfo, list of Polygon), and the parameters, ports and refpoints of the simulation
+    """
+    layout, sim_class, parameter_sets, tmp_dir = _forked_sweep
+    simulation = sim_class(layout, **parameter_sets[index])
+    polygons = []
+    for layer_index in layout.layer_indexes():
+        shapes = simulation.cell.shapes(layer_index)
+        polygon_shapes = list(shapes.each(pya.Shapes.SPolygons))
+        if polygon_shapes:
+            polygons.append((layout.get_info(layer_index), [shape.polygon for shape in polygon_shapes]))
+            for shape in polygon_shapes:
+                shapes.erase(shape)
+    svopt = pya.SaveLayoutOptions()
+    svopt.format = "OASIS"
+    svopt.write_context_info = False
+    svopt.clear_cells()
+    svopt.add_cell(simulation.cell.cell_index())
+    layout.write(os.path.join(tmp_dir, f"{index}.oas"), svopt)
+    return simulation.cell.name, dumps((polygons, simulation.get_parameters(), simulation.ports, simulation.refpoints))
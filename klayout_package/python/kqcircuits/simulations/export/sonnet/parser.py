@@ -16,16 +16,40 @@
 # for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
 
 
+import io
 import logging
+from itertools import islice
 from string import Template
 
+import numpy as np
+
 
 def apply_template(filename_template, filename_output, rules):
+    """Writes ``filename_template`` into ``filename_output`` with the ``$``-placeholders substituted by ``rules``.
+
+    The output is written section by section through a buffered file. A rule can be a function taking the output file
+    as argument, in which case the function writes the section itself, so that large sections like the polygons are
+    never held in memory as a whole.
+    """
     with open(filename_template) as filein:
-        src = Template(filein.read())
-    results = src.substitute(rules)
-    with open(filename_output, "w") as fileout:
-        fileout.write(results)
+        template = filein.read()
+    with open(filename_output, "w", buffering=1 << 20) as fileout:
+        position = 0
+        for match in Template.pattern.finditer(template):
+            fileout.write(template[position:match.start()])
+            position = match.end()
+            if match.group("escaped") is not None:
+                fileout.write(Template.delimiter)
+                continue
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                raise ValueError(f"Invalid placeholder in template {filename_template} at position {match.start()}")
+            rule = rules[name]
+            if callable(rule):
+                rule(fileout)
+            else:
+                fileout.write(str(rule))
+        fileout.write(template[position:])
     # dirname_sondata = os.path.join(os.path.dirname(filename_output), "sondata")
     # if not os.path.exists(dirname_sondata):
     #     os.mkdir(dirname_sondata)
@@ -157,25 +181,49 @@ def control(control_type):
 
 
 def polygons(polygons, v, dbu, ilevel, fill_type):
-    sonnet_str = 'NUM {}\n'.format(len(polygons))
+    sonnet_str = io.StringIO()
+    write_polygons(sonnet_str, polygons, v, dbu, ilevel, fill_type)
+    return sonnet_str.getvalue()
+
+
+def write_polygons(fileout, polygons, v, dbu, ilevel, fill_type):
+    """Writes the polygon section into ``fileout`` one polygon at a time, see ``polygons``."""
+    fileout.write('NUM {}\n'.format(len(polygons)))
     for i, hole_poly in enumerate(polygons):
         poly = hole_poly.resolved_holes()
 
         if hasattr(poly, 'isVia'):
-            sonnet_str += via(poly, debugid=i, ilevel=next(ilevel))
+            fileout.write(via(poly, debugid=i, ilevel=next(ilevel)))
         else:
-            sonnet_str += polygon_head(nvertices=poly.num_points_hull() + 1,
-                                   debugid=i + 1, ilevel=next(ilevel),
-                                   filltype=fill_type)  # "Debugid" is actually used for mapping ports to polygons, 0 is
-                                                        # not allowed
-
-        for _, point in enumerate(poly.each_point_hull()):
-            sonnet_str += "{} {}\n".format(point.x * dbu + v.x,
-                                           -(point.y * dbu + v.y))  # sonnet Y-coordinate goes in the other direction
-        point = next(poly.each_point_hull())  # first point again to close the polygon
-        sonnet_str += "{} {}\nEND\n".format(point.x * dbu + v.x, -(point.y * dbu + v.y))
-
-    return sonnet_str
+            fileout.write(polygon_head(nvertices=poly.num_points_hull() + 1,
+                                       debugid=i + 1, ilevel=next(ilevel),
+                                       filltype=fill_type))  # "Debugid" is actually used for mapping ports to
+                                                             # polygons, 0 is not allowed
+        write_polygon_points(fileout, poly, v, dbu)
+        fileout.write("END\n")
+
+
+def write_polygon_points(fileout, poly, v, dbu, chunk_size=65536):
+    """Writes the hull points of ``poly`` into ``fileout`` in Sonnet coordinates, one point per line.
+
+    The first point is repeated at the end to close the polygon. The points are transformed with NumPy in chunks of
+    ``chunk_size`` points and formatted with the shortest ``repr`` of each float, the same as formatting them one by
+    one.
+    """
+    def write_points(points):
+        points = np.array(points, dtype=float).reshape(-1, 2)
+        xs = points[:, 0] * dbu + v.x
+        ys = -(points[:, 1] * dbu + v.y)  # sonnet Y-coordinate goes in the other direction
+        fileout.write("".join([f"{x} {y}\n" for x, y in zip(xs.tolist(), ys.tolist())]))
+
+    hull = poly.each_point_hull()
+    first_point = None
+    for _ in range(0, poly.num_points_hull(), chunk_size):
+        # the number of chunks is fixed in advance, because the iterator must not be used after it is exhausted
+        points = [(point.x, point.y) for point in islice(hull, chunk_size)]
+        first_point = first_point or points[0]
+        write_points(points)
+    write_points([first_point])  # first point again to close the polygon
 
 
 def via(poly, debugid, ilevel):
@@ -16,25 +16,36 @@
 # for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
 
 
+import hashlib
 import os.path
+from functools import lru_cache
 from pathlib import Path
 
+from kqcircuits import __version__
 from kqcircuits.pya_resolver import pya
 from kqcircuits.defaults import default_layers
+from kqcircuits.simulations.export.export_manifest import ExportManifest, simulation_digest
 from kqcircuits.simulations.export.sonnet import parser
-from kqcircuits.simulations.export.util import find_edge_from_point_in_polygons
+from kqcircuits.simulations.export.util import EdgeIndex
 from kqcircuits.simulations.port import InternalPort, EdgePort
 from kqcircuits.simulations.simulation import Simulation
 from kqcircuits.util.export_helper import write_commit_reference_file
 
 
-def poly_and_edge_indices(polygons, dbu, port, number, location, group):
-    i, j, _ = find_edge_from_point_in_polygons(
-        polygons,
-        location,
-        dbu,
-        tolerance=5.0  # hardcoded, feel free to change
-        )
+_TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(parser.__file__)), "template.son")
+
+
+@lru_cache(maxsize=None)
+def _exporter_digest():
+    """Returns the hash of the son file template, the exporter sources and the KQCircuits version."""
+    digest = hashlib.sha256(__version__.encode())
+    for file in (_TEMPLATE_FILE, __file__, parser.__file__):
+        digest.update(Path(file).read_bytes())
+    return digest.hexdigest()
+
+
+def poly_and_edge_indices(edge_index, port, number, location, group):
+    i, j, _ = edge_index.find_edge(location)
 
     return parser.port(
         portnum=number,
@@ -50,7 +61,7 @@ def poly_and_edge_indices(polygons, dbu, port, number, location, group):
 
 
 def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=False, lower_accuracy=False, current=False,
-                      control='ABS', fill_type='Staircase', simulation_safety=0):
+                      control='ABS', fill_type='Staircase', simulation_safety=0, manifest=None):
     """
     Export simulation into son file.
 
@@ -68,6 +79,8 @@ def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=Fal
         control: Selects what analysis control is used in Sonnet. Options are 'Simple', 'ABS' and 'Sweep' for parameter
             sweeping.
         simulation_safety: Adds extra ground area to a simulation environment (in µm).
+        manifest: ExportManifest. If given, the son file is not written if the manifest reports it unchanged, and the
+            hash of the simulation is recorded in the manifest otherwise.
 
     Returns:
         Path to exported son file.
@@ -75,6 +88,17 @@ def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=Fal
     if simulation is None or not isinstance(simulation, Simulation):
         raise ValueError("Cannot export without simulation")
 
+    son_filename = str(path.joinpath(simulation.name + '.son'))
+    if manifest is not None:
+        digest = simulation_digest(simulation, {
+            'sonnet': [detailed_resonance, lower_accuracy, current, control, fill_type, simulation_safety],
+            'ports': [port.as_dict() for port in simulation.ports],
+            'parameters': simulation.get_parameters(),
+            'exporter': _exporter_digest(),
+        })
+        if manifest.is_unchanged(simulation.name, digest, [son_filename]):
+            return son_filename
+
     def get_sonnet_strings(material_type, grid_size, symmetry):
         layout = simulation.cell.layout()
         dbu = layout.dbu
@@ -93,13 +117,15 @@ def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=Fal
         level_iter = iter(len(simpolygons) * [(2 if material_type == "Si+Al" else 0)] +
                           len(airbridge_polygons) * [1] + len(airpads_polygons) * [2])
 
-        polys = parser.polygons(simpolygons + airbridge_polygons + airpads_polygons,
-                                pya.DVector(-simulation.box.p1.x, -simulation.box.p2.y), dbu,
-                                # get the bottom left corner
-                                ilevel=level_iter, fill_type=("V" if (fill_type == "Conformal") else "N")
-                                )
+        def polys(fileout):
+            parser.write_polygons(fileout, simpolygons + airbridge_polygons + airpads_polygons,
+                                  pya.DVector(-simulation.box.p1.x, -simulation.box.p2.y), dbu,
+                                  # get the bottom left corner
+                                  ilevel=level_iter, fill_type=("V" if (fill_type == "Conformal") else "N")
+                                  )
 
         # find port edges
+        edge_index = EdgeIndex(simpolygons + airbridge_polygons, dbu, tolerance=5.0)  # hardcoded, feel free to change
         sstring_ports = ""
         refplane_dirs = []
         port_ipolys = []
@@ -110,11 +136,9 @@ def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=Fal
             for port in simulation.ports:
                 if isinstance(port, InternalPort):
                     sstring_ports += poly_and_edge_indices(
-                        simpolygons + airbridge_polygons, dbu,
-                        port, port.number, port.signal_location, chr(group_ascii))
+                        edge_index, port, port.number, port.signal_location, chr(group_ascii))
                     sstring_ports += poly_and_edge_indices(
-                        simpolygons + airbridge_polygons, dbu,
-                        port, -port.number, port.ground_location, chr(group_ascii))
+                        edge_index, port, -port.number, port.ground_location, chr(group_ascii))
                     calgroup += 'CUPGRP "{}"\nID 28\nGNDREF F\nTWTYPE FEED\nEND\n'.format(chr(group_ascii))
                     group_ascii += 1
                 elif isinstance(port, EdgePort):
@@ -125,8 +149,7 @@ def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=Fal
                     #     logging.info(re.findall(r'POLY (\d+)', ipoly))
                     #     port_ipolys.append(re.findall(r'POLY (\d+)', ipoly)) # scan ipolygon
                     sstring_ports += poly_and_edge_indices(
-                        simpolygons + airbridge_polygons, dbu,
-                        port, port.number, port.signal_location, "")
+                        edge_index, port, port.number, port.signal_location, "")
 
         sonnet_box = parser.box(
             xwidth=simulation.box.width(),
@@ -157,17 +180,18 @@ def export_sonnet_son(simulation: Simulation, path: Path, detailed_resonance=Fal
     sonnet_strings = get_sonnet_strings(materials_type, 1, False)
     sonnet_strings["control"] = parser.control(control)
 
-    son_filename = str(path.joinpath(simulation.name + '.son'))
     parser.apply_template(
-        os.path.join(os.path.dirname(os.path.abspath(parser.__file__)), "template.son"),
+        _TEMPLATE_FILE,
         son_filename,
         sonnet_strings
     )
+    if manifest is not None:
+        manifest.set(simulation.name, digest)
     return son_filename
 
 
 def export_sonnet(simulations, path: Path, detailed_resonance=False, lower_accuracy=False, current=False, control='ABS',
-                  fill_type='Staircase', simulation_safety=0):
+                  fill_type='Staircase', simulation_safety=0, incremental=False):
     """
     Export Sonnet simulations by writing son files.
 
@@ -185,14 +209,20 @@ def export_sonnet(simulations, path: Path, detailed_resonance=False, lower_accur
         control: Selects what analysis control is used in Sonnet. Options are 'Simple', 'ABS' and 'Sweep' for parameter
             sweeping.
         simulation_safety: Adds extra ground area to a simulation environment (in µm).
+        incremental: Leave the son files of simulations that are unchanged since the previous export untouched. The
+            hashes of the exported simulations are stored in ``export_manifest.json`` in ``path``.
 
     Returns:
         List of paths to exported son files.
     """
     write_commit_reference_file(path)
+    manifest = ExportManifest(path) if incremental else None
     son_filenames = []
     for simulation in simulations:
         son_filenames.append(export_sonnet_son(simulation, path, detailed_resonance=detailed_resonance,
                                                lower_accuracy=lower_accuracy, current=current, control=control,
-                                               fill_type=fill_type, simulation_safety=simulation_safety))
+                                               fill_type=fill_type, simulation_safety=simulation_safety,
+                                               manifest=manifest))
+    if manifest is not None:
+        manifest.write()
     return son_filenames
@@ -17,6 +17,7 @@
 
 
 from typing import List
+import numpy as np
 from kqcircuits.pya_resolver import pya
 from kqcircuits.defaults import default_output_format
 
@@ -39,28 +40,106 @@ def export_layers(filename, layout, cells=None, layers=None, output_format=defau
     layout.write(filename, svopt)
 
 
+class EdgeIndex:
+    """Spatial index of the edges of a list of polygons for finding the edge closest to a point.
+
+    The edges are bucketed into a uniform grid by their midpoints. The grid cell size equals the search tolerance, so
+    a query only inspects the edges in the cells around the point instead of all edges of all polygons.
+
+    Attributes:
+        dbu: database unit of the polygons
+        tolerance: maximum distance in µm between a point and the midpoint of the edge found for it
+    """
+
+    def __init__(self, polygons: List[pya.Polygon], dbu, tolerance=0.01):
+        self.dbu = dbu
+        self.tolerance = tolerance
+        points, next_ids, edge_ids, polygon_ids = [], [], [], []
+        num_points = 0
+        for i, polygon in enumerate(polygons):
+            polygon_points = _polygon_points(polygon)
+            # edge k of a polygon goes from point k to the next point of the same contour
+            lengths = [polygon.num_points_hull()] + [polygon.num_points_hole(h) for h in range(polygon.holes())]
+            ends = np.cumsum(lengths)
+            polygon_next_ids = np.arange(1, len(polygon_points) + 1)
+            polygon_next_ids[ends[ends > 0] - 1] = ends[ends > 0] - np.array(lengths)[ends > 0]
+            points.append(polygon_points)
+            next_ids.append(polygon_next_ids + num_points)
+            edge_ids.append(np.arange(len(polygon_points)))
+            polygon_ids.append(np.full(len(polygon_points), i))
+            num_points += len(polygon_points)
+        self._points = np.concatenate(points) if points else np.zeros((0, 2), dtype=np.int64)
+        self._next_ids = np.concatenate(next_ids) if next_ids else np.zeros(0, dtype=np.int64)
+        self._edge_ids = np.concatenate(edge_ids) if edge_ids else np.zeros(0, dtype=np.int64)
+        self._polygon_ids = np.concatenate(polygon_ids) if polygon_ids else np.zeros(0, dtype=np.int64)
+        self._midpoints = (self._points + self._points[self._next_ids]) * (dbu / 2)
+        # the grid is stored as the edge indices sorted by the key of their grid cell
+        keys = self._cell_keys(np.floor(self._midpoints / tolerance).astype(np.int64))
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+
+    @classmethod
+    def from_cell(cls, cell: pya.Cell, layer: int, dbu, tolerance=0.01):
+        """Returns the edge index of the polygons on ``layer`` in ``cell``."""
+        return cls([shape.polygon for shape in cell.shapes(layer).each(pya.Shapes.SPolygons)], dbu, tolerance)
+
+    def find_edge(self, point: pya.DPoint):
+        """
+        Finds the edge closest to a point, and returns the edge as well as it's polygon and edge index
+
+        Raises:
+            ValueError: if no edge midpoint is within ``tolerance`` from the point
+        """
+        cell = np.floor(np.array([[point.x, point.y]]) / self.tolerance).astype(np.int64)
+        keys = self._cell_keys(cell + np.array([(x, y) for x in (-1, 0, 1) for y in (-1, 0, 1)]))
+        starts = np.searchsorted(self._keys, keys, side="left")
+        ends = np.searchsorted(self._keys, keys, side="right")
+        candidates = np.sort(np.concatenate([self._order[start:end] for start, end in zip(starts, ends)]))
+        if len(candidates) > 0:
+            sq_distances = np.sum((self._midpoints[candidates] - (point.x, point.y)) ** 2, axis=1)
+            nearest = np.argmin(sq_distances)  # the first minimum has the lowest polygon and edge index
+            if sq_distances[nearest] < self.tolerance ** 2:
+                k = candidates[nearest]
+                return int(self._polygon_ids[k]), int(self._edge_ids[k]), self._edge(k)
+
+        if len(self._midpoints) == 0:
+            raise ValueError(f"No edge found at {point=}, there are no edges")
+        sq_distances = np.sum((self._midpoints - (point.x, point.y)) ** 2, axis=1)
+        nearest = np.argmin(sq_distances)
+        nearest_edge = self._edge(nearest)
+        raise ValueError(f"No edge found at {point=}, {nearest_edge=}, sq_distance={sq_distances[nearest]}")
+
+    @staticmethod
+    def _cell_keys(cells):
+        return cells[:, 0] * (1 << 32) + cells[:, 1]
+
+    def _edge(self, k):
+        p1, p2 = self._points[k], self._points[self._next_ids[k]]
+        return pya.Edge(int(p1[0]), int(p1[1]), int(p2[0]), int(p2[1])).to_dtype(self.dbu)
+
+
+def _polygon_points(polygon: pya.Polygon):
+    """Returns the points of the hull and holes of ``polygon`` as an integer array in the order of ``each_edge``."""
+    contours = [polygon.each_point_hull()] + [polygon.each_point_hole(h) for h in range(polygon.holes())]
+    return np.array([(p.x, p.y) for contour in contours for p in contour], dtype=np.int64).reshape(-1, 2)
+
+
 def find_edge_from_point_in_cell(cell: pya.Cell, layer: int, point: pya.DPoint, dbu, tolerance=0.01):
     """
     Finds the edge closest to a point, and returns the edge as well as it's polygon and edge index
+
+    To find edges for many points, use ``EdgeIndex.from_cell`` instead.
     """
-    return find_edge_from_point_in_polygons(cell.shapes(layer).each(pya.Shapes.SPolygons), point, dbu, tolerance)
+    return EdgeIndex.from_cell(cell, layer, dbu, tolerance).find_edge(point)
 
 
 def find_edge_from_point_in_polygons(polygons: List[pya.Polygon], point: pya.DPoint, dbu, tolerance=0.01):
     """
     Finds the edge closest to a point, and returns the edge as well as it's polygon and edge index
+
+    To find edges for many points, use ``EdgeIndex`` instead.
     """
-    # Find closest edge to point
-    edges = [(i, j, edge.to_dtype(dbu))
-             for (i, polygon) in enumerate(polygons)
-             for (j, edge) in enumerate(polygon.each_edge())
-             ]
-    (sq_distance, i, j, nearest_edge) = \
-        sorted([(((edge.p1 + edge.p2)/2).sq_distance(point), i, j, edge) for (i, j, edge) in edges])[0]
-    if sq_distance < tolerance**2:
-        return i, j, nearest_edge
-    else:
-        raise ValueError(f"No edge found at {point=}, {nearest_edge=}, {sq_distance=}")
+    return EdgeIndex(polygons, dbu, tolerance).find_edge(point)
 
 
 def get_enclosing_polygon(points: List[List[float]]):
@@ -30,7 +30,7 @@ from kqcircuits.pya_resolver import pya
 from kqcircuits.simulations.port import Port, InternalPort, EdgePort
 from kqcircuits.util.geometry_helper import region_with_merged_polygons, region_with_merged_points
 from kqcircuits.util.parameters import Param, pdt, add_parameters_from
-from kqcircuits.simulations.export.util import find_edge_from_point_in_cell
+from kqcircuits.simulations.export.util import EdgeIndex
 from kqcircuits.simulations.export.util import get_enclosing_polygon
 from kqcircuits.util.groundgrid import make_grid
 from kqcircuits.junctions.sim import Sim
@@ -207,6 +207,32 @@ class Simulation:
 
         return cls(cell.layout(), cell=cell, **kwargs, **extra_kwargs)
 
+    @classmethod
+    def from_built_cell(cls, cell, ports, refpoints=None, **kwargs):
+        """Create a Simulation of a cell that already contains the built simulation geometry.
+
+        Unlike ``from_cell``, this does not call ``build`` or ``create_simulation_layers``, so ``cell`` must contain
+        the simulation layers. It is used to restore simulations that have been built in another process. Only the
+        parameters, ports and refpoints are restored, so other attributes that ``build`` may set are not available.
+
+        Arguments:
+            cell: top cell of the built simulation
+            ports: list of the ports of the simulation
+            refpoints: dictionary of the refpoints of the simulation
+            `**kwargs`: the simulation parameters, for example as returned by ``get_parameters``
+
+        Returns:
+            Simulation instance
+        """
+        simulation = cls.__new__(cls)
+        simulation.refpoints = {} if refpoints is None else refpoints
+        simulation.layout = cell.layout()
+        for parameter, item in cls.get_schema().items():
+            setattr(simulation, parameter, kwargs[parameter] if parameter in kwargs else item.default)
+        simulation.ports = ports
+        simulation.cell = cell
+        return simulation
+
     @abc.abstractmethod
     def build(self):
         """Build simulation geometry.
@@ -288,15 +314,25 @@ class Simulation:
         (that is, polygons without holes).
         """
 
+        # merged source regions are computed only once per face and layer
+        merged_regions = {}
+
+        def merged_region(face_id, layer_name, expansion=0.0):
+            key = (face_id, layer_name, expansion)
+            if key not in merged_regions:
+                merged_regions[key] = self.merged_region_from_layer(face_id, layer_name, expansion)
+            return merged_regions[key]
+
+        ground_box_region = pya.Region(self.box.to_itype(self.layout.dbu))
+        ground_box_edges = ground_box_region.edges()
         for face_id in self.face_stack:
             if face_id not in default_faces:
                 continue  # do nothing if the face doesn't exist
 
-            ground_box_region = pya.Region(self.box.to_itype(self.layout.dbu))
-            lithography_region = self.merged_region_from_layer(face_id, "base_metal_gap_wo_grid", self.over_etching) - \
-                self.merged_region_from_layer(face_id, "base_metal_addition", -self.over_etching)
+            lithography_region = merged_region(face_id, "base_metal_gap_wo_grid", self.over_etching) - \
+                merged_region(face_id, "base_metal_addition", -self.over_etching)
             if self.hollow_tsv:
-                lithography_region += self.merged_region_from_layer(face_id, "through_silicon_via")
+                lithography_region += merged_region(face_id, "through_silicon_via")
 
             tolerance=self.minimum_point_spacing / self.layout.dbu
 
@@ -308,9 +344,7 @@ class Simulation:
 
                 # Find the ground plane and subtract it from the simulation area
                 # First, add all polygons touching any of the edges
-                ground_region = pya.Region()
-                for edge in ground_box_region.edges():
-                    ground_region += sim_region.interacting(edge)
+                ground_region = sim_region.interacting(ground_box_edges)
                 # Now, remove all edge polygons which are also a port
                 if self.use_ports:
                     for port in self.ports:
@@ -339,13 +373,13 @@ class Simulation:
             self.insert_region(sim_gap_region, face_id, "simulation_gap")
 
             # Export airbridge and indium bump regions as merged simple polygons
-            self.insert_region(self.merged_region_from_layer(face_id, "airbridge_flyover") & ground_box_region,
+            self.insert_region(merged_region(face_id, "airbridge_flyover") & ground_box_region,
                                face_id, "simulation_airbridge_flyover")
-            self.insert_region(self.merged_region_from_layer(face_id, "airbridge_pads") & ground_box_region,
+            self.insert_region(merged_region(face_id, "airbridge_pads") & ground_box_region,
                                face_id, "simulation_airbridge_pads")
-            self.insert_region(self.merged_region_from_layer(face_id, "indium_bump") & ground_box_region,
+            self.insert_region(merged_region(face_id, "indium_bump") & ground_box_region,
                                face_id, "simulation_indium_bump")
-            self.insert_region(self.merged_region_from_layer(face_id, "through_silicon_via") & ground_box_region,
+            self.insert_region(merged_region(face_id, "through_silicon_via") & ground_box_region,
                                face_id, "simulation_tsv")
 
     def ground_grid_region(self, face_id):
@@ -509,6 +543,14 @@ class Simulation:
         """
         simulation = self
         z_levels = self.face_z_levels()
+        # edge indices are built once per layer and shared by all ports
+        edge_indices = {}
+
+        def edge_index(layer):
+            if layer not in edge_indices:
+                edge_indices[layer] = EdgeIndex.from_cell(simulation.cell, layer, simulation.layout.dbu)
+            return edge_indices[layer]
+
         # gather port data
         port_data = []
         if simulation.use_ports:
@@ -552,16 +594,10 @@ class Simulation:
                 elif isinstance(port, InternalPort):
                     if hasattr(port, 'ground_location'):
                         try:
-                            _, _, signal_edge = find_edge_from_point_in_cell(
-                                simulation.cell,
-                                simulation.get_layer(port.signal_layer, port.face),
-                                port.signal_location,
-                                simulation.layout.dbu)
-                            _, _, ground_edge = find_edge_from_point_in_cell(
-                                simulation.cell,
-                                simulation.get_layer('simulation_ground', port.face),
-                                port.ground_location,
-                                simulation.layout.dbu)
+                            _, _, signal_edge = edge_index(
+                                simulation.get_layer(port.signal_layer, port.face)).find_edge(port.signal_location)
+                            _, _, ground_edge = edge_index(
+                                simulation.get_layer('simulation_ground', port.face)).find_edge(port.ground_location)
 
                             port_z = z_levels[face_num + 1]
                             p_data['polygon'] = get_enclosing_polygon(
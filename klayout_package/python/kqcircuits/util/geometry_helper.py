@@ -160,10 +160,12 @@ def region_with_merged_points(region, tolerance):
         squares = [0.0] * num
         for i in range(0, num):
             squares[i] = points[i].sq_distance(points[(i + 1) % num])
+        squared_tolerance = tolerance ** 2
+        if min(squares) >= squared_tolerance:
+            return points
 
         # merge short segments
         curr_id = 0
-        squared_tolerance = tolerance ** 2
         while curr_id < num:
             if squares[curr_id % num] >= squared_tolerance:
                 # segment long enough: increase 'curr' for the next iteration
@@ -187,13 +189,22 @@ def region_with_merged_points(region, tolerance):
     if tolerance <= 0.0:
         return region
 
+    # Polygons without segments shorter than the tolerance are kept as they are. The upper bound of the edge length
+    # filter is loose, because the filter compares rounded lengths and excludes the upper bound.
+    region = region.dup()
+    region.merged_semantics = False
+    edges = region.edges()
+    edges.merged_semantics = False
+    short_edges = edges.with_length(0, int(tolerance) + 2, False)
+    new_region = region.not_interacting(short_edges)
+
     # Merge points of hulls and holes of each polygon
-    new_region = pya.Region()
-    for poly in region.each():
+    for poly in region.interacting(short_edges).each():
         new_poly = pya.Polygon(merged_points(list(poly.each_point_hull())))
         for hole_id in range(poly.holes()):
             new_poly.insert_hole(merged_points(list(poly.each_point_hole(hole_id))))
         new_region.insert(new_poly)
+    new_region.merged_semantics = True
     return new_region
 
 
@@ -0,0 +1,120 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Pickle support for pya geometry types.
+
+KLayout objects can not be pickled as such. ``GeometryPickler`` reduces the common pya geometry types to their exact
+coordinates, so that nested parameter structures, like lists of ``DPoint`` or waveguide ``Node`` lists, can be passed
+between processes without loss. The pickled data is decoded with ``loads``, which works both in KLayout and with the
+standalone klayout package.
+"""
+
+import io
+import pickle
+
+from kqcircuits.pya_resolver import pya
+
+
+def _make(type_name, *args):
+    """Reconstructs a pya object of type ``type_name``, used when unpickling."""
+    if type_name in ("DPath", "Path"):
+        points, width, bgn_ext, end_ext, is_round = args
+        return getattr(pya, type_name)(points, width, bgn_ext, end_ext, is_round)
+    if type_name in ("DPolygon", "Polygon", "DSimplePolygon", "SimplePolygon"):
+        hull, *holes = args
+        polygon = getattr(pya, type_name)(hull, True)
+        for hole in holes:
+            polygon.insert_hole(hole, True)
+        return polygon
+    if type_name == "LayerInfo":
+        layer, datatype, name = args
+        return pya.LayerInfo(layer, datatype, name) if name else pya.LayerInfo(layer, datatype)
+    return getattr(pya, type_name)(*args)
+
+
+def _reduce_point(o):
+    return _make, (type(o).__name__, o.x, o.y)
+
+
+def _reduce_box(o):
+    return _make, (type(o).__name__, o.left, o.bottom, o.right, o.top)
+
+
+def _reduce_edge(o):
+    return _make, (type(o).__name__, o.p1, o.p2)
+
+
+def _reduce_path(o):
+    return _make, (type(o).__name__, list(o.each_point()), o.width, o.bgn_ext, o.end_ext, o.is_round())
+
+
+def _reduce_polygon(o):
+    return _make, (type(o).__name__, list(o.each_point_hull()),
+                   *[list(o.each_point_hole(i)) for i in range(o.holes())])
+
+
+def _reduce_simple_polygon(o):
+    return _make, (type(o).__name__, list(o.each_point()))
+
+
+def _reduce_trans(o):
+    return _make, (type(o).__name__, o.rot, o.is_mirror(), o.disp.x, o.disp.y)
+
+
+def _reduce_cplx_trans(o):
+    return _make, (type(o).__name__, o.mag, o.angle, o.is_mirror(), o.disp.x, o.disp.y)
+
+
+def _reduce_layer_info(o):
+    return _make, ("LayerInfo", o.layer, o.datatype, o.name)
+
+
+class GeometryPickler(pickle.Pickler):
+    """Pickler that supports the pya point, vector, box, edge, path, polygon, transformation and layer info types."""
+
+    dispatch_table = {
+        pya.DPoint: _reduce_point,
+        pya.DVector: _reduce_point,
+        pya.Point: _reduce_point,
+        pya.Vector: _reduce_point,
+        pya.DBox: _reduce_box,
+        pya.Box: _reduce_box,
+        pya.DEdge: _reduce_edge,
+        pya.Edge: _reduce_edge,
+        pya.DPath: _reduce_path,
+        pya.Path: _reduce_path,
+        pya.DPolygon: _reduce_polygon,
+        pya.Polygon: _reduce_polygon,
+        pya.DSimplePolygon: _reduce_simple_polygon,
+        pya.SimplePolygon: _reduce_simple_polygon,
+        pya.DTrans: _reduce_trans,
+        pya.Trans: _reduce_trans,
+        pya.DCplxTrans: _reduce_cplx_trans,
+        pya.LayerInfo: _reduce_layer_info,
+    }
+
+
+def dumps(obj):
+    """Returns ``obj`` pickled with ``GeometryPickler``."""
+    buffer = io.BytesIO()
+    GeometryPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buffer.getvalue()
+
+
+def loads(data):
+    """Decodes data produced by ``dumps``."""
+    return pickle.loads(data)
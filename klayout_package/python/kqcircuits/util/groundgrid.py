@@ -21,9 +21,16 @@ import numpy
 from kqcircuits.pya_resolver import pya
 
 
+GRID_HOLE_CELL_NAME = "Ground Grid Hole"
+
+
 def make_grid(boundbox, avoid_region, grid_step=10, grid_size=5, group_n=10):
     """Generates ground grid covering `boundbox` with holes not overlapping with the `avoid_region`.
 
+    The grid is split into boxes of ``group_n x group_n`` holes. The boxes are classified against ``avoid_region`` in
+    bulk, and the holes of each box are inserted from a single prebuilt group of holes, so that no Python code is run
+    per hole.
+
     Args:
         boundbox: bounding box of grid in database unit
         avoid_region: area on which grid is avoided
@@ -34,32 +41,120 @@ def make_grid(boundbox, avoid_region, grid_step=10, grid_size=5, group_n=10):
     Returns:
         grid region
   """
-    def grid_region(box, step, size):
-        square = pya.Box(0, 0, size, size)
-        x_region = pya.Region()
-        for x in numpy.arange(box.p1.x, box.p2.x, step):
-            x_region.insert(square.transformed(pya.Trans(pya.Vector(x, 0))))
-        xy_region = pya.Region()
-        for y in numpy.arange(box.p1.y, box.p2.y, step):
-            xy_region.insert(x_region.transformed(pya.Trans(pya.Vector(0, y))))
-        return xy_region
+    box_x, box_y, free, holes, masked_holes_region = _partial_grid(boundbox, avoid_region, grid_step, grid_size,
+                                                                   group_n)
+    _insert_duplicates(masked_holes_region, holes, box_x, box_y, free)
+    return masked_holes_region
+
+
+def insert_grid_arrays(cell, layer, boundbox, avoid_region, grid_step=10, grid_size=5, group_n=10):
+    """Inserts the ground grid of ``make_grid`` into ``cell`` as arrays of a single hole cell.
+
+    The holes on the boxes of ``group_n x group_n`` holes that do not overlap with ``avoid_region`` are placed as
+    regular ``pya.CellInstArray`` arrays of a cell named ``GRID_HOLE_CELL_NAME``, one array per rectangle of such
+    boxes. Only the holes on the remaining boxes are inserted as flat shapes. The flattened geometry is identical to
+    ``make_grid``.
+
+    Args:
+        cell: cell where the grid is inserted
+        layer: layer index of the grid holes
+        boundbox: bounding box of grid in database unit
+        avoid_region: area on which grid is avoided
+        grid_step: step between consecutive holes in database unit
+        grid_size: hole edge length in database unit
+        group_n: number of adjacent holes in a group
+
+    Returns:
+        the hole cell
+    """
+    box_x, box_y, free, _, masked_holes_region = _partial_grid(boundbox, avoid_region, grid_step, grid_size, group_n)
+    grid_step, grid_size = round(grid_step), round(grid_size)
+    hole_cell = cell.layout().create_cell(GRID_HOLE_CELL_NAME)
+    hole_cell.shapes(layer).insert(pya.Box(0, 0, grid_size, grid_size))
+    a, b = pya.Vector(grid_step, 0), pya.Vector(0, grid_step)
+    for column, row, columns, rows in _rectangles(free):
+        cell.insert(pya.CellInstArray(hole_cell.cell_index(), pya.Trans(int(box_x[column]), int(box_y[row])), a, b,
+                                      columns * group_n, rows * group_n))
+    cell.shapes(layer).insert(masked_holes_region)
+    return hole_cell
+
+
+def _partial_grid(boundbox, avoid_region, grid_step, grid_size, group_n):
+    """Classifies the boxes of ``group_n x group_n`` holes of the grid against ``avoid_region``.
+
+    Returns:
+        tuple ``(box_x, box_y, free, holes, region)``, where ``box_x`` and ``box_y`` are the lower left corner
+        coordinates of the box columns and rows, ``free`` is a ``(len(box_y), len(box_x))`` boolean array that is True
+        for the boxes that do not overlap with ``avoid_region``, ``holes`` is a ``pya.Shapes`` of the holes of one box
+        and ``region`` contains the grid holes of the other boxes
+    """
+    grid_step, grid_size = round(grid_step), round(grid_size)
+    bound_region = pya.Region(pya.Box(boundbox))
 
     # Create box grid, where each box can include group_n x group_n holes.
     box_step = group_n * grid_step
     box_size = box_step - grid_step + grid_size
-    boxes_region = grid_region(boundbox, box_step, box_size)
+    box_x = numpy.round(numpy.arange(boundbox.left, boundbox.right, box_step)).astype(numpy.int64)
+    box_y = numpy.round(numpy.arange(boundbox.bottom, boundbox.top, box_step)).astype(numpy.int64)
+    boxes_region = _grid_region(box_x, box_y, box_size)
     # Filter boxes that do not overlap with avoid_region. These will be used to speed up filtering of holes.
-    masked_boxes_region = ((boxes_region & pya.Region(boundbox)) - avoid_region).with_area(box_size**2, None, False)
+    masked_boxes_region = ((boxes_region & bound_region) - avoid_region).with_area(box_size**2, None, False)
+
+    # Classify the boxes in bulk by the coordinates of their lower left corners.
+    masked_corners = numpy.array([(p.x, p.y) for p in (poly.bbox().p1 for poly in masked_boxes_region.each())],
+                                 dtype=numpy.int64).reshape(-1, 2)
+    free = numpy.zeros((box_y.size, box_x.size), dtype=bool)
+    free[numpy.searchsorted(box_y, masked_corners[:, 1]), numpy.searchsorted(box_x, masked_corners[:, 0])] = True
 
     # Create grid of holes and duplicate it on boxes that overlap with avoid_region.
-    holes_region = grid_region(pya.Box(0, 0, box_step, box_step), grid_step, grid_size)
+    hole_offsets = numpy.arange(0, box_step, grid_step)
+    holes = pya.Shapes()
+    holes.insert(_grid_region(hole_offsets, hole_offsets, grid_size))
     overlap_region = pya.Region()
-    for poly in (boxes_region - masked_boxes_region).each():
-        overlap_region.insert(holes_region.transformed(pya.Trans(pya.Vector(poly.bbox().p1))))
+    _insert_duplicates(overlap_region, holes, box_x, box_y, ~free)
 
     # Create grid of holes that do not overlap with avoid region.
-    masked_holes_region = ((overlap_region & pya.Region(boundbox)) - avoid_region).with_area(grid_size**2, None, False)
-    for poly in masked_boxes_region.each():
-        masked_holes_region.insert(holes_region.transformed(pya.Trans(pya.Vector(poly.bbox().p1))))
+    masked_holes_region = ((overlap_region & bound_region) - avoid_region).with_area(grid_size**2, None, False)
+    return box_x, box_y, free, holes, masked_holes_region
 
-    return masked_holes_region
+
+def _rectangles(selected):
+    """Splits the True elements of the 2D boolean array ``selected`` into rectangles.
+
+    Returns:
+        list of ``(column, row, columns, rows)`` tuples
+    """
+    padded = numpy.pad(selected, ((0, 0), (1, 1))).astype(numpy.int8)
+    steps = numpy.diff(padded, axis=1)
+    run_rows, run_starts = numpy.nonzero(steps == 1)
+    _, run_ends = numpy.nonzero(steps == -1)
+    # extend the horizontal runs of the previous row that have identical columns
+    open_rectangles = {}
+    rectangles = []
+    for row, start, end in zip(run_rows.tolist(), run_starts.tolist(), run_ends.tolist()):
+        rectangle = open_rectangles.get((start, end))
+        if rectangle is not None and rectangle[1] + rectangle[3] == row:
+            rectangle[3] += 1
+        else:
+            rectangle = [start, row, end - start, 1]
+            rectangles.append(rectangle)
+            open_rectangles[(start, end)] = rectangle
+    return [tuple(rectangle) for rectangle in rectangles]
+
+
+def _grid_region(xs, ys, size):
+    """Returns region of ``size x size`` squares with lower left corners at all combinations of ``xs`` and ``ys``."""
+    row = pya.Shapes()
+    for x in xs.tolist():
+        row.insert(pya.Box(x, 0, x + size, size))
+    region = pya.Region()
+    for y in ys.tolist():
+        region.insert(row, pya.Trans(0, y))
+    return region
+
+
+def _insert_duplicates(region, shapes, xs, ys, selected):
+    """Inserts ``shapes`` into ``region`` displaced by ``(xs[j], ys[i])`` for all True elements ``selected[i, j]``."""
+    rows, columns = numpy.nonzero(selected)
+    for x, y in zip(xs[columns].tolist(), ys[rows].tolist()):
+        region.insert(shapes, pya.Trans(x, y))
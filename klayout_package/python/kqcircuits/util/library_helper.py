@@ -28,17 +28,30 @@
 
 import os
 import re
+import json
+import uuid
 import types
 import inspect
 import importlib
 from pathlib import Path
 from autologging import logged
 
-from kqcircuits.defaults import SRC_PATHS, kqc_library_names
-from kqcircuits.pya_resolver import pya
+from kqcircuits.defaults import LIBRARY_INDEX_PATH, SRC_PATHS, kqc_library_names
+from kqcircuits.pya_resolver import pya, is_standalone_session
+from kqcircuits.util.parameters import Param
+from kqcircuits.util.pcell_variant_cache import pcell_variant_cache
 
 
 _kqc_libraries = {}  # dictionary {library name: (library, library path relative to kqcircuits)}
+_loaded_paths = set()  # paths given to load_libraries, for which all PCells and manual designs have been loaded
+_loaded_designs = set()  # names of the libraries into which the manually designed cells have been loaded
+
+# Persisted index of the PCell classes and manual designs in SRC_PATHS, which allows registering a single PCell to its
+# library without importing the modules of the other PCells. See _get_library_index for the contents. The location of
+# the file can be changed with environment variable KQC_LIBRARY_INDEX_PATH.
+_library_index_file = LIBRARY_INDEX_PATH
+_library_index_version = 1
+_library_index = {}  # contents of _library_index_file once it has been validated in this process
 
 # Source directories not to be included in the library
 _excluded_paths = (
@@ -88,12 +101,13 @@ def load_libraries(flush=False, path=""):
     if flush:
         delete_all_libraries()
         _kqc_libraries.clear()
+        _library_index.clear()  # validate the index again, since the modules are reloaded
+        Param.get_cache().clear()  # the cached schemas refer to the classes of the old modules
+        pcell_variant_cache.clear()
         load_libraries._log.debug("Deleted all libraries.")
-    else:
-        # if a library with the given path already exist, use it
-        for _, lib_path in _kqc_libraries.values():
-            if lib_path == path:
-                return {key: value[0] for key, value in _kqc_libraries.items()}
+    elif path in _loaded_paths or "" in _loaded_paths:
+        # if the libraries of the given path are already loaded, use them
+        return {key: value[0] for key, value in _kqc_libraries.items()}
 
     pcell_classes = _get_all_pcell_classes(flush, path)
 
@@ -102,17 +116,19 @@ def load_libraries(flush=False, path=""):
         library_name = cls.LIBRARY_NAME
         library_path = cls.LIBRARY_PATH
 
-        library = pya.Library.library_by_name(library_name)  # returns only registered libraries
-        if (library is None) or flush:
-            if library_name in _kqc_libraries.keys():
-                load_libraries._log.debug("Using created library \"{}\".".format(library_name))
-                library, _ = _kqc_libraries[library_name]
-            else:
-                # create a library, but do not register it yet
-                load_libraries._log.debug("Creating new library \"{}\".".format(library_name))
-                library = pya.Library()
-                library.description = cls.LIBRARY_DESCRIPTION
-                _kqc_libraries[library_name] = (library, library_path)
+        if library_name in _kqc_libraries.keys():
+            load_libraries._log.debug("Using created library \"{}\".".format(library_name))
+            library, _ = _kqc_libraries[library_name]
+        elif pya.Library.library_by_name(library_name) is None or flush:  # returns only registered libraries
+            # create a library, but do not register it yet
+            load_libraries._log.debug("Creating new library \"{}\".".format(library_name))
+            library = pya.Library()
+            library.description = cls.LIBRARY_DESCRIPTION
+            _kqc_libraries[library_name] = (library, library_path)
+        else:
+            continue
+        # the PCell may have been registered already by load_pcell
+        if library.layout().pcell_declaration(to_library_name(cls.__name__)) is None:
             _register_pcell(cls, library, library_name)
 
     # Libraries should be registered in dependency-order, otherwise reload will crash.
@@ -124,9 +140,71 @@ def load_libraries(flush=False, path=""):
         if library_name not in library.library_names():
             library.register(library_name)  # library must be registered only after all cells have been added to it
 
+    _loaded_paths.add(path)
     return {key: value[0] for key, value in _kqc_libraries.items()}
 
 
+@logged
+def load_pcell(pcell_class):
+    """Registers a single PCell class to its library without loading the other PCells of the library.
+
+    The library is created and registered if it does not exist yet. Classes that are not in the library index, for
+    example classes defined outside ``SRC_PATHS``, are loaded with ``load_libraries`` instead. In KLayout application
+    the whole library path of the class is loaded with ``load_libraries``, see ``_get_registered_library``.
+
+    Args:
+        pcell_class: class of the PCell
+    """
+    library_name = pcell_class.LIBRARY_NAME
+    pcell_name = to_library_name(pcell_class.__name__)
+    if library_name in _kqc_libraries and \
+            _kqc_libraries[library_name][0].layout().pcell_declaration(pcell_name) is not None:
+        return
+    entry = _get_library_index()["pcells"].get(library_name, {}).get(pcell_name)
+    if entry is None or entry["module"] != pcell_class.__module__ or entry["class"] != pcell_class.__name__ or \
+            not is_standalone_session():
+        load_libraries(path=pcell_class.LIBRARY_PATH)
+        return
+    library = _get_registered_library(library_name)
+    if library.layout().pcell_declaration(pcell_name) is None:
+        _register_pcell(pcell_class, library, library_name)
+
+
+def pcell_class_by_name(pcell_name: str, library_path: str = "elements", library_name: str = "Element Library"):
+    """Find PCell class by its name in a library, registering it to the library.
+
+    Args:
+        pcell_name: Name of the PCell in the library, for example "Airbridge Rectangular"
+        library_path: Path to pass to load_libraries if the library is not in the library index
+        library_name: Name of the library
+
+    Returns: Class of the PCell, or None if the PCell is not in the library
+    """
+    entry = _get_library_index()["pcells"].get(library_name, {}).get(pcell_name)
+    if entry is None:
+        declaration = load_libraries(path=library_path)[library_name].layout().pcell_declaration(pcell_name)
+        return None if declaration is None else type(declaration)
+    return _import_pcell_class(entry)
+
+
+def load_manual_design(cell_name: str, library_path: str = "elements", library_name: str = "Element Library"):
+    """Loads the manually designed cells of a library if they have not been loaded yet.
+
+    Args:
+        cell_name: Name of the manually designed cell
+        library_path: Path to pass to load_libraries if the library is not in the library index
+        library_name: Name of the library
+
+    Returns: True if the library contains a cell named ``cell_name``, False otherwise
+    """
+    if library_name in _get_library_index()["libraries"] and is_standalone_session():
+        library = _get_registered_library(library_name)
+        _load_manual_designs(library_name)
+    else:
+        library = load_libraries(path=library_path)[library_name]
+    return library.layout().cell(cell_name) is not None
+
+
 def get_library_paths():
     """Returns a list of library paths under kqcircuits."""
     return (path for _, path in _kqc_libraries.values())
@@ -158,6 +236,9 @@ def delete_library(name=None):
     library.delete()
     if name in _kqc_libraries:
         _kqc_libraries.pop(name)
+    _loaded_paths.clear()
+    _loaded_designs.discard(name)
+    pcell_variant_cache.clear()  # cells of the library in other layouts are no longer PCell variants
     if library._destroyed():
         delete_library._log.info("Successfully deleted library '{}'.".format(name))
     else:
@@ -175,6 +256,10 @@ def element_by_class_name(class_name: str, library_path: str = "elements", libra
 
     Returns: Class of the element, or None if the element is not in the library
     """
+    for entry in _get_library_index()["pcells"].get(library_name, {}).values():
+        if entry["class"] == class_name:
+            return _import_pcell_class(entry)
+
     layout = load_libraries(path=library_path)[library_name].layout()
     for pcell_id in layout.pcell_ids():
         pcell_class = layout.pcell_declaration(pcell_id).__class__
@@ -265,16 +350,118 @@ def _register_pcell(pcell_class, library, library_name):
 
 
 def _load_manual_designs(library_name):
-    """Loads .oas files to the library
+    """Loads .oas files to the library, if they have not been loaded yet.
 
     Args:
         library_name: name of the library
     """
+    if library_name in _loaded_designs:
+        return
     library, rel_path = _kqc_libraries[library_name]
 
+    for path in _get_library_index()["designs"].get(rel_path, []):
+        library.layout().read(path)
+    _loaded_designs.add(library_name)
+
+
+def _get_registered_library(library_name):
+    """Returns the library with the given name, creating and registering it based on the library index if needed.
+
+    The libraries before it in ``kqc_library_names`` are registered first to keep the registration in dependency order.
+
+    Unlike in ``load_libraries``, the library is registered before any cells are added to it. This is only done in
+    standalone sessions: KLayout looks up the PCell or cell from the library layout by name when a library cell is
+    created, so cells added to a registered library can be used right away, and there is no library browser which
+    would need to be refreshed. In KLayout application the libraries are loaded with ``load_libraries``.
+    """
+    libraries = _get_library_index()["libraries"]
+    for name in kqc_library_names[:kqc_library_names.index(library_name) + 1] if library_name in kqc_library_names \
+            else [library_name]:
+        if name in _kqc_libraries or name not in libraries:
+            continue
+        library = pya.Library()
+        library.description = libraries[name]["description"]
+        _kqc_libraries[name] = (library, libraries[name]["path"])
+        library.register(name)
+    return _kqc_libraries[library_name][0]
+
+
+def _import_pcell_class(entry):
+    """Imports the PCell class of a library index entry and registers it to its library."""
+    pcell_class = getattr(importlib.import_module(entry["module"]), entry["class"])
+    load_pcell(pcell_class)
+    return pcell_class
+
+
+@logged
+def _get_library_index():
+    """Returns the library index, building it if the index file is missing or out of date.
+
+    The index is a dictionary with the following items:
+
+        * "pcells": {library name: {PCell name: entry}}, where entry contains the module and class name of the PCell
+        * "libraries": {library name: {"path": library path, "description": library description}}
+        * "designs": {library path: list of manually designed .oas files}
+        * "files": {path: modification time} of the source directories and modules the index is based on
+
+    The index is out of date if any of the files has been modified. Adding or removing a module modifies its directory.
+    """
+    if _library_index:
+        return _library_index
+    try:
+        with open(_library_index_file, encoding="utf-8") as f:
+            index = json.load(f)
+        if index["version"] != _library_index_version or index["src_paths"] != [str(src) for src in SRC_PATHS] or \
+                any(os.stat(path).st_mtime != mtime for path, mtime in index["files"].items()):
+            raise ValueError("Library index is out of date.")
+    except (OSError, ValueError, KeyError):
+        index = _build_library_index()
+        tmp_file = _library_index_file.with_name(f"{_library_index_file.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp_file, _library_index_file)
+        except OSError:
+            _get_library_index._log.warning("Failed to write library index file.", exc_info=True)
+        _get_library_index._log.debug("Built library index.")
+    _library_index.update(index)
+    return _library_index
+
+
+def _build_library_index():
+    """Builds the library index by importing all PCell modules in SRC_PATHS, see _get_library_index."""
+    index = {
+        "version": _library_index_version,
+        "src_paths": [str(src) for src in SRC_PATHS],
+        "pcells": {},
+        "libraries": {},
+        "designs": {},
+        "files": {},
+    }
     for src in SRC_PATHS:
-        for path in src.rglob("{}/**/*.oas".format(rel_path)):
-            library.layout().read(str(path.absolute()))
+        index["files"][str(src)] = src.stat().st_mtime
+        for library_src in _get_library_src_paths(src):
+            for path in [library_src] + [p for p in library_src.rglob("*") if p.is_dir()]:
+                index["files"][str(path)] = path.stat().st_mtime
+
+    for cls, module_path in _get_all_pcell_classes():
+        index["files"][str(module_path)] = module_path.stat().st_mtime
+        index["pcells"].setdefault(cls.LIBRARY_NAME, {})[to_library_name(cls.__name__)] = {
+            "module": cls.__module__,
+            "class": cls.__name__,
+        }
+        index["libraries"][cls.LIBRARY_NAME] = {"path": cls.LIBRARY_PATH, "description": cls.LIBRARY_DESCRIPTION}
+        if cls.LIBRARY_PATH not in index["designs"]:
+            index["designs"][cls.LIBRARY_PATH] = [str(path.absolute()) for src in SRC_PATHS
+                                                  for path in src.rglob("{}/**/*.oas".format(cls.LIBRARY_PATH))]
+    return index
+
+
+def _get_library_src_paths(src, path=""):
+    """Returns the directories under source path ``src`` from which PCell classes of ``path`` are searched."""
+    if path == "":
+        return [f for f in src.iterdir() if f.is_dir() and f.name not in _excluded_paths]
+    return [src.joinpath(path)]
 
 
 @logged
@@ -293,12 +480,7 @@ def _get_all_pcell_classes(reload=False, path=""):
     for src in SRC_PATHS:
         pkg = src.parts[-1]
 
-        if path == "":
-            library_src_paths = [f for f in src.iterdir() if f.is_dir() and f.name not in _excluded_paths]
-        else:
-            library_src_paths = [src.joinpath(path)]
-
-        for library_src in library_src_paths:
+        for library_src in _get_library_src_paths(src, path):
             module_paths = library_src.rglob("*.py")
             for mp in module_paths:
                 module_name = mp.stem
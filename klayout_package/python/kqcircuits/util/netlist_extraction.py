@@ -18,6 +18,7 @@
 
 import json
 import logging
+from collections import deque
 from os import cpu_count
 
 from kqcircuits.defaults import default_layers, default_netlist_breakdown, default_faces
@@ -121,18 +122,7 @@ def export_netlist(circuit, filename, internal_layout, original_layout, cell_map
 
     # selects last cell in the layout, which will contain all instances of all cells with user properties
     *_, last_cell = original_layout.each_cell()
-
-    # retrieve all instances in last_cell hierarchy
-    # instances in original layout are identified by cell index and transformation
-    # the concatenated transformation of instance's predecessors is stored as tuple's second element
-    original_instances = []
-    instance_queue = list(last_cell.each_inst())
-    instance_queue = [(instance, pya.DCplxTrans.R0) for instance in instance_queue]
-    while len(instance_queue) > 0:
-        instance, instance_trans = instance_queue.pop(0)
-        original_instances.append((instance, instance_trans))
-        for child in instance.cell.each_inst():
-            instance_queue.append((child, instance_trans * instance.dcplx_trans))
+    instance_index = _InstanceIndex(last_cell)
 
     # Indexing as defined in default_layers is not consistent with layer indexing in original_layout
     base_metal_gap_wo_grid_layer_idx_array = [idx for idx, li in
@@ -142,12 +132,10 @@ def export_netlist(circuit, filename, internal_layout, original_layout, cell_map
         internal_cell = internal_layout.cell(subcircuit.circuit_ref().cell_index)
         if cell_mapping.has_mapping(internal_cell.cell_index()):
             original_cell_index = cell_mapping.cell_mapping(internal_cell.cell_index())
-            possible_instances = [(i,i_trans) for i,i_trans in original_instances
-                                                if i.cell.cell_index() == original_cell_index]
         else:
             log.warning(('%s element has no cell mapping in %s between circuit layout and orignal layout,'
                     ' using subcircuit center point as subcircuit_location instead'), internal_cell.name, circuit.name)
-            possible_instances = []
+            original_cell_index = None
 
         used_internal_cells.add(internal_cell)
 
@@ -158,8 +146,7 @@ def export_netlist(circuit, filename, internal_layout, original_layout, cell_map
             subcircuit_trans = pya.DCplxTrans.R0
             subcircuit_location = pya.DPoint(0.0, 0.0)
 
-        instances_with_eq_trans = [(i, i_trans) for i, i_trans in possible_instances
-                                                if i_trans * i.dcplx_trans == subcircuit_trans]
+        instances_with_eq_trans = instance_index.find(original_cell_index, subcircuit_trans)
         property_dict = {}
         correct_instance = None
         if instances_with_eq_trans:
@@ -188,7 +175,7 @@ def export_netlist(circuit, filename, internal_layout, original_layout, cell_map
                 log.warning(('%s element has no bounding boxes in *_base_metal_gap_wo_grid layers in %s,'
                     ' using subcircuit center point as subcircuit_location instead'),
                     internal_cell.name, circuit.name)
-        elif possible_instances:
+        elif instance_index.has_cell(original_cell_index):
             log.warning(('Could not find a matching element for %s subcircuit in the orignal layout of %s,'
                     ' using subcircuit center point as subcircuit_location instead'), internal_cell.name, circuit.name)
 
@@ -258,3 +245,50 @@ def extract_circuits(cell_mapping, internal_cell, layout):
             }
         circuit_for_export["waveguide_length"] = get_cell_path_length(original_cell)
     return circuit_for_export
+
+
+class _InstanceIndex:
+    """Index of all instances in the hierarchy of a cell by cell index and transformation.
+
+    Instances in the original layout are identified by cell index and the transformation from the top cell. The
+    instances are collected once with a breadth first traversal and grouped by cell index. The instances of a cell are
+    further grouped by rounded transformation when the cell is first searched, so that finding the instances of a
+    subcircuit does not need to scan all instances.
+    """
+
+    def __init__(self, top_cell):
+        # lists of (instance, transformation of the instance's predecessors, transformation) in breadth first order
+        self._by_cell = {}
+        self._by_trans = {}
+        instance_queue = deque((instance, pya.DCplxTrans.R0) for instance in top_cell.each_inst())
+        while instance_queue:
+            instance, instance_trans = instance_queue.popleft()
+            trans = instance_trans * instance.dcplx_trans
+            self._by_cell.setdefault(instance.cell_index, []).append((instance, instance_trans, trans))
+            instance_queue.extend((child, trans) for child in instance.cell.each_inst())
+
+    @staticmethod
+    def _key(trans):
+        return round(trans.disp.x, 4), round(trans.disp.y, 4), round(trans.angle, 6), trans.is_mirror(), \
+            round(trans.mag, 9)
+
+    def has_cell(self, cell_index):
+        """Returns True if there are instances of the cell ``cell_index``."""
+        return cell_index in self._by_cell
+
+    def find(self, cell_index, trans):
+        """Returns list of (instance, transformation of the instance's predecessors) of ``cell_index`` at ``trans``.
+
+        The instances are returned in breadth first order.
+        """
+        entries = self._by_cell.get(cell_index, [])
+        if cell_index not in self._by_trans:
+            by_trans = self._by_trans[cell_index] = {}
+            for entry in entries:
+                by_trans.setdefault(self._key(entry[2]), []).append(entry)
+        found = [(instance, instance_trans) for instance, instance_trans, total
+                 in self._by_trans[cell_index].get(self._key(trans), []) if total == trans]
+        if found:
+            return found
+        # transformations that are equal within tolerance may be rounded differently, so fall back to all instances
+        return [(instance, instance_trans) for instance, instance_trans, total in entries if total == trans]
@@ -110,6 +110,15 @@ class Param:
     """
 
     _index = {} # A private dictionary of parameter dictionaries indexed by owner classes' name
+    _cache = {}  # A private cache of values derived from the parameters of classes, cleared when parameters change
+
+    @classmethod
+    def get_cache(cls):
+        """Returns a dictionary for caching values derived from parameters, for example the schemas of classes.
+
+        The dictionary is cleared whenever a parameter is (re)defined for any class.
+        """
+        return cls._cache
 
     @classmethod
     def get_all(cls, owner):
@@ -136,6 +145,7 @@ class Param:
 
     def __set_name__(self, owner, name):
         self.name = name
+        self._cache.clear()
         owner_name = f'{owner.__module__}.{owner.__qualname__}'
         if owner_name not in self._index:
             self._index[owner_name] = {}
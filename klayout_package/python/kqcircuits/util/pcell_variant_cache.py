@@ -0,0 +1,123 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Memo of the PCell variant cells created by ``Element.create``.
+
+Chips create the same sub-elements with identical parameters many times. KLayout finds the existing variant of such a
+PCell, but only after normalizing and comparing the full parameter list. The cache returns the cell of an identical
+earlier call directly.
+
+The cell of a repeated call is first checked to be the same cell that KLayout returns, and the time KLayout took for it
+is used to estimate the time saved by later hits.
+"""
+
+from time import perf_counter
+
+
+class PCellVariantCache:
+    """Cache of PCell variant cells keyed by layout, element class and parameters.
+
+    The cells are stored by index and name in an attribute of each layout object, so that the cache neither keeps
+    layouts alive nor holds references to ``pya.Cell`` objects of library layouts that may be deleted.
+
+    Attributes:
+        hits: number of cells returned from the cache
+        misses: number of cells created by KLayout
+        time_saved: estimated time saved by the hits in seconds
+    """
+
+    def __init__(self):
+        self._generation = 0  # incremented by clear to invalidate the cells stored in all layouts
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def create_cell(self, layout, elem_cls, library_name, create, parameters):
+        """Returns the cell of a PCell variant, creating it with ``create`` if it is not in the cache.
+
+        Args:
+            layout: pya.Layout object where the cell is created
+            elem_cls: element class of the cell
+            library_name: library name given to ``Element.create``
+            create: function without arguments, which creates the cell with KLayout
+            parameters: PCell parameters of the cell
+
+        Returns:
+            the cell
+        """
+        frozen_parameters = _freeze(parameters)
+        key = None if frozen_parameters is None else (elem_cls, library_name, frozen_parameters)
+        cells = getattr(layout, "_pcell_variant_cells", None) if key is not None else None
+        if cells is not None and cells["generation"] != self._generation:
+            cells = None
+        cached = None
+        if cells is not None and key in cells:
+            cell_index, cell_name, lookup_time = cells[key]
+            if layout.is_valid_cell_index(cell_index) and layout.cell_name(cell_index) == cell_name:
+                if lookup_time is not None:
+                    self.hits += 1
+                    self.time_saved += lookup_time
+                    return layout.cell(cell_index)
+                cached = cell_index
+
+        start = perf_counter()
+        cell = create()
+        duration = perf_counter() - start
+        self.misses += 1
+        if key is None:
+            return cell
+        if cells is None:
+            cells = {"generation": self._generation}
+            setattr(layout, "_pcell_variant_cells", cells)
+        # a repeated call is cached only if KLayout returned the same variant
+        lookup_time = duration if cached == cell.cell_index() else None
+        cells[key] = (cell.cell_index(), layout.cell_name(cell.cell_index()), lookup_time)
+        return cell
+
+    def clear(self):
+        """Removes all cells from the cache, for example when the libraries are reloaded."""
+        self._generation += 1
+
+    def statistics(self):
+        """Returns the cache statistics as a dictionary with keys "hits", "misses" and "time_saved"."""
+        return {"hits": self.hits, "misses": self.misses, "time_saved": self.time_saved}
+
+
+def _freeze(value):
+    """Returns a hashable key equal for equal PCell parameter values, or None if ``value`` cannot be hashed."""
+    value_type = type(value)
+    if value_type in _scalar_types:
+        return value_type, value
+    if value_type in (list, tuple):
+        items = tuple(_freeze(v) for v in value)
+        return None if None in items else (value_type, items)
+    if value_type is dict:
+        items = tuple((k, _freeze(v)) for k, v in value.items())
+        return None if any(v is None for _, v in items) else items
+    if hasattr(value, "dup"):
+        value = value.dup()  # copy of a pya object, so that modifying the original does not change the key
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return value_type, value
+
+
+_scalar_types = (str, float, int, bool, type(None))
+
+
+pcell_variant_cache = PCellVariantCache()
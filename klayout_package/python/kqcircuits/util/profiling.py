@@ -0,0 +1,259 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Opt-in profiling of element creation.
+
+Records the wall time, number of calls, and numbers of shapes and instances created in the ``build()``,
+``post_build()`` and refpoint stages of every element, nested below the elements that created them. Profiling is
+enabled either with the ``profile_elements`` context manager::
+
+    with profile_elements() as profiler:
+        Demo.create(layout)
+    profiler.write_speedscope("demo.speedscope.json")
+    print(profiler.summary())
+
+or for a whole process by setting environment variable ``KQC_PROFILE`` to the path of a speedscope file, which is
+written when the process exits. Processes started by that process, like mask or simulation workers, are not profiled.
+The files can be viewed as flame graphs in https://www.speedscope.app.
+"""
+
+import atexit
+import json
+import os
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+
+class ProfileNode:
+    """Node of the profile call tree.
+
+    Attributes:
+        name: element class name or stage name
+        is_element: True for element creation, False for stages of an element
+        calls: number of calls
+        time: total wall time of the calls in seconds
+        shapes: number of shapes added to the cell of the element by the stage
+        instances: number of instances added to the cell of the element by the stage
+        children: dictionary of child nodes by name
+    """
+
+    def __init__(self, name, is_element):
+        self.name = name
+        self.is_element = is_element
+        self.calls = 0
+        self.time = 0.0
+        self.shapes = 0
+        self.instances = 0
+        self.children = {}
+
+    def child(self, name, is_element):
+        if name not in self.children:
+            self.children[name] = ProfileNode(name, is_element)
+        return self.children[name]
+
+    def self_time(self):
+        """Returns the time spent in this node but not in its children."""
+        return self.time - sum(c.time for c in self.children.values())
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "type": "element" if self.is_element else "stage",
+            "calls": self.calls,
+            "time": self.time,
+            "shapes": self.shapes,
+            "instances": self.instances,
+            "children": [c.to_dict() for c in self.children.values()],
+        }
+
+
+class ElementProfiler:
+    """Collects a call tree of element creation, see module documentation.
+
+    Attributes:
+        root: root node of the call tree
+    """
+
+    def __init__(self, name="KQCircuits"):
+        self.root = ProfileNode(name, False)
+        self._stack = [self.root]
+
+    @contextmanager
+    def element(self, name):
+        """Records the creation of an element of class ``name``."""
+        node = self._stack[-1].child(name, True)
+        self._stack.append(node)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            node.time += perf_counter() - start
+            node.calls += 1
+            self._stack.pop()
+
+    @contextmanager
+    def stage(self, name, cell):
+        """Records stage ``name`` producing ``cell``, including the shapes and instances it adds to ``cell``."""
+        node = self._stack[-1].child(name, False)
+        self._stack.append(node)
+        shapes, instances = _count_shapes_and_instances(cell)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            node.time += perf_counter() - start
+            node.calls += 1
+            new_shapes, new_instances = _count_shapes_and_instances(cell)
+            node.shapes += new_shapes - shapes
+            node.instances += new_instances - instances
+            self._stack.pop()
+
+    def to_dict(self):
+        """Returns the call tree as a hierarchical dictionary."""
+        self.root.time = sum(c.time for c in self.root.children.values())
+        return self.root.to_dict()
+
+    def to_speedscope(self):
+        """Returns the call tree as a sampled profile in the speedscope file format.
+
+        Each node of the tree is a sample with weight equal to the time spent in the node but not in its children.
+        """
+        frames, frame_indices, samples, weights = [], {}, [], []
+
+        def add_samples(node, stack):
+            for child in node.children.values():
+                if child.name not in frame_indices:
+                    frame_indices[child.name] = len(frames)
+                    frames.append({"name": child.name})
+                child_stack = stack + [frame_indices[child.name]]
+                samples.append(child_stack)
+                weights.append(max(child.self_time(), 0.0))
+                add_samples(child, child_stack)
+
+        add_samples(self.root, [])
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.root.name,
+            "exporter": "kqcircuits",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.root.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def write_speedscope(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_speedscope(), f)
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def class_statistics(self):
+        """Returns statistics per element class.
+
+        Returns:
+            dictionary ``{class name: statistics}``, where statistics is a dictionary with keys "calls", "time" (total
+            time, nested creations of the same class counted once), "self_time" (time not spent creating other
+            elements), "shapes" and "instances" (added by the stages of the class)
+        """
+        statistics = {}
+
+        def add(node, element_names):
+            if node.is_element:
+                s = statistics.setdefault(node.name, {"calls": 0, "time": 0.0, "self_time": 0.0, "shapes": 0,
+                                                      "instances": 0})
+                s["calls"] += node.calls
+                if node.name not in element_names:
+                    s["time"] += node.time
+                s["self_time"] += node.time - _child_element_time(node)
+                s["shapes"] += sum(c.shapes for c in node.children.values() if not c.is_element)
+                s["instances"] += sum(c.instances for c in node.children.values() if not c.is_element)
+                element_names = element_names | {node.name}
+            for child in node.children.values():
+                add(child, element_names)
+
+        add(self.root, frozenset())
+        return statistics
+
+    def summary(self, top=20):
+        """Returns a text table of the ``top`` element classes with the largest self time."""
+        statistics = sorted(self.class_statistics().items(), key=lambda item: -item[1]["self_time"])
+        lines = [f"{'Element':<40}{'calls':>8}{'time [s]':>12}{'self [s]':>12}{'shapes':>10}{'instances':>11}"]
+        for name, s in statistics[:top]:
+            lines.append(f"{name:<40}{s['calls']:>8}{s['time']:>12.4f}{s['self_time']:>12.4f}{s['shapes']:>10}"
+                         f"{s['instances']:>11}")
+        return "\n".join(lines)
+
+
+def _child_element_time(node):
+    """Returns the time spent in elements created below ``node``, looking through the stages of ``node``."""
+    return sum(c.time if c.is_element else _child_element_time(c) for c in node.children.values())
+
+
+def _count_shapes_and_instances(cell):
+    layout = cell.layout()
+    return sum(cell.shapes(layer).size() for layer in layout.layer_indexes()), cell.child_instances()
+
+
+_profiler = None  # the active profiler, or None if profiling is disabled
+
+
+def element_profile(name):
+    """Returns a context manager recording the creation of an element of class ``name``, if profiling is enabled."""
+    return nullcontext() if _profiler is None else _profiler.element(name)
+
+
+def stage_profile(name, cell):
+    """Returns a context manager recording stage ``name`` producing ``cell``, if profiling is enabled."""
+    return nullcontext() if _profiler is None else _profiler.stage(name, cell)
+
+
+@contextmanager
+def profile_elements(name="KQCircuits"):
+    """Context manager that profiles the elements created within it.
+
+    Args:
+        name: name of the profile
+
+    Yields:
+        the ElementProfiler
+    """
+    global _profiler  # pylint: disable=global-statement
+    previous = _profiler
+    _profiler = ElementProfiler(name)
+    try:
+        yield _profiler
+    finally:
+        _profiler = previous
+
+
+def _write_profile_at_exit(path, pid):
+    if os.getpid() == pid:  # not in forked processes, which inherit the exit handler
+        _profiler.write_speedscope(path)
+
+
+# KQC_PROFILE_PID marks the process that profiles, so that processes started by it do not overwrite the profile
+if os.environ.get("KQC_PROFILE") and os.environ.setdefault("KQC_PROFILE_PID", str(os.getpid())) == str(os.getpid()):
+    _profiler = ElementProfiler()
+    atexit.register(_write_profile_at_exit, os.environ["KQC_PROFILE"], os.getpid())
@@ -24,8 +24,8 @@ import pandas as pd
 import gmsh
 from scipy.constants import mu_0, epsilon_0
 
-from gmsh_helpers import separated_hull_and_holes, add_polygon, set_mesh_size_field, get_recursive_children, \
-    set_meshing_options
+from gmsh_helpers import separated_hull_and_holes, add_plane_surface, polygon_coordinates, set_mesh_size_field, \
+    get_recursive_children, set_meshing_options
 
 try:
     import pya
@@ -66,26 +66,10 @@ def produce_cross_section_mesh(json_data, msh_file):
     dim_tags = {}
     for name, num in layers.items():
         reg = pya.Region(cell.shapes(layout.layer(*num))) & bbox
-        layer_dim_tags = []
-        for simple_poly in reg.each():
-            poly = separated_hull_and_holes(simple_poly)
-            hull_point_coordinates = [
-                (point.x * layout.dbu, point.y * layout.dbu, 0) for point in poly.each_point_hull()
-            ]
-            hull_plane_surface_id = add_polygon(hull_point_coordinates)
-            hull_dim_tag = (2, hull_plane_surface_id)
-            hole_dim_tags = []
-            for hole in range(poly.holes()):
-                hole_point_coordinates = [
-                    (point.x * layout.dbu, point.y * layout.dbu, 0) for point in poly.each_point_hole(hole)
-                ]
-                hole_plane_surface_id = add_polygon(hole_point_coordinates)
-                hole_dim_tags.append((2, hole_plane_surface_id))
-            if hole_dim_tags:
-                layer_dim_tags += gmsh.model.occ.cut([hull_dim_tag], hole_dim_tags)[0]
-            else:
-                layer_dim_tags.append(hull_dim_tag)
-        dim_tags[name] = layer_dim_tags
+        dim_tags[name] = [
+            (2, add_plane_surface(polygon_coordinates(separated_hull_and_holes(simple_poly), layout.dbu, 0)))
+            for simple_poly in reg.each()
+        ]
 
     # Call fragment and get updated dim_tags as new_tags. Then synchronize.
     all_dim_tags = [tag for tags in dim_tags.values() for tag in tags]
@@ -14,7 +14,11 @@
 # The software distribution should follow IQM trademark policy for open-source software
 # (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
 # for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+# pylint: disable=too-many-lines
+import logging
 import os
+import sys
+import time
 from pathlib import Path
 import gmsh
 import numpy as np
@@ -24,6 +28,48 @@ try:
 except ImportError:
     import klayout.db as pya
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_memory_usage():
+    """
+    Returns the peak resident memory usage of the process in megabytes, or None if it is not available.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10  # bytes on macOS, kilobytes elsewhere
+
+
+class StageTimer:
+    """
+    Measures the wall-clock time of consecutive stages of a computation and logs the time and the peak memory usage
+    after each stage.
+
+    Attributes:
+        name(str): name of the computation used in the log messages
+        timings(dict): elapsed time in seconds of each finished stage
+        peak_memory(dict): peak memory usage in megabytes of the process at the end of each finished stage
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.timings = {}
+        self.peak_memory = {}
+        self._start = time.perf_counter()
+
+    def lap(self, stage: str):
+        """Ends the current stage, named ``stage``, and starts the next one."""
+        end = time.perf_counter()
+        self.timings[stage] = end - self._start
+        self.peak_memory[stage] = peak_memory_usage()
+        memory = '' if self.peak_memory[stage] is None else f', peak memory {self.peak_memory[stage]:.0f} MB'
+        logging.info(f'{self.name}: {stage} took {self.timings[stage]:.3f} s{memory}')
+        self._start = end
+
 
 def coord_dist(coord1: [], coord2: []):
     """
@@ -51,13 +97,110 @@ def add_polygon(point_coordinates: [], mesh_size=0):
     Returns:
         (int): entity id of the polygon
     """
-    points = [gmsh.model.occ.addPoint(*coord, mesh_size) for coord in point_coordinates]
-    lines = [gmsh.model.occ.addLine(points[i - 1], points[i]) for i in range(1, len(points))]
-    lines.append(gmsh.model.occ.addLine(points[-1], points[0]))
-    loops = [gmsh.model.occ.addCurveLoop(lines)]
+    return add_plane_surface([point_coordinates], mesh_size)
+
+
+def add_plane_surface(contours: list, mesh_size=0, tol=None, curve_loops: dict = None):
+    """
+    Adds a polygon with holes in the OpenCASCADE model as a single plane surface with one curve loop per contour.
+    Returns the geometry entity id.
+
+    Args:
+        contours(list): list of contours, each given as a list or array of point coordinates (x, y, z). The first
+                        contour is the hull and the others are the holes of the polygon.
+        mesh_size(float): mesh element size, default=0
+        tol(float): if given, consecutive points closer than ``tol`` are joined with splines as in
+                    `add_polygon_with_splines`, otherwise all points are joined with lines
+        curve_loops(dict): if given, the curve loops created so far keyed by their contour. A contour that is already
+                           in the dictionary reuses the existing curve loop, so that for example the hole of the ground
+                           and the hull of the signal inside it share their curves and need not be intersected with
+                           each other when the model is fragmented. The mesh size of the first added contour is kept.
+
+    Returns:
+        (int): entity id of the polygon
+    """
+    contours = [np.asarray(coordinates, dtype=float) for coordinates in contours]
+    if curve_loops is None:
+        # OpenCASCADE subtracts the holes only if their curve loops have the same orientation as the hull
+        hull_orientation = contour_orientation(contours[0])
+        contours[1:] = [c if contour_orientation(c) == hull_orientation else c[::-1] for c in contours[1:]]
+        loops = [add_curve_loop(coordinates, mesh_size, tol)[2] for coordinates in contours]
+    else:
+        loops = []
+        for coordinates in contours:
+            coordinates = canonical_contour(coordinates)
+            key = (coordinates.tobytes(), tol)
+            if key not in curve_loops:
+                curve_loops[key] = add_curve_loop(coordinates, mesh_size, tol)[2]
+            loops.append(curve_loops[key])
     return gmsh.model.occ.addPlaneSurface(loops)
 
 
+def contour_orientation(coordinates: np.ndarray):
+    """
+    Returns 1 if the contour given by the point coordinates is counterclockwise in the xy-plane, -1 if it is clockwise
+    and 0 if it has no area.
+    """
+    x, y = coordinates[:, 0], coordinates[:, 1]
+    return np.sign(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def canonical_contour(coordinates: np.ndarray):
+    """
+    Returns the point coordinates of a contour in counterclockwise order starting from the point with the smallest x
+    (and then y) coordinate. Contours that consist of the same points thus become identical regardless of their
+    orientation and starting point, and result in identical curves when passed to `add_curve_loop`.
+    """
+    if contour_orientation(coordinates) < 0:
+        coordinates = coordinates[::-1]
+    return np.roll(coordinates, -np.lexsort((coordinates[:, 1], coordinates[:, 0]))[0], axis=0)
+
+
+def add_curve_loop(point_coordinates, mesh_size=0, tol=None):
+    """
+    Adds a closed curve loop through the given points in the OpenCASCADE model.
+
+    The distances between consecutive points are computed for the whole contour at once. If ``tol`` is given, runs of
+    points closer than ``tol`` to each other are joined with splines, see `add_polygon_with_splines`. The segment from
+    the last point to the first point is always a line.
+
+    Args:
+        point_coordinates(list((float, float, float))): list or array of point coordinates of the contour
+        mesh_size(float): mesh size given to the points
+        tol(float): tolerance for spline generation, or None to use only lines
+
+    Returns:
+        (list): list of entity ids
+            * point_ids(list(int)): entity ids of each point used in the curve loop
+            * line_ids(list(int)): entity ids of each line or spline used in the curve loop
+            * curve_loop_id(int): entity id of the curve loop
+    """
+    coordinates = np.asarray(point_coordinates, dtype=float)
+    point_ids = [gmsh.model.occ.addPoint(x, y, z, mesh_size) for x, y, z in coordinates.tolist()]
+    if tol is None:
+        short = [False] * (len(point_ids) - 1)
+    else:
+        short = (np.linalg.norm(np.diff(coordinates, axis=0), axis=1) <= tol).tolist()
+
+    line_ids = []
+    spline_points = [point_ids[0]]
+    for i, is_short in enumerate(short, 1):
+        if is_short:
+            spline_points.append(point_ids[i])
+            continue
+        if len(spline_points) > 2:
+            line_ids.append(gmsh.model.occ.addSpline(spline_points))
+        elif len(spline_points) == 2:
+            line_ids.append(gmsh.model.occ.addLine(spline_points[0], spline_points[1]))
+        line_ids.append(gmsh.model.occ.addLine(point_ids[i - 1], point_ids[i]))
+        spline_points = [point_ids[i]]
+    if len(spline_points) > 1:  # in case spline and the last point distance < tol
+        line_ids.append(gmsh.model.occ.addSpline(spline_points))
+
+    line_ids.append(gmsh.model.occ.addLine(point_ids[-1], point_ids[0]))
+    return point_ids, line_ids, gmsh.model.occ.addCurveLoop(line_ids)
+
+
 def add_polygon_with_splines(point_coordinates: [], mesh_size: [], tol=1.):
     """
     Adds the geometry entities in the OpenCASCADE model for generating a polygon and keeps track of all the entities.
@@ -83,40 +226,8 @@ def add_polygon_with_splines(point_coordinates: [], mesh_size: [], tol=1.):
 
         Note that all of the ids become obsolete when boolean operations are used in OpenCASCADE kernel.
     """
-    point_ids = []
-    line_ids = []
-    curve_loop_ids = []
-    spline_points = []
-    spline = False
-    i = 0
-    for i, coord in enumerate(point_coordinates):
-        point_ids.append(gmsh.model.occ.addPoint(*coord, mesh_size))
-        point_id = point_ids[-1]
-        spline_points.append(point_id)
-        if i > 0:
-            coord1 = point_coordinates[i - 1]
-            coord2 = point_coordinates[i]
-            if spline:
-                if coord_dist(coord1, coord2) > tol:
-                    spline = False
-                    spline_points.pop()
-                    if len(spline_points) > 2:
-                        line_ids.append(gmsh.model.occ.addSpline(spline_points))
-                    else:
-                        line_ids.append(gmsh.model.occ.addLine(spline_points[0], spline_points[1]))
-                    line_ids.append(gmsh.model.occ.addLine(point_ids[i - 1], point_ids[i]))
-                    spline_points = [point_id]
-            else:
-                if coord_dist(coord1, coord2) <= tol:
-                    spline = True
-                else:
-                    line_ids.append(gmsh.model.occ.addLine(point_ids[i - 1], point_ids[i]))
-                    spline_points = [point_id]
-    if len(spline_points) > 1:  # in case spline and the last point distance < tol
-        line_ids.append(gmsh.model.occ.addSpline(spline_points))
-
-    line_ids.append(gmsh.model.occ.addLine(point_ids[i], point_ids[0]))
-    curve_loop_ids.append(gmsh.model.occ.addCurveLoop(line_ids))
+    point_ids, line_ids, curve_loop_id = add_curve_loop(point_coordinates, mesh_size, tol)
+    curve_loop_ids = [curve_loop_id]
     plane_surface_id = gmsh.model.occ.addPlaneSurface(curve_loop_ids)
     return point_ids, line_ids, curve_loop_ids, plane_surface_id
 
@@ -135,9 +246,29 @@ def separated_hull_and_holes(polygon):
     return new_poly
 
 
-def add_shape_polygons(cell: pya.Cell, layer_map: dict, face: str, layer: str, z_level: float, mesh_size: float):
+def polygon_coordinates(polygon, dbu, z_level):
+    """
+    Returns the point coordinates of a polygon as one array per contour.
+
+    Args:
+        polygon(pya.Polygon): the polygon
+        dbu(float): database unit of the polygon
+        z_level(float): the z-coordinate given to the points
+
+    Returns:
+        (list(np.ndarray)): arrays of shape (n, 3) of the point coordinates (x, y, z) of the hull and of each hole
     """
-    Create all polygons in a layer using `add_polygon_with_splines` according to the hull of each KLayout shape.
+    contours = []
+    for contour in [polygon.each_point_hull()] + [polygon.each_point_hole(h) for h in range(polygon.holes())]:
+        xy = np.array([(p.x, p.y) for p in contour], dtype=float).reshape(-1, 2) * dbu
+        contours.append(np.column_stack((xy, np.full(len(xy), float(z_level)))))
+    return contours
+
+
+def add_shape_polygons(cell: pya.Cell, layer_map: dict, face: str, layer: str, z_level: float, mesh_size: float,
+                       curve_loops: dict = None):
+    """
+    Create all polygons in a layer using `add_plane_surface` according to the hull and holes of each KLayout shape.
     Returns the so called list of dim_tags of all the created polygons which can be used to refer to the shapes later.
 
     Args:
@@ -148,6 +279,7 @@ def add_shape_polygons(cell: pya.Cell, layer_map: dict, face: str, layer: str, z
         z_level(float): the z-coordinate of the layer.
         mesh_size(float): mesh size can be given to the points (note that these points are not used in the final mesh in
                           case the boolean operations are used.
+        curve_loops(dict): if given, curve loops are shared between identical contours, see `add_plane_surface`
     Returns:
         hull_dim_tags(list(int, int)): dimTag (as called in Gmsh) is a tuple of
             * dimension(int): the dimension of the entity (0=point, 1=line, 2=surface, 3=volume)
@@ -162,27 +294,15 @@ def add_shape_polygons(cell: pya.Cell, layer_map: dict, face: str, layer: str, z
         reg = pya.Region(reg_ground.bbox()) - reg_signal - reg_ground - reg_gap
     else:
         reg = pya.Region(cell.shapes(layout.layer(*layer_map[face + "_" + layer])))
-    dim_tags = []
-    for spoly in reg.each():
-        poly = separated_hull_and_holes(spoly)
-        hull_point_coordinates = [(point.x * layout.dbu, point.y * layout.dbu, z_level)
-                                  for point in poly.each_point_hull()]
-        _, _, _, hull_plane_surface_id = add_polygon_with_splines(hull_point_coordinates, mesh_size)
-        hull_dim_tag = (2, hull_plane_surface_id)
-        hole_dim_tags = []
-        for hole in range(poly.holes()):
-            hole_point_coordinates = [(point.x * layout.dbu, point.y * layout.dbu, z_level)
-                                      for point in poly.each_point_hole(hole)]
-            _, _, _, hole_plane_surface_id = add_polygon_with_splines(hole_point_coordinates, mesh_size)
-            hole_dim_tags.append((2, hole_plane_surface_id))
-        if len(hole_dim_tags) > 0:
-            dim_tags += gmsh.model.occ.cut([hull_dim_tag], hole_dim_tags)[0]
-        else:
-            dim_tags.append(hull_dim_tag)
-    return dim_tags
+    # polygons with holes are created directly as plane surfaces with several curve loops instead of cutting the
+    # holes from the hull, which avoids one OpenCASCADE boolean operation per polygon
+    return [(2, add_plane_surface(polygon_coordinates(separated_hull_and_holes(spoly), layout.dbu, z_level),
+                                  mesh_size, tol=1., curve_loops=curve_loops))
+            for spoly in reg.each()]
 
 
-def create_face(cell: pya.Cell, layer_map: dict, face: str, z_level: float, mesh_sizes=None, port_dim_tags=None):
+def create_face(cell: pya.Cell, layer_map: dict, face: str, z_level: float, mesh_sizes=None, port_dim_tags=None,
+                timer: StageTimer = None, curve_loops: dict = None):
     """
     Create the face of a chip according to the "simulation_ground", "simulation_gap" and "simulation_signal" layers
     using the `add_shape_polygons` method.
@@ -200,6 +320,8 @@ def create_face(cell: pya.Cell, layer_map: dict, face: str, z_level: float, mesh
             * signal(float): mesh size of the signal layer
 
         port_dim_tags(list): list of DimTags of the port polygons
+        timer(StageTimer): if given, the creation of each layer is timed as a separate stage
+        curve_loops(dict): if given, curve loops are shared between identical contours, see `add_plane_surface`
 
     Returns:
         tags(dict): a dictionary containing all the dim_tags of the created face:
@@ -235,15 +357,27 @@ def create_face(cell: pya.Cell, layer_map: dict, face: str, z_level: float, mesh
     if port_dim_tags is None:
         port_dim_tags = []
 
-    ground_dim_tags = add_shape_polygons(cell, layer_map, face, "simulation_ground", z_level, mesh_sizes['ground'])
-    ground_grid_dim_tags = add_shape_polygons(cell, layer_map, face, "ground_grid", z_level, mesh_sizes['ground_grid'])
-    gap_dim_tags = add_shape_polygons(cell, layer_map, face, "simulation_gap", z_level, mesh_sizes['gap'])
-    signal_dim_tags = add_shape_polygons(cell, layer_map, face, "simulation_signal", z_level, mesh_sizes['signal'])
+    def lap(stage):
+        if timer is not None:
+            timer.lap(f'face {face} {stage}')
+
+    def add_layer(layer, mesh_size):
+        return add_shape_polygons(cell, layer_map, face, layer, z_level, mesh_size, curve_loops)
+
+    ground_dim_tags = add_layer("simulation_ground", mesh_sizes['ground'])
+    lap('ground')
+    ground_grid_dim_tags = add_layer("ground_grid", mesh_sizes['ground_grid'])
+    lap('ground grid')
+    gap_dim_tags = add_layer("simulation_gap", mesh_sizes['gap'])
+    lap('gap')
+    signal_dim_tags = add_layer("simulation_signal", mesh_sizes['signal'])
+    lap('signal')
 
-    if len(ground_dim_tags) > 0 and len(ground_grid_dim_tags) > 0:
-        ground_dim_tags, _ = gmsh.model.occ.cut(ground_dim_tags, ground_grid_dim_tags, removeTool=False)
+    # The ground grid is not cut from the ground, because it is obtained as the complement of the other layers and
+    # never overlaps the ground. The cut would be an expensive boolean operation that does not change the geometry.
     if len(gap_dim_tags) > 0 and len(port_dim_tags) > 0:
         gap_dim_tags, _ = gmsh.model.occ.cut(gap_dim_tags, port_dim_tags, removeTool=False)
+    lap('cuts')
 
     tags = {
         'ground': ground_dim_tags,
@@ -801,6 +935,7 @@ def export_gmsh_msh(sim_data: dict, path: Path, mesh_size: dict, show: bool = Fa
     """
     params = sim_data['parameters']
     filepath = Path(path).joinpath(params['name'] + '.msh')
+    timer = StageTimer(f"Gmsh export of {params['name']}")
 
     gmsh.initialize()
     gmsh.option.setNumber("General.NumThreads", gmsh_n_threads)
@@ -809,6 +944,7 @@ def export_gmsh_msh(sim_data: dict, path: Path, mesh_size: dict, show: bool = Fa
     layout = pya.Layout()
     layout.read(str(Path(path).joinpath(sim_data['gds_file'])))
     cell = layout.top_cell()
+    timer.lap('reading geometry')
 
     port_data_gmsh = sim_data['ports']
     faces = [0] if len(params['face_stack']) == 1 else [0, 1]
@@ -829,18 +965,22 @@ def export_gmsh_msh(sim_data: dict, path: Path, mesh_size: dict, show: bool = Fa
             else:
                 edge_port_dim_tags.append(port['dim_tag'])
                 port['occ_bounding_box'] = gmsh.model.occ.getBoundingBox(*port['dim_tag'])
+    timer.lap('ports')
 
     face_dim_tag_dicts = []
     chips = []
     face_dim_tags = []
+    curve_loops = {}  # faces sharing their contours are cheap to fragment
     for face in faces:
         face_dim_tag_dicts.append(create_face(cell, sim_data['layers'], params['face_ids'][face],
-                                              face_z_levels[face], port_dim_tags=face_port_dim_tags[face]))
+                                              face_z_levels[face], port_dim_tags=face_port_dim_tags[face],
+                                              timer=timer, curve_loops=curve_loops))
         chips.append(box_volume(face_dim_tag_dicts[face]['ground'], chip_dzs[face]))
         face_dim_tags.append(face_tag_dict_to_list(face_dim_tag_dicts[face]))
 
     ground_dim_tags = [v for f in face_dim_tag_dicts for v in f['ground']]
     vacuum = box_volume(ground_dim_tags, params['upper_box_height'] if len(params['face_stack']) == 1 else None)
+    timer.lap('volumes')
 
     # Finalize geometry using fragment -> dim_tags need to be updated
     all_dim_tags = chips + [vacuum] + [a for b in face_dim_tags for a in b] + [a for b in face_port_dim_tags for a in
@@ -854,6 +994,7 @@ def export_gmsh_msh(sim_data: dict, path: Path, mesh_size: dict, show: bool = Fa
     chips = [t for tag in chips for t in dim_tags_map[tag]]
     vacuum = dim_tags_map[vacuum][0]
     gmsh.model.occ.synchronize()
+    timer.lap('fragment')
 
     # Refine mesh
     for face in faces:
@@ -877,6 +1018,7 @@ def export_gmsh_msh(sim_data: dict, path: Path, mesh_size: dict, show: bool = Fa
     if gmsh_n_threads == -1:
         gmsh_n_threads = int(os.cpu_count() / 2 + 0.5)  # for the moment avoid psutil.cpu_count(logical=False)
     set_meshing_options(mesh_field_ids, mesh_global_max_size, gmsh_n_threads)
+    timer.lap('mesh size fields')
 
     # Set ports
     for port in port_data_gmsh:
@@ -936,9 +1078,12 @@ def export_gmsh_msh(sim_data: dict, path: Path, mesh_size: dict, show: bool = Fa
         ground_name = 'ground_{}'.format(i)
         set_physical_name(dim_tag, ground_name)
         ground_names.append(ground_name)
+    timer.lap('physical groups')
 
     gmsh.model.mesh.generate(3)
+    timer.lap('meshing')
     gmsh.write(str(filepath))
+    timer.lap('writing')
     if show:
         gmsh.fltk.run()
     gmsh.finalize()
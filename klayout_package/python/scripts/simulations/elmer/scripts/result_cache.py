@@ -0,0 +1,158 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+"""Content-addressed on-disk store of Elmer simulation results.
+
+A simulation is identified by a hash of its json data without the simulation name and workflow settings, of the
+polygons in its gds file and of the sources of the run scripts. Results of a simulation that has already been solved
+with the same key are copied from the store instead of running Gmsh, ElmerGrid and ElmerSolver again. The store is
+limited in size by evicting the least recently used entries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+try:
+    import pya
+except ImportError:
+    import klayout.db as pya
+
+
+def result_files(json_data, name):
+    """Returns the result files of a simulation, or empty list if the results of the tool are not cached.
+
+    The files are given as list of tuples (file name in the cache entry, path relative to the simulation folder). The
+    first file is the primary result, an entry is usable only if it contains that file.
+    """
+    tool = json_data.get('tool', 'capacitance')
+    if tool == 'capacitance':
+        return [('capacitancematrix.dat', f'{name}/capacitancematrix.dat'),
+                ('project_results.json', f'{name}_project_results.json')]
+    if tool == 'cross-section':
+        return [('result.json', f'{name}_result.json')]
+    return []
+
+
+def simulation_key(json_data, path):
+    """Returns the cache key of the simulation described by ``json_data`` and exported into ``path``."""
+    digest = hashlib.sha256()
+    data = {k: v for k, v in json_data.items() if k not in ('gds_file', 'workflow')}
+    data['parameters'] = {k: v for k, v in json_data.get('parameters', {}).items() if k != 'name'}
+    digest.update(json.dumps(data, sort_keys=True).encode())
+
+    layout = pya.Layout()
+    layout.read(str(Path(path).joinpath(json_data['gds_file'])))
+    cell = layout.top_cell()
+    for layer_name, (layer, datatype) in sorted(json_data.get('layers', {}).items()):
+        digest.update(layer_name.encode())
+        shape_iter = cell.begin_shapes_rec(layout.layer(layer, datatype))
+        while not shape_iter.at_end():
+            polygon = shape_iter.shape().polygon
+            if polygon is not None:
+                digest.update(str(polygon.transformed(shape_iter.trans())).encode())
+            shape_iter.next()
+
+    for script in sorted(Path(__file__).parent.glob('*.py')):
+        digest.update(script.read_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Directory-backed store of simulation result files with size-based least recently used eviction.
+
+    Attributes:
+        path: directory containing one sub-directory of result files per key
+        max_size: maximum total size of the stored files in bytes
+    """
+
+    def __init__(self, path, max_size):
+        self.path = Path(path)
+        self.max_size = max_size
+
+    def restore(self, key, files, target):
+        """Copies the cached ``files`` of ``key`` into folder ``target``.
+
+        Args:
+            key: simulation key, see ``simulation_key``
+            files: result files, see ``result_files``
+            target: simulation folder
+
+        Returns:
+            True if the key was found in the cache, False otherwise
+        """
+        entry = self.path / key
+        if not files or not (entry / files[0][0]).exists():
+            return False
+        for cache_name, file in files:
+            if (entry / cache_name).exists():
+                Path(target, file).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(entry / cache_name, Path(target, file))
+        os.utime(entry)  # mark as recently used
+        logging.info(f'Restored results from result cache {key}')
+        return True
+
+    def store(self, key, files, source):
+        """Copies ``files`` in folder ``source`` into the cache under ``key``.
+
+        Evicts least recently used entries if the cache grows larger than ``max_size``.
+
+        Args:
+            key: simulation key, see ``simulation_key``
+            files: result files produced by the simulation that was just run, see ``result_files``
+            source: simulation folder
+        """
+        self._copy_files(self.path / key, files, source)
+        self._evict()
+
+    def update(self, key, files, source):
+        """Adds ``files`` in folder ``source`` into the existing entry of ``key``, for results derived from it."""
+        if (self.path / key).exists():
+            self._copy_files(self.path / key, files, source)
+            self._evict()
+
+    @staticmethod
+    def _copy_files(entry, files, source):
+        for cache_name, file in files:
+            if not Path(source, file).exists():
+                continue
+            # copy to a temporary file first so that other processes never see a partially written file
+            entry.mkdir(parents=True, exist_ok=True)
+            tmp_file = entry / f'{cache_name}.{uuid.uuid4().hex}.tmp'
+            shutil.copy2(Path(source, file), tmp_file)
+            os.replace(tmp_file, entry / cache_name)
+        if entry.exists():
+            os.utime(entry)
+
+    def _evict(self):
+        if not self.path.exists():
+            return
+        entries = []
+        for entry in self.path.iterdir():
+            if entry.is_dir():
+                size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+                entries.append((entry.stat().st_mtime, size, entry))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
@@ -0,0 +1,225 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+_description = """
+Run the stages of Elmer simulations on the local machine.
+Each simulation is split into the stages Gmsh -> ElmerGrid -> Elmer -> (Paraview, results, versions file). A stage is started as soon as the stages it depends on have finished and there are enough free
+cores for it, so that for example the single-threaded stages of some simulations run while others are solved by Elmer.
+Finished stages are marked in the folder 'stage_markers', and are not run again unless the json file of the simulation
+changes or --restart is given. The time taken by each stage is written in 'stage_report.json'.
+"""
+
+parser = argparse.ArgumentParser(description=_description)
+parser.add_argument('n_cores', metavar='n_cores', type=int, help='Number of cores to use, -1 uses all cores')
+parser.add_argument('simulations', metavar='sim', type=str, nargs='*',
+                    help='All simulations to simulate (`.json` file)')
+parser.add_argument('--python', type=str, default=sys.executable, help='Python executable used to run the stages')
+parser.add_argument('--script', type=str, default='scripts/run.py', help='Run script of a single simulation')
+parser.add_argument('--restart', action='store_true', help='Run also the stages that are already marked finished')
+
+MARKER_DIR = 'stage_markers'
+REPORT_FILE = 'stage_report.json'
+
+# stage name, run.py arguments, log file suffix, names of the stages it depends on
+STAGES = [
+    ('gmsh', ['--only-gmsh'], 'Gmsh', []),
+    ('elmergrid', ['--only-elmergrid'], 'ElmerGrid', ['gmsh']),
+    ('elmer', ['--only-elmer'], 'Elmer', ['elmergrid']),
+    ('paraview', ['--only-paraview'], 'Paraview', ['elmer']),
+    ('results', ['--write-project-results'], 'write_project_results', ['elmer']),
+    ('versions', ['--write-versions-file'], 'write_versions_file', ['elmer']),  # reads the Elmer log
+]
+
+
+def n_processes(value):
+    """Returns the number of cores corresponding to a process count in the workflow settings."""
+    if value == -1:
+        return int(os.cpu_count() / 2 + 0.5)  # for the moment avoid psutil.cpu_count(logical=False)
+    return max(1, int(value))
+
+
+class Stage:
+    """A stage of a simulation run as a separate process.
+
+    Attributes:
+        simulation: json file of the simulation
+        name: name of the stage
+        command: command line of the stage
+        log_file: file into which the output of the stage is written
+        cores: number of cores reserved for the stage
+        depends_on: stages that must finish successfully before this stage is started
+        status: one of 'pending', 'running', 'finished', 'failed', 'skipped' or 'already finished'
+    """
+
+    def __init__(self, simulation, name, command, log_file, *, cores, depends_on):
+        self.simulation = simulation
+        self.name = name
+        self.command = command
+        self.log_file = log_file
+        self.cores = cores
+        self.depends_on = depends_on
+        self.status = 'pending'
+        self.process = None
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def marker(self):
+        return Path(MARKER_DIR, f'{Path(self.simulation).name}.{self.name}.done')
+
+    def is_marked_finished(self):
+        """Returns True if the stage has finished after the json file of the simulation was last modified."""
+        return self.marker.exists() and self.marker.stat().st_mtime >= Path(self.simulation).stat().st_mtime
+
+    def start(self):
+        self.status = 'running'
+        self.start_time = time.time()
+        with open(self.log_file, 'a', encoding='utf-8') as log:
+            self.process = subprocess.Popen(  # pylint: disable=consider-using-with
+                self.command, stdout=log, stderr=subprocess.STDOUT)
+
+    def poll(self):
+        """Updates the status of a running stage and returns True if it has ended."""
+        if self.process.poll() is None:
+            return False
+        self.end_time = time.time()
+        if self.process.returncode == 0:
+            self.status = 'finished'
+            self.marker.parent.mkdir(exist_ok=True)
+            self.marker.touch()
+        else:
+            self.status = 'failed'
+        return True
+
+    def report(self):
+        duration = None if self.start_time is None or self.end_time is None else self.end_time - self.start_time
+        return {
+            'simulation': self.simulation,
+            'stage': self.name,
+            'status': self.status,
+            'cores': self.cores,
+            'start': self.start_time,
+            'end': self.end_time,
+            'duration': duration,
+            'returncode': None if self.process is None else self.process.returncode,
+        }
+
+
+def simulation_stages(simulation, args):
+    """Returns the stages of the simulation in ``simulation`` json file."""
+    with open(simulation, encoding='utf-8') as f:
+        workflow = json.load(f).get('workflow', {})
+    cores = {
+        'gmsh': n_processes(workflow.get('gmsh_n_threads', 1)),
+        'elmer': n_processes(workflow.get('elmer_n_processes', 1)),
+    }
+    stages = {}
+    for name, run_args, log_suffix, depends_on in STAGES:
+        stages[name] = Stage(simulation, name, [args.python, args.script, simulation] + run_args,
+                             f'{simulation}_{log_suffix}.log', cores=min(cores.get(name, 1), args.n_cores),
+                             depends_on=[stages[d] for d in depends_on])
+    return list(stages.values())
+
+
+def write_report(stages):
+    tmp_file = f'{REPORT_FILE}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump([stage.report() for stage in stages], f, indent=4)
+    os.replace(tmp_file, REPORT_FILE)
+
+
+def print_failure(stage):
+    print(f'Stage {stage.name} of {stage.simulation} exited with code {stage.process.returncode}. '
+          f'The last lines of {stage.log_file}:')
+    with open(stage.log_file, encoding='utf-8', errors='replace') as f:
+        print(''.join(f.readlines()[-20:]))
+
+
+def mark_already_finished(stages):
+    """Sets the status of the stages that are marked finished to 'already finished'.
+
+    The stages must be in dependency order, since a stage is run again if any stage it depends on is run.
+    """
+    for stage in stages:
+        if stage.is_marked_finished() and all(d.status == 'already finished' for d in stage.depends_on):
+            stage.status = 'already finished'
+
+
+def run_stages(stages, n_cores):
+    """Runs the stages respecting their dependencies and the number of available cores.
+
+    The stages are started in the given order whenever the stages they depend on have finished and enough cores are
+    free. A stage that cannot be started does not block the stages after it. Stages that depend on a failed stage are
+    skipped.
+    """
+    running = []
+    pending = [s for s in stages if s.status == 'pending']
+    try:
+        while pending or running:
+            free_cores = n_cores - sum(s.cores for s in running)
+            for stage in list(pending):
+                if any(d.status in ('failed', 'skipped') for d in stage.depends_on):
+                    stage.status = 'skipped'
+                    pending.remove(stage)
+                elif all(d.status in ('finished', 'already finished') for d in stage.depends_on) and \
+                        stage.cores <= free_cores:
+                    print(f'Starting stage {stage.name} of {stage.simulation}')
+                    stage.start()
+                    running.append(stage)
+                    pending.remove(stage)
+                    free_cores -= stage.cores
+            time.sleep(0.1)
+            for stage in [s for s in running if s.poll()]:
+                running.remove(stage)
+                if stage.status == 'failed':
+                    print_failure(stage)
+                write_report(stages)
+    except KeyboardInterrupt:
+        for stage in running:
+            stage.process.terminate()
+            stage.process.wait()
+            stage.status = 'failed'
+            stage.end_time = time.time()
+        raise
+    finally:
+        write_report(stages)
+
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    if not arguments.simulations:
+        print('No simulations to run.')
+        sys.exit(0)
+    if arguments.n_cores == -1:
+        arguments.n_cores = os.cpu_count()
+    all_stages = [stage for sim in arguments.simulations for stage in simulation_stages(sim, arguments)]
+    if not arguments.restart:
+        mark_already_finished(all_stages)
+
+    run_stages(all_stages, arguments.n_cores)
+
+    n_failed = sum(s.status == 'failed' for s in all_stages)
+    print(f'Finished {sum(s.status == "finished" for s in all_stages)} stages, {n_failed} stages failed, '
+          f'{sum(s.status == "skipped" for s in all_stages)} stages skipped.')
+    sys.exit(1 if n_failed else 0)
@@ -140,7 +140,7 @@ if use_elmer:
         'n_workers': 2, # <--------- This defines the number of
                         #            parallel independent processes.
                         #            Moreover, adding this line activates
-                        #            the use of the simple workload manager.
+                        #            the use of the stage scheduler.
     }
     if use_sbatch:  # if simulation is run in a HPC system, sbatch_parameters can be given here
         workflow['sbatch_parameters'] = {
@@ -0,0 +1,82 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+# Compares the ground grid generation time of `make_grid` with the previous loop based implementation on the Demo chip.
+# usage: python benchmark_groundgrid.py [repeats]
+
+from sys import argv
+from time import perf_counter
+
+import numpy
+
+from kqcircuits.chips.demo import Demo
+from kqcircuits.defaults import default_layers
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util.groundgrid import make_grid
+
+
+def previous_make_grid(boundbox, avoid_region, grid_step=10, grid_size=5, group_n=10):
+    """The loop based implementation of `make_grid` used before the bulk grid generation."""
+    def grid_region(box, step, size):
+        square = pya.Box(0, 0, size, size)
+        x_region = pya.Region()
+        for x in numpy.arange(box.p1.x, box.p2.x, step):
+            x_region.insert(square.transformed(pya.Trans(pya.Vector(x, 0))))
+        xy_region = pya.Region()
+        for y in numpy.arange(box.p1.y, box.p2.y, step):
+            xy_region.insert(x_region.transformed(pya.Trans(pya.Vector(0, y))))
+        return xy_region
+
+    box_step = group_n * grid_step
+    box_size = box_step - grid_step + grid_size
+    boxes_region = grid_region(boundbox, box_step, box_size)
+    masked_boxes_region = ((boxes_region & pya.Region(boundbox)) - avoid_region).with_area(box_size**2, None, False)
+    holes_region = grid_region(pya.Box(0, 0, box_step, box_step), grid_step, grid_size)
+    overlap_region = pya.Region()
+    for poly in (boxes_region - masked_boxes_region).each():
+        overlap_region.insert(holes_region.transformed(pya.Trans(pya.Vector(poly.bbox().p1))))
+    masked_holes_region = ((overlap_region & pya.Region(boundbox)) - avoid_region).with_area(grid_size**2, None, False)
+    for poly in masked_boxes_region.each():
+        masked_holes_region.insert(holes_region.transformed(pya.Trans(pya.Vector(poly.bbox().p1))))
+    return masked_holes_region
+
+
+def best_time(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function()
+        times.append(perf_counter() - start)
+    return min(times), result
+
+
+repeats = int(argv[1]) if len(argv) > 1 else 3
+
+layout = pya.Layout()
+cell = Demo.create(layout, with_grid=False)
+grid_area = cell.bbox()
+protection = pya.Region(cell.begin_shapes_rec(layout.layer(default_layers["1t1_ground_grid_avoidance"]))).merged()
+grid_step, grid_size = 10 * (1 / layout.dbu), 5 * (1 / layout.dbu)  # as in Chip.produce_ground_on_face_grid
+
+previous_time, previous_grid = best_time(lambda: previous_make_grid(grid_area, protection, grid_step, grid_size),
+                                         repeats)
+new_time, new_grid = best_time(lambda: make_grid(grid_area, protection, grid_step, grid_size), repeats)
+
+print(f"Demo chip ground grid: {new_grid.count()} holes")
+print(f"previous implementation: {previous_time:.2f} s")
+print(f"make_grid:               {new_time:.2f} s ({previous_time / new_time:.2f}x)")
+print(f"identical: {previous_grid.count() == new_grid.count() and (previous_grid ^ new_grid).is_empty()}")
@@ -0,0 +1,50 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+# Profiles the creation of a chip and prints the element classes that take the most time to build.
+# The profile is written as a speedscope file, which can be viewed as a flame graph in https://www.speedscope.app.
+# usage: python profile_chip.py [chip class name, default Demo] [--top N] [--output file] [--json file]
+
+import argparse
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util.library_helper import element_by_class_name
+from kqcircuits.util.pcell_variant_cache import pcell_variant_cache
+from kqcircuits.util.profiling import profile_elements
+
+parser = argparse.ArgumentParser(description="Profile the creation of a chip")
+parser.add_argument("chip", nargs="?", default="Demo", help="Class name of the chip, for example Demo or DaisyWoven")
+parser.add_argument("--top", type=int, default=20, help="Number of element classes to print")
+parser.add_argument("--output", default="chip_profile.speedscope.json", help="Speedscope file to write")
+parser.add_argument("--json", help="Hierarchical json file to write")
+args = parser.parse_args()
+
+chip_class = element_by_class_name(args.chip, "chips", "Chip Library")
+if chip_class is None:
+    raise ValueError(f"Chip {args.chip} not found in the chip library")
+
+layout = pya.Layout()
+pcell_variant_cache.clear()
+with profile_elements(args.chip) as profiler:
+    chip_class.create(layout)
+
+print(profiler.summary(args.top))
+profiler.write_speedscope(args.output)
+print(f"Speedscope profile written to {args.output}")
+if args.json:
+    profiler.write_json(args.json)
+    print(f"Profile tree written to {args.json}")
@@ -0,0 +1,52 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import pytest
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.defaults import default_layers
+from kqcircuits.pya_resolver import pya
+
+
+@pytest.fixture(scope="module", name="chips")
+def fixture_chips():
+    """Returns (layout, cell) tuples of a chip with flat grid and of the same chip with grid arrays."""
+    chips = []
+    for grid_as_arrays in (False, True):
+        layout = pya.Layout()
+        chips.append((layout, Chip.create(layout, box=pya.DBox(0, 0, 4000, 4000),
+                                          face_boxes=[None, pya.DBox(500, 500, 3500, 3500)], frames_enabled=[0, 1],
+                                          with_grid=True, merge_base_metal_gap=True, grid_as_arrays=grid_as_arrays)))
+    return chips
+
+
+@pytest.mark.parametrize("layer_name", ["1t1_ground_grid", "2b1_ground_grid", "1t1_base_metal_gap",
+                                        "2b1_base_metal_gap"])
+def test_grid_arrays_have_identical_geometry(chips, layer_name):
+    (flat_layout, flat_cell), (array_layout, array_cell) = chips
+    flat = pya.Region(flat_cell.begin_shapes_rec(flat_layout.layer(default_layers[layer_name])))
+    arrays = pya.Region(array_cell.begin_shapes_rec(array_layout.layer(default_layers[layer_name])))
+    assert not flat.is_empty()
+    assert flat.count() == arrays.count()
+    assert (flat ^ arrays).is_empty()
+
+
+def test_grid_arrays_leave_few_flat_holes(chips):
+    layout, cell = chips[1]
+    layer = layout.layer(default_layers["1t1_ground_grid"])
+    flat_count = cell.shapes(layer).size()
+    assert 0 < flat_count < pya.Region(cell.begin_shapes_rec(layer)).count() / 5
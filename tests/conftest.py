@@ -0,0 +1,30 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import pytest
+
+from kqcircuits.util import library_helper
+
+
+@pytest.fixture(autouse=True, scope="session")
+def library_index_file(tmp_path_factory):
+    """Writes the library index into a temporary directory instead of TMP_PATH, also in subprocesses of the tests."""
+    index_file = tmp_path_factory.mktemp("library_index") / "library_index.json"
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(library_helper, "_library_index_file", index_file)
+        monkeypatch.setenv("KQC_LIBRARY_INDEX_PATH", str(index_file))
+        yield index_file
@@ -0,0 +1,60 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from kqcircuits import defaults
+
+# kqcircuits.defaults is imported in a fresh interpreter, after importing its dependencies, such that running the
+# KLayout executable raises an error.
+_import_script = """
+import json, subprocess, time
+import kqcircuits, kqcircuits.pya_resolver, kqcircuits.util.import_helper
+def _fail(*args, **kwargs):
+    raise AssertionError("subprocess called")
+subprocess.check_output = subprocess.run = subprocess.Popen = _fail
+start = time.perf_counter()
+import kqcircuits.defaults as defaults
+duration = time.perf_counter() - start
+print(json.dumps({"duration": duration, "klayout_version": defaults.KLAYOUT_VERSION}))
+"""
+
+
+def _import_defaults():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.check_output([sys.executable, "-c", _import_script], env=env)
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def test_import_does_not_run_klayout():
+    assert _import_defaults()["klayout_version"].startswith("KLayout ")
+
+
+def test_import_time():
+    duration = min(_import_defaults()["duration"] for _ in range(3))
+    logging.getLogger(__name__).info("Importing kqcircuits.defaults took %.1f ms", duration * 1000)
+    # generous bound that only fails if the import runs KLayout or does similarly slow work again
+    assert duration < 1.0
+
+
+def test_klayout_version():
+    assert defaults.KLAYOUT_VERSION.startswith("KLayout ")
+    assert defaults.get_klayout_version() is defaults.get_klayout_version()
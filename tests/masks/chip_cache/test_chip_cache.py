@@ -0,0 +1,85 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.chips.single_xmons import SingleXmons
+from kqcircuits.masks import chip_cache
+from kqcircuits.masks.chip_cache import ChipCache
+from kqcircuits.masks.mask_set import MaskSet
+from kqcircuits.pya_resolver import pya
+
+
+def test_key_is_deterministic(tmp_path):
+    params = {"name_chip": "CH1", "frames_enabled": [0], "box": pya.DBox(0, 0, 10000, 10000)}
+    assert ChipCache(tmp_path).key(Chip, params) == ChipCache(tmp_path).key(Chip, dict(params))
+
+
+def test_key_includes_default_parameters(tmp_path):
+    cache = ChipCache(tmp_path)
+    assert cache.key(Chip, {}) == cache.key(Chip, {"name_chip": Chip.name_chip})
+
+
+def test_key_changes_with_parameters_class_and_settings(tmp_path):
+    cache = ChipCache(tmp_path)
+    keys = {
+        cache.key(Chip, {"name_chip": "CH1"}),
+        cache.key(Chip, {"name_chip": "CH2"}),
+        cache.key(SingleXmons, {"name_chip": "CH1"}),
+        cache.key(Chip, {"name_chip": "CH1"}, export_drc=True),
+    }
+    assert len(keys) == 4
+
+
+def test_store_and_restore(tmp_path):
+    chip_dir = tmp_path / "Chips" / "CH1"
+    chip_dir.mkdir(parents=True)
+    for name in ["CH1.oas", "CH1_with_pcells.oas", "CH1.json", "CH1-netlist.json", "CH1 EBL.gds", "CH1.log"]:
+        (chip_dir / name).write_text(name)
+
+    cache = ChipCache(tmp_path / "cache")
+    key = cache.key(Chip, {"name_chip": "CH1"})
+    assert not cache.restore(key, "CH1", tmp_path / "restored")
+    cache.store(key, "CH1", chip_dir)
+    assert cache.restore(key, "CH1", tmp_path / "restored")
+
+    restored = sorted(p.name for p in (tmp_path / "restored").iterdir())
+    assert restored == ["CH1 EBL.gds", "CH1-netlist.json", "CH1.json", "CH1.oas", "CH1_with_pcells.oas"]
+    assert (tmp_path / "restored" / "CH1.oas").read_text() == "CH1.oas"
+
+
+def test_key_changes_with_any_library_source(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    (src / "elements").mkdir(parents=True)
+    module = src / "elements" / "lazily_loaded_element.py"
+    module.write_text("a = 1\n")
+    monkeypatch.setattr(chip_cache, "SRC_PATHS", [src])
+    key = ChipCache(tmp_path).key(Chip, {})
+    module.write_text("a = 2\n")
+    assert ChipCache(tmp_path).key(Chip, {}) != key
+
+
+def test_mask_set_key_includes_worker_templates(tmp_path):
+    mask_set = MaskSet(name="Cache", debug=True, chip_cache=tmp_path)
+    key = mask_set._chip_cache_key(Chip, {})
+    assert mask_set._chip_cache_key(Chip, {}, in_worker=True) == key
+    mask_set.template_imports = ["import json", "json.dump({}, open(chip_path / 'post.json', 'w'))"]
+    worker_key = mask_set._chip_cache_key(Chip, {}, in_worker=True)
+    assert worker_key != key
+    # template imports are not used when chips are built in the main process
+    assert mask_set._chip_cache_key(Chip, {}) == key
+    mask_set._thread_create_chip_parameters = {"extra": 1}
+    assert mask_set._chip_cache_key(Chip, {}, in_worker=True) != worker_key
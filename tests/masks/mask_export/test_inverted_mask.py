@@ -0,0 +1,49 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.masks.mask_export import export_mask
+from kqcircuits.masks.mask_set import MaskSet
+from kqcircuits.pya_resolver import pya
+
+
+def _inverted_layer(export_dir, tile_size):
+    mask_set = MaskSet(name="Inverted", debug=True, mask_export_tile_size=tile_size, mask_export_threads=2)
+    mask_layout = mask_set.add_mask_layout([["C1", "C1"], ["C1", "C1"]], "1t1",
+                                           chips_map_offset=pya.DVector(-7500, 7500))
+    cell = Chip.create(mask_set.layout, name_chip="C1")
+    mask_set.chips_map_legend["C1"] = mask_set.layout.cell(mask_set.layout.convert_cell_to_static(cell.cell_index()))
+    mask_set.build()
+    export_mask(export_dir, "-base_metal_gap_wo_grid", mask_layout, mask_set)
+
+    layout = pya.Layout()
+    layout.read(str(next(export_dir.glob("*.oas"))))
+    return layout, layout.layer(layout.layer_infos()[0])
+
+
+def test_tiled_inversion_equals_flat_inversion(tmp_path):
+    (tmp_path / "flat").mkdir()
+    (tmp_path / "tiled").mkdir()
+    flat_layout, flat_layer = _inverted_layer(tmp_path / "flat", None)
+    tiled_layout, tiled_layer = _inverted_layer(tmp_path / "tiled", 10000)
+    flat = pya.Region(flat_layout.top_cell().begin_shapes_rec(flat_layer))
+    tiled = pya.Region(tiled_layout.top_cell().begin_shapes_rec(tiled_layer))
+    assert not flat.is_empty()
+    assert tiled.count() > flat.count()  # polygons are cut at tile borders
+    # cutting the slanted wafer edge at tile borders may move vertices by up to one database unit
+    assert not (flat ^ tiled).is_empty()
+    assert (flat ^ tiled).sized(-1).is_empty()
@@ -0,0 +1,41 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.masks.mask_export import export_designs
+from kqcircuits.masks.mask_set import MaskSet
+from kqcircuits.pya_resolver import pya
+
+
+def _export_mask(export_dir, export_processes):
+    mask_set = MaskSet(name="Parallel", debug=True, export_processes=export_processes,
+                       mask_export_layers=["base_metal_gap_wo_grid", "-base_metal_gap"])
+    mask_set.add_mask_layout([["C1", "C1"], ["C1", "C1"]], "1t1", chips_map_offset=pya.DVector(-7500, 7500))
+    mask_set.add_mask_layout([["C1"]], "2b1")
+    cell = Chip.create(mask_set.layout, name_chip="C1", frames_enabled=[0, 1])
+    mask_set.chips_map_legend["C1"] = mask_set.layout.cell(mask_set.layout.convert_cell_to_static(cell.cell_index()))
+    mask_set.build()
+    export_dir.mkdir()
+    export_designs(mask_set, export_dir)
+    return {p.relative_to(export_dir): p.read_bytes() for p in export_dir.rglob("*.oas")}
+
+
+def test_parallel_export_is_identical_to_serial_export(tmp_path):
+    serial = _export_mask(tmp_path / "serial", 1)
+    parallel = _export_mask(tmp_path / "parallel", 4)
+    assert len(serial) == 6
+    assert serial == parallel
@@ -0,0 +1,43 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.defaults import default_faces
+from kqcircuits.masks.mask_set import MaskSet
+from kqcircuits.pya_resolver import pya
+
+
+def _faces_with_shapes(cell):
+    layout = cell.layout()
+    return {face_id for face_id, face in default_faces.items()
+            if any(not pya.Region(cell.begin_shapes_rec(layout.layer(layer_info))).is_empty()
+                   for key, layer_info in face.items() if key != "id")}
+
+
+def test_chip_copies_only_contain_own_face():
+    mask_set = MaskSet(name="Faces", debug=True)
+    mask_set.add_mask_layout([["C1"]], "1t1")
+    mask_set.add_mask_layout([["C1"]], "2b1")
+    cell = Chip.create(mask_set.layout, name_chip="C1", frames_enabled=[0, 1])
+    mask_set.chips_map_legend["C1"] = cell
+    assert _faces_with_shapes(cell) == {"1t1", "2b1"}
+
+    mask_set.build()
+
+    assert _faces_with_shapes(cell) == {"1t1", "2b1"}  # the original chip is not modified
+    for mask_layout in mask_set.mask_layouts:
+        assert _faces_with_shapes(mask_layout.chips_map_legend["C1"]) == {mask_layout.face_id}
@@ -0,0 +1,53 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.masks import mask_set as mask_set_module
+from kqcircuits.masks.mask_set import MaskSet
+from kqcircuits.pya_resolver import pya
+
+
+def test_chip_in_mask_equals_exported_chip_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(mask_set_module, "TMP_PATH", tmp_path)
+    mask_set = MaskSet(name="AddChip", debug=True)
+    mask_set.add_chips([(Chip, "C1", {"frames_enabled": [0, 1]}), (Chip, "C2", {"with_grid": True})])
+    chip_dir = tmp_path / "AddChip_v1" / "Chips"
+
+    for variant_name in ["C1", "C2"]:
+        cell = mask_set.chips_map_legend[variant_name]
+        assert not cell.is_pcell_variant()
+        assert not any(mask_set.layout.cell(index).is_pcell_variant() for index in cell.called_cells())
+
+        exported = pya.Layout()
+        exported.read(str(chip_dir / variant_name / f"{variant_name}.oas"))
+        assert (chip_dir / variant_name / f"{variant_name}.json").exists()
+        for layer_info in exported.layer_infos():
+            in_mask = pya.Region(cell.begin_shapes_rec(mask_set.layout.layer(layer_info)))
+            in_file = pya.Region(exported.top_cell().begin_shapes_rec(exported.layer(layer_info)))
+            assert in_mask.count() == in_file.count()
+            assert (in_mask ^ in_file).is_empty()
+
+
+def test_only_mask_chips_remain_in_layout(tmp_path, monkeypatch):
+    monkeypatch.setattr(mask_set_module, "TMP_PATH", tmp_path)
+    mask_set = MaskSet(name="AddChip", debug=True)
+    mask_set.add_chip(Chip, "C1")
+    mask_set.add_chip(Chip, "C2")
+    mask_set.build()
+    assert not any(cell.is_pcell_variant() for cell in mask_set.layout.each_cell())
+    assert {cell.name for cell in mask_set.layout.top_cells()} >= {
+        mask_set.chips_map_legend["C1"].name, mask_set.chips_map_legend["C2"].name}
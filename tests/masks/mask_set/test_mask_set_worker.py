@@ -0,0 +1,34 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import pytest
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.masks.chip_worker import ChipJob
+from kqcircuits.masks.mask_set import MaskSet
+from kqcircuits.pya_resolver import pya
+
+
+def test_worker_substitutes_chip_keys_in_template_imports():
+    mask_set = MaskSet(name="Worker", debug=True)
+    mask_set.template_imports = ["raise RuntimeError('${variant_name} ${chip_class} ${name_mask}')"]
+    script = mask_set._get_worker_script()
+    namespace = {}
+    # run the worker script up to its job loop to define build_chip
+    exec(compile(script[:script.index("\ntry:")], "chip_worker.py", "exec"), namespace)  # pylint: disable=exec-used
+    with pytest.raises(RuntimeError, match="C1 Chip Worker"):
+        namespace["build_chip"](ChipJob(Chip, "C1", {}), pya.Layout())
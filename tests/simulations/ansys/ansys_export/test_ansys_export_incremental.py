@@ -0,0 +1,85 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import json
+
+from kqcircuits.defaults import default_layers
+from kqcircuits.pya_resolver import pya
+from kqcircuits.simulations.empty_simulation import EmptySimulation
+from kqcircuits.simulations.export.ansys.ansys_export import export_ansys
+from kqcircuits.simulations.export.export_manifest import EXPORT_MANIFEST_FILENAME
+
+
+def _simulations(signal_box=None):
+    layout = pya.Layout()
+    simulations = [EmptySimulation(layout, name=f"sim_{i}", box=pya.DBox(0, 0, 500 + 100 * i, 500)) for i in range(3)]
+    if signal_box is not None:
+        simulations[1].cell.shapes(layout.layer(default_layers["1t1_simulation_signal"])).insert(signal_box)
+    return simulations
+
+
+def _modification_times(path):
+    return {f.name: f.stat().st_mtime_ns for f in path.glob("sim_*.*")}
+
+
+def _simulations_in_bat(bat_filename):
+    with open(bat_filename, encoding="utf-8") as f:
+        text = f.read()
+    return [name for name in ("sim_0", "sim_1", "sim_2") if f"{name}.json" in text]
+
+
+def test_first_incremental_export_writes_all_simulations(tmp_path):
+    bat_filename = export_ansys(_simulations(), tmp_path, incremental=True)
+    assert _simulations_in_bat(bat_filename) == ["sim_0", "sim_1", "sim_2"]
+    with open(tmp_path / EXPORT_MANIFEST_FILENAME, encoding="utf-8") as f:
+        assert sorted(json.load(f)) == ["sim_0", "sim_1", "sim_2"]
+
+
+def test_incremental_export_skips_unchanged_simulations(tmp_path):
+    export_ansys(_simulations(), tmp_path, incremental=True)
+    times = _modification_times(tmp_path)
+    bat_filename = export_ansys(_simulations(), tmp_path, incremental=True)
+    assert _modification_times(tmp_path) == times
+    assert not _simulations_in_bat(bat_filename)
+
+
+def test_incremental_export_rewrites_simulation_with_changed_geometry(tmp_path):
+    export_ansys(_simulations(), tmp_path, incremental=True)
+    times = _modification_times(tmp_path)
+    bat_filename = export_ansys(_simulations(signal_box=pya.Box(0, 0, 10000, 10000)), tmp_path, incremental=True)
+    new_times = _modification_times(tmp_path)
+    assert sorted(name for name in times if new_times[name] != times[name]) == ["sim_1.gds", "sim_1.json"]
+    assert _simulations_in_bat(bat_filename) == ["sim_1"]
+
+
+def test_incremental_export_rewrites_missing_files(tmp_path):
+    export_ansys(_simulations(), tmp_path, incremental=True)
+    (tmp_path / "sim_2.gds").unlink()
+    bat_filename = export_ansys(_simulations(), tmp_path, incremental=True)
+    assert (tmp_path / "sim_2.gds").exists()
+    assert _simulations_in_bat(bat_filename) == ["sim_2"]
+
+
+def test_non_incremental_export_writes_all_simulations(tmp_path):
+    export_ansys(_simulations(), tmp_path, incremental=True)
+    bat_filename = export_ansys(_simulations(), tmp_path)
+    assert _simulations_in_bat(bat_filename) == ["sim_0", "sim_1", "sim_2"]
+
+
+def test_non_incremental_export_writes_no_manifest(tmp_path):
+    export_ansys(_simulations(), tmp_path)
+    assert not (tmp_path / EXPORT_MANIFEST_FILENAME).exists()
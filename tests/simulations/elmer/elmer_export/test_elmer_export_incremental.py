@@ -0,0 +1,34 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+from kqcircuits.pya_resolver import pya
+from kqcircuits.simulations.empty_simulation import EmptySimulation
+from kqcircuits.simulations.export.elmer.elmer_export import export_elmer
+
+
+def _simulations():
+    layout = pya.Layout()
+    return [EmptySimulation(layout, name=f"sim_{i}", box=pya.DBox(0, 0, 500 + 100 * i, 500)) for i in range(2)]
+
+
+def test_unchanged_incremental_export_does_not_run_stage_scheduler(tmp_path):
+    workflow = {"n_workers": 2, "elmer_n_processes": 1}
+    script = export_elmer(_simulations(), tmp_path, workflow=workflow, incremental=True)
+    with open(script, encoding="utf-8") as f:
+        assert '"sim_0.json" "sim_1.json"' in f.read()
+    script = export_elmer(_simulations(), tmp_path, workflow=workflow, incremental=True)
+    with open(script, encoding="utf-8") as f:
+        assert "stage_scheduler.py" not in f.read()
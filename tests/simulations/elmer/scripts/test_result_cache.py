@@ -0,0 +1,99 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import importlib.util
+import os
+
+from kqcircuits.defaults import ELMER_SCRIPT_PATHS
+from kqcircuits.pya_resolver import pya
+
+_spec = importlib.util.spec_from_file_location("result_cache", ELMER_SCRIPT_PATHS[0] / "scripts" / "result_cache.py")
+result_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(result_cache)
+
+
+def _simulation(path, name="sim", box=pya.DBox(0, 0, 100, 100), **json_data):
+    """Writes the gds file of a simulation into path and returns its json data."""
+    layout = pya.Layout()
+    cell = layout.create_cell(name)
+    cell.shapes(layout.layer(1, 0)).insert(box)
+    layout.write(str(path / f"{name}.gds"))
+    return {
+        "tool": "capacitance",
+        "parameters": {"name": name, "box": [0, 0, 100, 100]},
+        "layers": {"signal": [1, 0]},
+        "gds_file": f"{name}.gds",
+        "workflow": {"elmer_n_processes": 1},
+        **json_data,
+    }
+
+
+def _write_results(path, name, content="1 0\n0 1\n"):
+    (path / name).mkdir(exist_ok=True)
+    (path / name / "capacitancematrix.dat").write_text(content)
+    (path / f"{name}_project_results.json").write_text("{}")
+
+
+def test_key_ignores_name_gds_file_and_workflow(tmp_path):
+    key = result_cache.simulation_key(_simulation(tmp_path), tmp_path)
+    renamed = _simulation(tmp_path, name="other", workflow={"elmer_n_processes": 4, "run_paraview": True})
+    assert renamed["gds_file"] != "sim.gds"
+    assert result_cache.simulation_key(renamed, tmp_path) == key
+
+
+def test_key_changes_with_json_data_and_geometry(tmp_path):
+    key = result_cache.simulation_key(_simulation(tmp_path), tmp_path)
+    assert result_cache.simulation_key(_simulation(tmp_path, mesh_size={"signal": 2}), tmp_path) != key
+    assert result_cache.simulation_key(_simulation(tmp_path, box=pya.DBox(0, 0, 100, 101)), tmp_path) != key
+    assert result_cache.simulation_key(_simulation(tmp_path), tmp_path) == key
+
+
+def test_restore_hit_and_miss(tmp_path):
+    json_data = _simulation(tmp_path)
+    files = result_cache.result_files(json_data, "sim")
+    key = result_cache.simulation_key(json_data, tmp_path)
+    cache = result_cache.ResultCache(tmp_path / "cache", 2**20)
+
+    target = tmp_path / "target"
+    assert not cache.restore(key, files, target)
+    _write_results(tmp_path, "sim")
+    cache.store(key, files, tmp_path)
+    assert cache.restore(key, files, target)
+    assert (target / "sim" / "capacitancematrix.dat").read_text() == "1 0\n0 1\n"
+    assert (target / "sim_project_results.json").exists()
+
+    changed = result_cache.simulation_key(_simulation(tmp_path, box=pya.DBox(0, 0, 50, 50)), tmp_path)
+    assert not cache.restore(changed, files, tmp_path / "changed")
+
+
+def test_tools_without_cached_results_are_never_restored(tmp_path):
+    assert not result_cache.result_files({"tool": "eigenmode"}, "sim")
+    assert not result_cache.ResultCache(tmp_path, 2**20).restore("key", [], tmp_path)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    files = [("capacitancematrix.dat", "sim/capacitancematrix.dat")]
+    _write_results(tmp_path, "sim", content="x" * 100)
+    cache = result_cache.ResultCache(tmp_path / "cache", 250)
+    cache.store("a", files, tmp_path)
+    cache.store("b", files, tmp_path)
+    os.utime(tmp_path / "cache" / "a", (1000, 1000))
+    os.utime(tmp_path / "cache" / "b", (2000, 2000))
+    assert cache.restore("a", files, tmp_path / "target")  # marks "a" used after "b"
+
+    cache.store("c", files, tmp_path)
+    assert sorted(entry.name for entry in (tmp_path / "cache").iterdir()) == ["a", "c"]
@@ -0,0 +1,131 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import importlib.util
+import json
+import os
+import sys
+from argparse import Namespace
+
+import pytest
+
+from kqcircuits.defaults import ELMER_SCRIPT_PATHS
+
+_spec = importlib.util.spec_from_file_location("stage_scheduler",
+                                               ELMER_SCRIPT_PATHS[0] / "scripts" / "stage_scheduler.py")
+stage_scheduler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stage_scheduler)
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """Runs the stages in a temporary directory, since markers and the report are written in the working directory."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sim.json").write_text("{}")
+    return tmp_path
+
+
+def _stage(name, code="", *, cores=1, depends_on=()):
+    """Returns a stage running the Python code that also appends its name to 'order.txt' when it starts."""
+    command = [sys.executable, "-c", f"open('order.txt', 'a').write('{name} ')\n{code}"]
+    return stage_scheduler.Stage("sim.json", name, command, f"{name}.log", cores=cores, depends_on=list(depends_on))
+
+
+def _order(work_dir):
+    return (work_dir / "order.txt").read_text().split()
+
+
+def test_stages_run_after_their_dependencies(work_dir):
+    gmsh = _stage("gmsh", "import time; time.sleep(0.3)")
+    elmer = _stage("elmer", depends_on=[gmsh])
+    results = _stage("results", depends_on=[elmer])
+    stage_scheduler.run_stages([results, elmer, gmsh], n_cores=4)
+
+    assert _order(work_dir) == ["gmsh", "elmer", "results"]
+    assert all(s.status == "finished" for s in [gmsh, elmer, results])
+    assert elmer.start_time >= gmsh.end_time
+    assert all(s.marker.exists() for s in [gmsh, elmer, results])
+
+
+def test_stages_are_packed_into_available_cores():
+    first, second = (_stage(name, "import time; time.sleep(0.5)") for name in ["a", "b"])
+    wide = _stage("wide", cores=2)
+    stage_scheduler.run_stages([first, wide, second], n_cores=2)
+
+    # the two-core stage waits for both cores, but does not keep the next stage from using the free core
+    assert second.start_time < first.end_time
+    assert wide.start_time >= max(first.end_time, second.end_time)
+    assert all(s.status == "finished" for s in [first, second, wide])
+
+
+def test_marked_stages_are_skipped(work_dir):
+    gmsh = _stage("gmsh")
+    elmer = _stage("elmer", depends_on=[gmsh])
+    results = _stage("results", depends_on=[elmer])
+    gmsh.marker.parent.mkdir()
+    gmsh.marker.touch()
+    results.marker.touch()
+
+    stage_scheduler.mark_already_finished([gmsh, elmer, results])
+    stage_scheduler.run_stages([gmsh, elmer, results], n_cores=1)
+
+    # results is run again, since it depends on the stage that was not marked finished
+    assert _order(work_dir) == ["elmer", "results"]
+    assert gmsh.status == "already finished"
+
+
+def test_changed_simulation_invalidates_markers(work_dir):
+    gmsh = _stage("gmsh")
+    gmsh.marker.parent.mkdir()
+    gmsh.marker.touch()
+    assert gmsh.is_marked_finished()
+    marker_time = gmsh.marker.stat().st_mtime
+    os.utime(work_dir / "sim.json", (marker_time + 1, marker_time + 1))
+    assert not gmsh.is_marked_finished()
+
+
+def test_failed_stage_is_reported_and_its_dependants_skipped(work_dir, capsys):
+    gmsh = _stage("gmsh", "print('meshing failed'); raise SystemExit(3)")
+    elmer = _stage("elmer", depends_on=[gmsh])
+    other = _stage("other")
+    stage_scheduler.run_stages([gmsh, elmer, other], n_cores=1)
+
+    assert [gmsh.status, elmer.status, other.status] == ["failed", "skipped", "finished"]
+    assert not gmsh.marker.exists()
+    assert "meshing failed" in capsys.readouterr().out
+
+    with open(work_dir / stage_scheduler.REPORT_FILE, encoding="utf-8") as f:
+        report = {entry["stage"]: entry for entry in json.load(f)}
+    assert report["gmsh"]["returncode"] == 3
+    assert report["gmsh"]["status"] == "failed"
+    assert report["elmer"]["status"] == "skipped"
+    assert report["elmer"]["duration"] is None
+    assert report["other"]["duration"] > 0
+
+
+def test_simulation_stages(work_dir):
+    workflow = {"gmsh_n_threads": 4, "elmer_n_processes": 8}
+    (work_dir / "sim.json").write_text(json.dumps({"workflow": workflow}))
+    args = Namespace(python="python", script="scripts/run.py", n_cores=6)
+    stages = {s.name: s for s in stage_scheduler.simulation_stages("sim.json", args)}
+
+    assert list(stages) == [name for name, *_ in stage_scheduler.STAGES]
+    assert stages["gmsh"].cores == 4
+    assert stages["elmer"].cores == 6
+    assert stages["results"].cores == 1
+    assert stages["elmer"].depends_on == [stages["elmergrid"]]
+    assert stages["elmer"].command == ["python", "scripts/run.py", "sim.json", "--only-elmer"]
@@ -0,0 +1,65 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import pytest
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.simulations.export.util import EdgeIndex
+
+dbu = 0.001
+
+
+def _polygons():
+    return [pya.Polygon(pya.Box(i * 20000, j * 20000, i * 20000 + 12345, j * 20000 + 6789))
+            for i in range(10) for j in range(10)]
+
+
+def _nearest_edge(polygons, point):
+    return min((((edge.p1 + edge.p2) / 2).sq_distance(point), i, j, edge)
+               for (i, polygon) in enumerate(polygons)
+               for (j, edge) in enumerate(e.to_dtype(dbu) for e in polygon.each_edge()))
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 5.0])
+def test_finds_nearest_edge(tolerance):
+    polygons = _polygons()
+    edge_index = EdgeIndex(polygons, dbu, tolerance)
+    for x, y in [(0.0, 3.3945), (12.345, 3.3945), (46.1725, 26.789), (186.1725, 180.003)]:
+        point = pya.DPoint(x, y)
+        _, i, j, edge = _nearest_edge(polygons, point)
+        assert edge_index.find_edge(point) == (i, j, edge)
+
+
+def test_finds_edges_of_holes():
+    polygon = pya.Polygon([pya.Point(0, 0), pya.Point(0, 10000), pya.Point(5000, 15000), pya.Point(10000, 10000),
+                           pya.Point(10000, 0)])
+    polygon.insert_hole(pya.Box(1000, 1000, 2000, 2000))
+    polygon.insert_hole(pya.Box(3000, 3000, 4000, 4500))
+    polygons = [pya.Polygon(pya.Box(20000, 0, 30000, 10000)), polygon]
+    edge_index = EdgeIndex(polygons, dbu)
+    for x, y in [(1.5, 1.0), (1.0, 1.5), (4.0, 3.75), (3.5, 4.5), (7.5, 12.5), (10.0, 5.0), (25.0, 10.0)]:
+        point = pya.DPoint(x, y)
+        _, i, j, edge = _nearest_edge(polygons, point)
+        assert edge_index.find_edge(point) == (i, j, edge)
+
+
+def test_raises_if_no_edge_within_tolerance():
+    edge_index = EdgeIndex(_polygons(), dbu, tolerance=0.01)
+    with pytest.raises(ValueError, match="No edge found"):
+        edge_index.find_edge(pya.DPoint(6.0, 0.0))
+    with pytest.raises(ValueError, match="No edge found"):
+        EdgeIndex([], dbu).find_edge(pya.DPoint(0.0, 0.0))
@@ -0,0 +1,73 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import json
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.simulations.export.simulation_export import cross_sweep_simulation, sweep_simulation
+from kqcircuits.simulations.circular_capacitor_sim import CircularCapacitorSim
+from kqcircuits.util.geometry_json_encoder import GeometryJsonEncoder
+from kqcircuits.util.geometry_pickler import dumps, loads
+
+sim_parameters = {
+    'name': 'circular_capacitor',
+    'box': pya.DBox(pya.DPoint(0, 0), pya.DPoint(500, 500)),
+}
+
+
+def _region(simulation, layer):
+    return pya.Region(simulation.cell.begin_shapes_rec(simulation.layout.layer(layer)))
+
+
+def _assert_same_simulations(serial, parallel):
+    assert [sim.cell.name for sim in parallel] == [sim.cell.name for sim in serial]
+    for serial_sim, parallel_sim in zip(serial, parallel):
+        assert type(parallel_sim) is type(serial_sim)
+        assert parallel_sim.cell.layout() is parallel[0].layout
+        assert json.dumps(parallel_sim.get_simulation_data(), cls=GeometryJsonEncoder) == \
+               json.dumps(serial_sim.get_simulation_data(), cls=GeometryJsonEncoder)
+        for layer in serial_sim.get_layers().values():
+            assert (_region(parallel_sim, layer) ^ _region(serial_sim, layer)).is_empty()
+
+
+def test_parallel_cross_sweep_equals_serial():
+    sweeps = {'r_inner': [10, 20], 'swept_angle': [40, 180]}
+    serial = cross_sweep_simulation(pya.Layout(), CircularCapacitorSim, sim_parameters, sweeps)
+    parallel = cross_sweep_simulation(pya.Layout(), CircularCapacitorSim, sim_parameters, sweeps, processes=2)
+    _assert_same_simulations(serial, parallel)
+
+
+def test_parallel_sweep_equals_serial_with_duplicate_names():
+    sweeps = {'swept_angle': [40, 40, 180]}
+    serial = sweep_simulation(pya.Layout(), CircularCapacitorSim, sim_parameters, sweeps)
+    parallel = sweep_simulation(pya.Layout(), CircularCapacitorSim, sim_parameters, sweeps, processes=3)
+    assert [sim.cell.name for sim in parallel][:2] == ['circular_capacitor_swept_angle_40',
+                                                       'circular_capacitor_swept_angle_40$1']
+    _assert_same_simulations(serial, parallel)
+
+
+def test_from_built_cell_does_not_build_again():
+    layout = pya.Layout()
+    simulation = CircularCapacitorSim(layout, **sim_parameters)
+    num_cells = layout.cells()
+    # the ports are copied like when they are sent from a worker process, since get_simulation_data modifies them
+    restored = CircularCapacitorSim.from_built_cell(simulation.cell, loads(dumps(simulation.ports)),
+                                                    simulation.refpoints, **simulation.get_parameters())
+    assert layout.cells() == num_cells
+    assert restored.cell is simulation.cell
+    assert json.dumps(restored.get_simulation_data(), cls=GeometryJsonEncoder) == \
+           json.dumps(simulation.get_simulation_data(), cls=GeometryJsonEncoder)
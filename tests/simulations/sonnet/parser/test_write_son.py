@@ -0,0 +1,58 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import io
+
+import pytest
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.simulations.export.sonnet import parser
+
+
+def test_apply_template_writes_string_and_function_rules(tmp_path):
+    template = tmp_path / "template.son"
+    template.write_text("A $first\n${second}B\n$$BASENAME\n")
+    output = tmp_path / "output.son"
+    parser.apply_template(template, output, {"first": 1, "second": lambda fileout: fileout.write("streamed")})
+    assert output.read_text() == "A 1\nstreamedB\n$BASENAME\n"
+
+
+def test_apply_template_raises_for_missing_rule(tmp_path):
+    template = tmp_path / "template.son"
+    template.write_text("$missing\n")
+    with pytest.raises(KeyError):
+        parser.apply_template(template, tmp_path / "output.son", {})
+
+
+def test_polygon_points_are_written_in_chunks():
+    poly = pya.Polygon([pya.Point(x, (x * 7) % 13) for x in range(10)] + [pya.Point(20, 100)])
+    v, dbu = pya.DVector(0.5, -100.0), 0.001
+    expected = "".join(f"{point.x * dbu + v.x} {-(point.y * dbu + v.y)}\n"
+                       for point in list(poly.each_point_hull()) + [next(poly.each_point_hull())])
+    for chunk_size in [1, 4, 11, 100]:
+        fileout = io.StringIO()
+        parser.write_polygon_points(fileout, poly, v, dbu, chunk_size=chunk_size)
+        assert fileout.getvalue() == expected
+
+
+def test_polygons_returns_written_polygons():
+    polys = [pya.Polygon(pya.Box(0, 0, 1000, 2000)), pya.Polygon(pya.Box(3000, 0, 4000, 500))]
+    fileout = io.StringIO()
+    parser.write_polygons(fileout, polys, pya.DVector(0, -10), 0.001, iter([0, 2]), "N")
+    assert parser.polygons(polys, pya.DVector(0, -10), 0.001, iter([0, 2]), "N") == fileout.getvalue()
+    assert fileout.getvalue().startswith("NUM 2\n0 5 -1 N 1 ")
+    assert fileout.getvalue().count("END\n") == 2
@@ -0,0 +1,51 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util.geometry_helper import region_with_merged_points
+
+
+def _sorted_polygons(region):
+    return sorted(str(p) for p in region.each())
+
+
+def test_polygons_without_short_segments_are_unchanged():
+    polygon = pya.Polygon(pya.Box(0, 0, 1000, 1000))
+    polygon.insert_hole(pya.Box(100, 100, 200, 200))
+    region = pya.Region([polygon, pya.Polygon(pya.Box(2000, 0, 3000, 1000))])
+    assert _sorted_polygons(region_with_merged_points(region, 10)) == _sorted_polygons(region)
+
+
+def test_short_segments_are_merged():
+    polygon = pya.Polygon([pya.Point(0, 0), pya.Point(1000, 0), pya.Point(1000, 995), pya.Point(1002, 1000),
+                           pya.Point(0, 1000)])
+    polygon.insert_hole([pya.Point(100, 100), pya.Point(100, 200), pya.Point(200, 200), pya.Point(203, 198),
+                         pya.Point(200, 100)])
+    result = list(region_with_merged_points(pya.Region(polygon), 10).each())
+    assert len(result) == 1
+    assert result[0].num_points_hull() == 4
+    assert result[0].num_points_hole(0) == 4
+
+
+def test_overlapping_polygons_are_not_merged():
+    region = pya.Region()
+    region.insert(pya.Box(0, 0, 1000, 1000))
+    region.insert(pya.Polygon([pya.Point(500, 0), pya.Point(1500, 0), pya.Point(1500, 995), pya.Point(1503, 1000),
+                               pya.Point(500, 1000)]))
+    result = region_with_merged_points(region, 10)
+    assert result.count() == 2
+    assert "(0,0;0,1000;1000,1000;1000,0)" in _sorted_polygons(result)
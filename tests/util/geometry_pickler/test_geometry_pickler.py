@@ -0,0 +1,76 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import io
+
+import pytest
+
+from kqcircuits.chips.chip import Chip
+from kqcircuits.elements.waveguide_composite import Node
+from kqcircuits.masks.chip_worker import ChipJob, read_job, write_job
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util.geometry_pickler import dumps, loads
+
+
+def _polygon_with_hole():
+    polygon = pya.DPolygon(pya.DBox(0, 0, 10.123456789012, 10))
+    polygon.insert_hole(pya.DBox(1, 1, 2, 2))
+    return polygon
+
+
+@pytest.mark.parametrize("value", [
+    pya.DPoint(0.1234567890123, 1e-9),
+    pya.DVector(-1.5, 2),
+    pya.Point(1, 2),
+    pya.DBox(1, 2, 3, 4.5),
+    pya.Box(1, 2, 3, 4),
+    pya.DEdge(0, 0, 1, 1),
+    pya.DPath([pya.DPoint(0, 0), pya.DPoint(1, 1)], 2.5, 1, 1, True),
+    _polygon_with_hole(),
+    pya.Polygon(pya.Box(0, 0, 3, 3)),
+    pya.DSimplePolygon(pya.DBox(0, 0, 1, 1)),
+    pya.DTrans(1, True, 2.5, 3),
+    pya.Trans(2, False, 3, 4),
+    pya.DCplxTrans(2, 33.3, True, 1, 2),
+    pya.LayerInfo(1, 2),
+    pya.LayerInfo(1, 2, "name"),
+])
+def test_geometry_round_trip(value):
+    decoded = loads(dumps(value))
+    assert type(decoded) == type(value)  # pylint: disable=unidiomatic-typecheck
+    assert decoded == value
+
+
+def test_nested_values_round_trip():
+    nodes = [Node(pya.DPoint(1, 2)), Node((3, 4), length_before=5)]
+    decoded = loads(dumps({"nodes": nodes, "points": [pya.DPoint(1, 2)], "box": {"a": pya.DBox(0, 0, 1, 1)}}))
+    assert [n.position for n in decoded["nodes"]] == [pya.DPoint(1, 2), pya.DPoint(3, 4)]
+    assert decoded["nodes"][1].length_before == 5
+    assert decoded["points"] == [pya.DPoint(1, 2)]
+    assert decoded["box"]["a"] == pya.DBox(0, 0, 1, 1)
+
+
+def test_chip_job_stream():
+    stream = io.BytesIO()
+    write_job(stream, ChipJob(Chip, "CH1", {"box": pya.DBox(0, 0, 5000, 5000)}))
+    write_job(stream, ChipJob(Chip, "CH2", {}))
+    stream.seek(0)
+    first, second = read_job(stream), read_job(stream)
+    assert (first.chip_class, first.variant_name) == (Chip, "CH1")
+    assert first.parameters == {"box": pya.DBox(0, 0, 5000, 5000)}
+    assert second.variant_name == "CH2"
+    assert read_job(stream) is None
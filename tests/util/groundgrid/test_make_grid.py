@@ -0,0 +1,63 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import numpy
+import pytest
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util.groundgrid import make_grid
+
+
+def _reference_grid(boundbox, avoid_region, grid_step, grid_size, group_n):
+    """Straightforward implementation of make_grid with one Python call per hole."""
+    holes = pya.Region()
+    for x in numpy.arange(boundbox.left, boundbox.right, grid_step):
+        for y in numpy.arange(boundbox.bottom, boundbox.top, grid_step):
+            holes.insert(pya.Box(int(x), int(y), int(x) + grid_size, int(y) + grid_size))
+    del group_n  # grouping only affects the speed
+    return ((holes & pya.Region(boundbox)) - avoid_region).with_area(grid_size**2, None, False)
+
+
+def _avoid_region():
+    region = pya.Region(pya.Polygon.ellipse(pya.Box(0, 0, 3000, 3000), 64))
+    for box in [pya.Box(1000, 1000, 4000, 2500), pya.Box(-3000, 5000, 200, 5300), pya.Box(6020, -500, 6030, 9000)]:
+        region.insert(box)
+    return region
+
+
+@pytest.mark.parametrize("boundbox, grid_step, grid_size, group_n", [
+    (pya.Box(0, 0, 8000, 7000), 100, 50, 10),
+    (pya.Box(-1234, -567, 7891, 6543), 100, 50, 10),
+    (pya.Box(0, 0, 8000, 7000), 70, 30, 7),
+    (pya.Box(0, 0, 8000, 7000), 100, 50, 1),
+])
+def test_make_grid_equals_reference(boundbox, grid_step, grid_size, group_n):
+    grid = make_grid(boundbox, _avoid_region(), grid_step, grid_size, group_n)
+    reference = _reference_grid(boundbox, _avoid_region(), grid_step, grid_size, group_n)
+    assert grid.count() == reference.count()
+    assert (grid ^ reference).is_empty()
+
+
+def test_make_grid_without_avoid_region():
+    grid = make_grid(pya.Box(0, 0, 1000, 1000), pya.Region(), 10, 5)
+    assert grid.count() == 100 * 100
+    assert grid.area() == 100 * 100 * 25
+
+
+def test_make_grid_accepts_dbox():
+    grid = make_grid(pya.DBox(0, 0, 1000, 1000), pya.Region(pya.Box(0, 0, 500, 1000)), 10.0, 5.0)
+    assert grid.count() == 50 * 100
@@ -0,0 +1,139 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util import library_helper
+from kqcircuits.elements.airbridges.airbridge_rectangular import AirbridgeRectangular
+from kqcircuits.elements.finger_capacitor_square import FingerCapacitorSquare
+
+log = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def index_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(library_helper, "_library_index_file", tmp_path / "library_index.json")
+    monkeypatch.setattr(library_helper, "_library_index", {})
+    return tmp_path / "library_index.json"
+
+
+def test_index_file_is_written(index_file):
+    index = library_helper._get_library_index()
+    assert index_file.exists()
+    assert index["pcells"]["Element Library"]["Airbridge Rectangular"] == {
+        "module": AirbridgeRectangular.__module__,
+        "class": "AirbridgeRectangular",
+    }
+    assert index["libraries"]["Junction Library"]["path"] == "junctions"
+    assert any(path.endswith("QCD1.oas") for path in index["designs"]["junctions"])
+
+
+def test_index_file_is_reused(index_file, monkeypatch):
+    library_helper._get_library_index()
+    with open(index_file, encoding="utf-8") as f:
+        index = json.load(f)
+    pcells = index["pcells"]["Element Library"]
+    pcells["Marker Index Test"] = pcells["Airbridge Rectangular"]
+    with open(index_file, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    monkeypatch.setattr(library_helper, "_library_index", {})
+    assert "Marker Index Test" in library_helper._get_library_index()["pcells"]["Element Library"]
+
+
+def test_out_of_date_index_is_rebuilt(index_file, monkeypatch):
+    library_helper._get_library_index()
+    with open(index_file, encoding="utf-8") as f:
+        index = json.load(f)
+    pcells = index["pcells"]["Element Library"]
+    pcells["Marker Index Test"] = pcells["Airbridge Rectangular"]
+    path = next(iter(index["files"]))
+    index["files"][path] -= 1
+    with open(index_file, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    monkeypatch.setattr(library_helper, "_library_index", {})
+    assert "Marker Index Test" not in library_helper._get_library_index()["pcells"]["Element Library"]
+
+
+def test_element_by_class_name():
+    assert library_helper.element_by_class_name("AirbridgeRectangular") is AirbridgeRectangular
+    assert library_helper.element_by_class_name("NotAnElement") is None
+
+
+def test_pcell_class_by_name():
+    assert library_helper.pcell_class_by_name("Airbridge Rectangular") is AirbridgeRectangular
+    assert library_helper.pcell_class_by_name("Not An Element") is None
+
+
+def test_load_manual_design():
+    assert library_helper.load_manual_design("QCD1", "junctions", "Junction Library")
+    assert not library_helper.load_manual_design("Not A Design", "junctions", "Junction Library")
+
+
+def test_pcell_added_to_registered_library_creates_library_cells():
+    library_helper.load_pcell(AirbridgeRectangular)
+    library = pya.Library.library_by_name(AirbridgeRectangular.LIBRARY_NAME)
+    assert library is not None
+    library_helper.load_pcell(FingerCapacitorSquare)
+    layout = pya.Layout()
+    cell = FingerCapacitorSquare.create(layout)
+    assert cell.is_library_cell() or cell.is_pcell_variant()
+    assert cell.pcell_declaration().name() == "Finger Capacitor Square"
+    assert not cell.bbox().empty()
+
+
+def test_load_pcell_loads_libraries_in_klayout_application(monkeypatch):
+    loaded_paths = []
+    monkeypatch.setattr(library_helper, "is_standalone_session", lambda: False)
+    monkeypatch.setattr(library_helper, "_kqc_libraries", {})
+    monkeypatch.setattr(library_helper, "load_libraries", lambda path="", flush=False: loaded_paths.append(path))
+    library_helper.load_pcell(AirbridgeRectangular)
+    assert loaded_paths == [AirbridgeRectangular.LIBRARY_PATH]
+
+
+_first_cell_script = """
+import json, sys, time
+start = time.perf_counter()
+from kqcircuits.pya_resolver import pya
+from kqcircuits.chips.demo import Demo
+imported = time.perf_counter()
+layout = pya.Layout()
+Demo.create(layout)
+created = time.perf_counter()
+print(json.dumps({"import": imported - start, "create": created - imported,
+                  "chip_modules": sorted(m for m in sys.modules if m.startswith("kqcircuits.chips."))}))
+"""
+
+
+def _create_demo():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.check_output([sys.executable, "-c", _first_cell_script], env=env)
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def test_time_to_first_cell():
+    _create_demo()  # make sure that the library index is up to date
+    result = _create_demo()
+    log.info("Time to first Demo cell: import %.3f s, create %.3f s", result["import"], result["create"])
+    # only the chips used by Demo are imported, not all modules of the Chip Library
+    assert result["chip_modules"] == ["kqcircuits.chips.chip", "kqcircuits.chips.demo"]
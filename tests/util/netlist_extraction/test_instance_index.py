@@ -0,0 +1,91 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.util.netlist_extraction import _InstanceIndex
+
+
+def _layout():
+    layout = pya.Layout()
+    leaf = layout.create_cell("Leaf")
+    leaf.shapes(layout.layer(1, 0)).insert(pya.Box(0, 0, 10, 10))
+    group = layout.create_cell("Group")
+    group.insert(pya.DCellInstArray(leaf.cell_index(), pya.DTrans(pya.DVector(5, 0))))
+    group.insert(pya.DCellInstArray(leaf.cell_index(), pya.DCplxTrans(1, 90, False, 0, 7)))
+    top = layout.create_cell("Top")
+    top.insert(pya.DCellInstArray(leaf.cell_index(), pya.DTrans(pya.DVector(5, 100))))
+    top.insert(pya.DCellInstArray(group.cell_index(), pya.DTrans(pya.DVector(0, 100))))
+    top.insert(pya.DCellInstArray(group.cell_index(), pya.DCplxTrans(1, 180, True, 20, 30)))
+    return layout, leaf, group, top
+
+
+def test_finds_nested_instances_by_total_transformation():
+    layout, leaf, group, top = _layout()
+    index = _InstanceIndex(top)
+
+    found = index.find(leaf.cell_index(), pya.DCplxTrans(pya.DVector(5, 100)))
+    # the direct instance of Leaf comes before the instance inside Group in breadth first order
+    assert [instance_trans for _, instance_trans in found] == [pya.DCplxTrans.R0, pya.DCplxTrans(pya.DVector(0, 100))]
+    assert all(instance.cell_index == leaf.cell_index() for instance, _ in found)
+
+    nested_trans = pya.DCplxTrans(1, 180, True, 20, 30) * pya.DCplxTrans(1, 90, False, 0, 7)
+    assert len(index.find(leaf.cell_index(), nested_trans)) == 1
+    assert len(index.find(group.cell_index(), pya.DCplxTrans(pya.DVector(0, 100)))) == 1
+    assert not index.find(leaf.cell_index(), pya.DCplxTrans(pya.DVector(1, 2)))
+    assert not index.find(top.cell_index(), pya.DCplxTrans.R0)
+    del layout
+
+
+def test_finds_transformations_equal_within_tolerance():
+    layout = pya.Layout()
+    leaf = layout.create_cell("Leaf")
+    top = layout.create_cell("Top")
+    top.insert(pya.DCellInstArray(leaf.cell_index(), pya.DCplxTrans(1, 10.0000005, False, 1, 2)))
+    index = _InstanceIndex(top)
+    stored_angle = next(top.each_inst()).dcplx_trans.angle
+    # these round differently than the stored transformation, but are equal within the DCplxTrans comparison tolerance
+    for delta in (1e-9, -1e-9):
+        assert len(index.find(leaf.cell_index(), pya.DCplxTrans(1, stored_angle + delta, False, 1, 2))) == 1
+    assert not index.find(leaf.cell_index(), pya.DCplxTrans(1, stored_angle + 1e-3, False, 1, 2))
+    del layout
+
+
+def test_finds_transformation_across_rounding_boundary_of_occupied_bucket():
+    layout = pya.Layout()
+    leaf = layout.create_cell("Leaf")
+    top = layout.create_cell("Top")
+    top.insert(pya.DCellInstArray(leaf.cell_index(), pya.DCplxTrans(1, 10.0000004999, False, 1, 2)))
+    # another instance is stored in the bucket to which the searched transformation is rounded
+    top.insert(pya.DCellInstArray(leaf.cell_index(), pya.DCplxTrans(1, 10.0000012, False, 1, 2)))
+    index = _InstanceIndex(top)
+    first, second = top.each_inst()
+    trans = pya.DCplxTrans(1, first.dcplx_trans.angle + 1e-9, False, 1, 2)
+    assert _InstanceIndex._key(trans) == _InstanceIndex._key(second.dcplx_trans)
+    found = index.find(leaf.cell_index(), trans)
+    assert len(found) == 1
+    assert found[0][0].dcplx_trans == first.dcplx_trans
+    del layout
+
+
+def test_has_cell():
+    layout, leaf, group, top = _layout()
+    index = _InstanceIndex(top)
+    assert index.has_cell(leaf.cell_index())
+    assert index.has_cell(group.cell_index())
+    assert not index.has_cell(top.cell_index())
+    assert not index.has_cell(None)
+    del layout
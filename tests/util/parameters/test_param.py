@@ -312,3 +312,32 @@ def test_add_param_inherited():
         pass
 
     assert  Test.get_schema()['pa1'].kwargs['hidden']
+
+
+def test_schema_is_cached():
+    assert B.get_schema() is B.get_schema()
+    assert set(B.get_schema()) == {*Element.get_schema(), "pa1", "pa2", "pb1", "pb2"}
+    assert set(B.get_schema(noparents=True)) == {"pb1", "pb2"}
+
+
+def test_schema_cache_is_updated_when_param_is_added():
+    schema = A.get_schema()
+    p = Param(pdt.TypeInt, "", 100)
+    setattr(A, "pa3", p)
+    p.__set_name__(A, "pa3")
+    try:
+        assert "pa3" in A.get_schema() and "pa3" not in schema
+        assert "pa3" in B.get_schema()
+    finally:
+        delattr(A, "pa3")
+        del Param.get_all(A)["pa3"]
+        Param.get_cache().clear()
+
+
+def test_pcell_params_by_name():
+    b = B()
+    assert b.pcell_params_by_name(A) == {**{k: v.default for k, v in A.get_schema().items() if k != "refpoints"},
+                                        "pa1": 1}
+    assert b.pcell_params_by_name(C) == b.pcell_params_by_name(Element)
+    assert b.pcell_params_by_name(A, pa1=5)["pa1"] == 5
+    assert set(b.pcell_params_by_name()) == set(B.get_schema()) - {"refpoints"}
@@ -0,0 +1,101 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+
+import logging
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.elements.waveguide_coplanar_straight import WaveguideCoplanarStraight
+from kqcircuits.elements.waveguide_coplanar import WaveguideCoplanar
+from kqcircuits.util.pcell_variant_cache import PCellVariantCache, pcell_variant_cache
+
+
+def _create_cells(cache, layout, parameter_list):
+    """Creates cells with the cache, returning the cells and how many times KLayout was asked for a cell."""
+    created = []
+
+    def create_function(parameters):
+        def create():
+            created.append(parameters)
+            return layout.create_cell("Waveguide Coplanar Straight", "Element Library", parameters)
+        return create
+
+    cells = [cache.create_cell(layout, WaveguideCoplanarStraight, None, create_function(p), p) for p in parameter_list]
+    return cells, len(created)
+
+
+def test_repeated_cell_is_returned_from_cache():
+    cache = PCellVariantCache()
+    layout = pya.Layout()
+    WaveguideCoplanarStraight.create(layout)  # make sure that the library is loaded
+    cells, n_created = _create_cells(cache, layout, [{"l": 10.0}] * 4)
+    assert len({c.cell_index() for c in cells}) == 1
+    assert n_created == 2  # the first repeat is checked against KLayout
+    assert cache.hits == 2 and cache.misses == 2 and cache.time_saved > 0
+
+
+def test_different_parameters_are_different_cells():
+    cache = PCellVariantCache()
+    layout = pya.Layout()
+    cells, n_created = _create_cells(cache, layout, [{"l": 10.0}, {"l": 20.0}, {"l": 10.0}, {"l": 20.0}, {"l": 10}])
+    assert cells[0].cell_index() != cells[1].cell_index()
+    assert n_created == 5 and cache.hits == 0
+
+
+def test_deleted_cell_is_not_returned():
+    cache = PCellVariantCache()
+    layout = pya.Layout()
+    cells, _ = _create_cells(cache, layout, [{"l": 10.0}] * 2)
+    layout.delete_cell(cells[0].cell_index())
+    cell, n_created = _create_cells(cache, layout, [{"l": 10.0}])
+    assert n_created == 1 and not cell[0]._destroyed()
+
+
+def test_unhashable_parameters_are_not_cached():
+    cache = PCellVariantCache()
+    layout = pya.Layout()
+    _, n_created = _create_cells(cache, layout, [{"l": 10.0, "unknown": pya.Region()}] * 3)
+    assert n_created == 3 and cache.hits == 0
+
+
+def test_modified_parameter_does_not_change_key():
+    layout = pya.Layout()
+    path = pya.DPath([pya.DPoint(0, 0), pya.DPoint(100, 0)], 1)
+    cell1 = WaveguideCoplanar.create(layout, path=path)
+    path.points = [pya.DPoint(0, 0), pya.DPoint(200, 0)]
+    cell2 = WaveguideCoplanar.create(layout, path=path)
+    cell3 = WaveguideCoplanar.create(layout, path=path)
+    cell4 = WaveguideCoplanar.create(layout, path=path)
+    assert cell1.cell_index() != cell2.cell_index()
+    assert cell2.cell_index() == cell3.cell_index() == cell4.cell_index()
+    assert cell4.pcell_parameter("path") == path
+
+
+def test_statistics_of_element_create():
+    layout = pya.Layout()
+    statistics = pcell_variant_cache.statistics()
+    for _ in range(5):
+        WaveguideCoplanarStraight.create(layout, l=123.0)
+    new_statistics = pcell_variant_cache.statistics()
+    assert new_statistics["hits"] - statistics["hits"] == 3
+    assert new_statistics["misses"] - statistics["misses"] == 2
+
+
+def test_statistics_are_logged_in_debug_level(caplog):
+    path = pya.DPath([pya.DPoint(0, 0), pya.DPoint(321, 0), pya.DPoint(321, 321)], 0)
+    with caplog.at_level(logging.DEBUG, logger="kqcircuits.elements.element.Element"):
+        WaveguideCoplanar.create(pya.Layout(), path=path)
+    assert any(r.getMessage().startswith("PCell variant cache in WaveguideCoplanar:") for r in caplog.records)
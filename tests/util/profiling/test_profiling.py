@@ -0,0 +1,109 @@
+# This code is part of KQCircuits
+# Copyright (C) 2023 IQM Finland Oy
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with this program. If not, see
+# https://www.gnu.org/licenses/gpl-3.0.html.
+#
+# The software distribution should follow IQM trademark policy for open-source software
+# (meetiqm.com/developers/osstmpolicy). IQM welcomes contributions to the code. Please see our contribution agreements
+# for individuals (meetiqm.com/developers/clas/individual) and organizations (meetiqm.com/developers/clas/organization).
+import json
+import os
+import subprocess
+import sys
+
+from kqcircuits.pya_resolver import pya
+from kqcircuits.elements.waveguide_coplanar import WaveguideCoplanar
+from kqcircuits.elements.waveguide_coplanar_straight import WaveguideCoplanarStraight
+from kqcircuits.util import profiling
+from kqcircuits.util.pcell_variant_cache import pcell_variant_cache
+from kqcircuits.util.profiling import profile_elements
+
+
+def _profile_waveguide():
+    pcell_variant_cache.clear()
+    with profile_elements("test") as profiler:
+        WaveguideCoplanar.create(pya.Layout(), path=pya.DPath([pya.DPoint(0, 0), pya.DPoint(100, 0),
+                                                               pya.DPoint(100, 100)], 0))
+    return profiler
+
+
+def test_profiling_is_disabled_by_default():
+    assert profiling._profiler is None
+    with profile_elements():
+        assert profiling._profiler is not None
+    assert profiling._profiler is None
+
+
+def test_profile_tree_contains_nested_elements_and_stages():
+    tree = _profile_waveguide().to_dict()
+    waveguide = tree["children"][0]
+    assert waveguide["name"] == "WaveguideCoplanar"
+    assert waveguide["calls"] == 1
+    stages = {c["name"]: c for c in waveguide["children"]}
+    assert set(stages) == {"build", "post_build", "refpoints"}
+    assert stages["refpoints"]["shapes"] > 0
+    assert stages["build"]["instances"] > 0
+    straight = [c for c in stages["build"]["children"] if c["name"] == "WaveguideCoplanarStraight"]
+    assert straight and straight[0]["calls"] == 2
+
+
+def test_class_statistics():
+    statistics = _profile_waveguide().class_statistics()
+    assert set(statistics) >= {"WaveguideCoplanar", WaveguideCoplanarStraight.__name__}
+    waveguide = statistics["WaveguideCoplanar"]
+    assert waveguide["time"] >= waveguide["self_time"] >= 0
+    assert statistics[WaveguideCoplanarStraight.__name__]["calls"] == 2
+
+
+def test_speedscope_output(tmp_path):
+    profiler = _profile_waveguide()
+    path = tmp_path / "profile.speedscope.json"
+    profiler.write_speedscope(path)
+    data = json.loads(path.read_text())
+    assert data["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    frames = [f["name"] for f in data["shared"]["frames"]]
+    assert "WaveguideCoplanar" in frames and "build" in frames
+    profile = data["profiles"][0]
+    assert len(profile["samples"]) == len(profile["weights"])
+    assert all(0 <= i < len(frames) for sample in profile["samples"] for i in sample)
+    assert abs(sum(profile["weights"]) - profiler.to_dict()["time"]) < 1e-6
+
+
+_env_profile_script = """
+from kqcircuits.pya_resolver import pya
+from kqcircuits.elements.waveguide_coplanar_straight import WaveguideCoplanarStraight
+from kqcircuits.util import profiling
+WaveguideCoplanarStraight.create(pya.Layout())
+print(profiling._profiler is not None)
+"""
+
+
+def _run_with_profile_env(path, profiling_pid=None):
+    """Runs the script with KQC_PROFILE, as if started by process ``profiling_pid`` if given."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), KQC_PROFILE=str(path))
+    env.pop("KQC_PROFILE_PID", None)
+    if profiling_pid is not None:
+        env["KQC_PROFILE_PID"] = str(profiling_pid)
+    output = subprocess.check_output([sys.executable, "-c", _env_profile_script], env=env)
+    return output.decode().splitlines()[-1] == "True"
+
+
+def test_environment_variable_writes_profile_at_exit(tmp_path):
+    path = tmp_path / "profile.speedscope.json"
+    assert _run_with_profile_env(path)
+    frames = [f["name"] for f in json.loads(path.read_text(encoding="utf-8"))["shared"]["frames"]]
+    assert "WaveguideCoplanarStraight" in frames
+
+
+def test_processes_started_by_profiled_process_are_not_profiled(tmp_path):
+    path = tmp_path / "profile.speedscope.json"
+    assert not _run_with_profile_env(path, profiling_pid=os.getpid())
+    assert not path.exists()